@@ -1,4 +1,5 @@
 from file_reader import FileReader
+from rate_limiter import RateLimiter, RateLimitedAdapter
 from type_hints import *
 from datetime import datetime
 from logging import getLogger
@@ -7,6 +8,11 @@ import json
 import os
 logger = getLogger("DTS-Logger")
 
+# Seconds to wait for a response to the HEAD request used when warming up a connection
+WARM_UP_TIMEOUT = 10
+# Maximum number of connections to its API kept open by a session; at least the number of worker threads sharing it
+POOL_SIZE = 8
+
 
 class ApiConnector:
     """
@@ -24,16 +30,28 @@ class ApiConnector:
     :ivar record_requests: Boolean toggle, when set to `True` the save_request() method will permitted, whereas when
         set to `False`, it will be prohibited.
     :vartype record_requests: bool
+    :cvar warm_sessions: Sessions opened in advance by warm_up(), keyed by client. A connector created for a client with
+        a warm session will reuse it (and its open connection) rather than starting a new one. A session (warm or not)
+        may be shared by up to `POOL_SIZE` worker threads; see mount_adapter().
+    :vartype warm_sessions: Dict[str, Session]
+    :cvar rate_limiters: Rate limiters for the APIs, keyed by client. The requests of every session for a client with a
+        rate limiter are limited by it.
+    :vartype rate_limiters: Dict[str, RateLimiter]
     """
 
     # client: str
     # session: requests.Session
 
+    warm_sessions: Dict[str, requests.Session] = {}
+    rate_limiters: Dict[str, RateLimiter] = {}
+
     def __init__(self, credentials: Tuple[str, str], address: str, port: Union[str, int, None],
                  record_requests: bool = True) -> None:
         self.client = f"{str(address)}:{str(port)}" if port is not None else str(address)
-        self.session = requests.Session()
+        self.shared_session = self.client in self.warm_sessions
+        self.session = self.warm_sessions[self.client] if self.shared_session else requests.Session()
         self.session.auth = credentials
+        self.mount_adapter(self.session, self.client)
         self.this_instance = str(datetime.now().strftime("%Y%m%d-%H%M%S"))
         self.record_requests = record_requests
 
@@ -41,7 +59,64 @@ class ApiConnector:
         return self
 
     def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
-        requests.Session.close(self.session)
+        # Warm sessions are kept open for any later connectors to the same client; see close_warm_sessions()
+        if not self.shared_session:
+            requests.Session.close(self.session)
+
+    @classmethod
+    def warm_up(cls, credentials: Tuple[str, str], client: str, verify: bool = True) -> bool:
+        """
+        Method for opening a connection to an API ahead of its first real request. A HEAD request is made to the client
+        so that DNS resolution and the TCP/TLS handshakes are done, and the session is then kept (with its connection
+        alive) in `warm_sessions` for use by the next connector created for the same client.
+
+        :param credentials: Contains the username and password for authentication with the API.
+        :param client: The address of the API, with the port included if there is one.
+        :param verify: Whether or not the TLS certificate of the API should be verified.
+        :return: `True` if a connection was opened; `False` otherwise. Failures are not raised, as any real connection
+            problem will be reported by the first real request.
+        """
+        session = requests.Session()
+        session.auth = credentials
+        cls.mount_adapter(session, client)
+        try:
+            res = session.head(client, verify=verify, timeout=WARM_UP_TIMEOUT)
+            res.close()
+        except Exception as e:
+            logger.debug(f"Unable to warm up the connection to {client}. ({e})")
+            session.close()
+            return False
+
+        logger.debug(f"Connection to {client} warmed up.")
+        cls.warm_sessions[client] = session
+        return True
+
+    @classmethod
+    def mount_adapter(cls, session: requests.Session, client: str) -> None:
+        """
+        Method for mounting the transport adapter of a session for a client, unless it is already mounted (e.g. on a
+        warm session). The adapter keeps up to `POOL_SIZE` connections to the client open, so that the session can be
+        shared by that many worker threads, each with a connection of its own: the requests made with a session don't
+        change its settings, and its connection pool and cookie jar are thread-safe. If a rate limiter has been set for
+        the client, the adapter also limits the rate of the requests.
+        """
+        limiter = cls.rate_limiters.get(client)
+        adapter = session.adapters.get(client)
+        if adapter is not None and (limiter is None or isinstance(adapter, RateLimitedAdapter)):
+            return
+        if limiter is not None:
+            session.mount(client, RateLimitedAdapter(limiter, pool_maxsize=POOL_SIZE))
+        else:
+            session.mount(client, requests.adapters.HTTPAdapter(pool_maxsize=POOL_SIZE))
+
+    @classmethod
+    def close_warm_sessions(cls) -> None:
+        """
+        Method for closing all of the sessions opened by warm_up().
+        """
+        for session in cls.warm_sessions.values():
+            session.close()
+        cls.warm_sessions.clear()
 
     def save_request(self, method: str, res: requests.Response) -> None:
         """
@@ -60,13 +135,10 @@ class ApiConnector:
         except ValueError:
             response = "N/A"
 
+        # Requests may be made (and saved) concurrently, so the directories may be created by another thread meanwhile
         responses_directory = os.path.join('responses')
-        if not os.path.exists(responses_directory):
-            os.mkdir(responses_directory)
-
         this_response_directory = f'{responses_directory}/{self.this_instance}'
-        if not os.path.exists(this_response_directory):
-            os.mkdir(this_response_directory)
+        os.makedirs(this_response_directory, exist_ok=True)
 
         if isinstance(res, requests.Response):
             file = f'{this_response_directory}/{datetime.now().strftime("%Y%m%d-%H%M%S")}_{method}.txt'
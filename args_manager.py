@@ -9,10 +9,10 @@ class ArgsManager:
     in the following formats:
 
     For handling `data`:
-    - prog data -f {FILENAME (optional)} -q {QUERY in quotes} -i {ID} -t {TITLE} -y (for yes to all prompts) -v (for verbose)
+    - prog data -f {FILENAME (optional)} -a {APPENDED FILES in quotes (optional)} -q {QUERY in quotes} -s {FILTERS in quotes (optional)} -i {ID} -t {TITLE} -m {MARGINALS in quotes (optional)} -x {RECODE FILE (optional)} -g {GEOGRAPHY LOOKUP (optional)} -y (for yes to all prompts) -v (for verbose)
 
     For handling `metadata`:
-    - prog metadata -f {FILENAME} -r {METADATA FORMAT}
+    - prog metadata -f {FILENAME} -r {METADATA FORMAT} -u (to sync, only writing changed metadata)
 
 
     :ivar parser: An argparse `ArgumentParser` object for collecting arguments from the terminal.
@@ -38,6 +38,15 @@ class ArgsManager:
             type=str,
             default=None
         )
+        self.parser.add_argument(
+            '-a',
+            '--append-files',
+            action="store",
+            help='files of the same table for other areas, to concatenate with the -f file e.g. "wales.json"',
+            dest='append_files',
+            type=str,
+            default=None
+        )
         self.parser.add_argument(
             '-r',
             '--metadata-format',
@@ -56,6 +65,15 @@ class ArgsManager:
             type=str,
             default=None
         )
+        self.parser.add_argument(
+            '-s',
+            '--filters',
+            action="store",
+            help='categories to select from the query variables (or the file) e.g. "SEX=1; AGE=1, 2, 3"',
+            dest='filters',
+            type=str,
+            default=None
+        )
         self.parser.add_argument(
             '-i',
             '--dataset-id',
@@ -74,6 +92,33 @@ class ArgsManager:
             type=str,
             default=None
         )
+        self.parser.add_argument(
+            '-m',
+            '--marginals',
+            action="store",
+            help='variables of smaller datasets to derive from the same query e.g. "SEX; AGE"',
+            dest='marginals',
+            type=str,
+            default=None
+        )
+        self.parser.add_argument(
+            '-x',
+            '--recode',
+            action="store",
+            help="json file of new variables with coarser categories to merge the categories of the dataset into",
+            dest='recode',
+            type=str,
+            default=None
+        )
+        self.parser.add_argument(
+            '-g',
+            '--geography-lookup',
+            action="store",
+            help='csv file of geography levels, for also publishing the dataset at each coarser level e.g. "OA,LSOA,MSOA"',
+            dest='geography_lookup',
+            type=str,
+            default=None
+        )
         self.parser.add_argument(
             '-d',
             '--query-dataset',
@@ -104,6 +149,34 @@ class ArgsManager:
             help="debug",
             default=False
         )
+        self.parser.add_argument(
+            '-w',
+            '--warm-up',
+            action="store_true",
+            help="open connections to all of the configured APIs in parallel before starting",
+            default=False
+        )
+        self.parser.add_argument(
+            '-e',
+            '--refresh-catalog',
+            action="store_true",
+            help="check what exists in Nomis against the API rather than the local catalog, and refresh it",
+            default=False
+        )
+        self.parser.add_argument(
+            '-k',
+            '--refresh-metadata',
+            action="store_true",
+            help="retrieve the metadata in Nomis from the API rather than the local metadata cache, and refresh it",
+            default=False
+        )
+        self.parser.add_argument(
+            '-u',
+            '--sync',
+            action="store_true",
+            help="only add or update the metadata that differs from the metadata already in Nomis",
+            default=False
+        )
         self.parser.add_argument(
             '-c',
             '--config-file',
@@ -17,14 +17,35 @@ class Arguments:
     :vartype suppress_prompts: bool
     :ivar verbose: Toggle for a verbose out during runtime.
     :vartype verbose: bool
+    :ivar refresh_catalog: Toggle for refreshing the local catalog of Nomis, rather than reading from it.
+    :vartype refresh_catalog: bool
+    :ivar refresh_metadata: Toggle for refreshing the local cache of the metadata in Nomis, rather than reading from it.
+    :vartype refresh_metadata: bool
+    :ivar sync: Toggle for only adding or updating the metadata that differs from that already in Nomis.
+    :vartype sync: bool
+    :ivar warm_up: Toggle for opening connections to all of the configured APIs before the run begins.
+    :vartype warm_up: bool
     :ivar filename: Location of a file to read from instead of querying Cantabular.
     :vartype filename: Optional[str]
+    :ivar append_files: Locations of further files of the same table for other areas, concatenated with the file
+        along the geography.
+    :vartype append_files: Optional[List[str]]
     :ivar query_variables: Parameter for querying Cantabular.
     :vartype query_variables: Optional[List[str]]
+    :ivar filters: The categories selected for any of the query variables; or, when reading from a file, for any of
+        the dimensions of the table in the file.
+    :vartype filters: Optional[Dict[str, List[str]]]
     :ivar dataset_id: Parameter for querying Cantabular.
     :vartype dataset_id: Optional[str]
     :ivar dataset_title: Parameter for querying Cantabular.
     :vartype dataset_title: Optional[str]
+    :ivar marginals: The variables of each marginal dataset to derive from the query, alongside the dataset.
+    :vartype marginals: Optional[List[List[str]]]
+    :ivar recode: Location of a recode file, for merging the categories of the dataset into coarser categories.
+    :vartype recode: Optional[str]
+    :ivar geography_lookup: Location of a geography lookup file, for also publishing the dataset at coarser geography
+        levels.
+    :vartype geography_lookup: Optional[str]
     :ivar query_dataset: Parameter for querying Cantabular.
     :vartype query_dataset: Optional[str]
     :ivar log_file: For overriding the default location of the log file.
@@ -58,13 +79,22 @@ class Arguments:
         self.metadata = False
         self.metadata_format = arguments.metadata_format
         self.filename = arguments.filename
+        self.append_files = arguments.append_files
         self.query_variables = arguments.query_variables
+        self.filters = arguments.filters
         self.dataset_id = arguments.dataset_id
         self.dataset_title = arguments.dataset_title
+        self.marginals = arguments.marginals
+        self.geography_lookup = arguments.geography_lookup
+        self.recode = arguments.recode
         self.query_dataset = arguments.query_dataset
         self.suppress_prompts = arguments.suppress_prompts
         self.verbose = arguments.verbose
         self.debug = arguments.debug
+        self.warm_up = arguments.warm_up
+        self.sync = arguments.sync
+        self.refresh_catalog = arguments.refresh_catalog
+        self.refresh_metadata = arguments.refresh_metadata
         self.log_file = arguments.log_file
         self.config_file = arguments.config_file
 
@@ -91,9 +121,31 @@ class Arguments:
                 raise ValueError("Must include metadata format (-r flag) to handle metadata.")
             elif self.metadata_format != 'O' and self.metadata_format != 'C':
                 raise ValueError("Invalid argument for metadata format.")
+            if self.geography_lookup is not None:
+                print("-g flag will be ignored.")
+            if self.append_files is not None:
+                print("-a flag will be ignored.")
+            if self.marginals is not None:
+                print("-m flag will be ignored.")
+            if self.recode is not None:
+                print("-x flag will be ignored.")
         else:
             if self.metadata_format is not None:
                 print("-r flag will be ignored.")
+            if self.sync:
+                print("-u flag will be ignored.")
+            if self.marginals is not None:
+                self.marginals = self.decode_marginals(self.marginals)
+            if self.recode is not None:
+                if not self.recode.lower().endswith(".json"):
+                    raise IOError(f"Inputted recode file ({self.recode}) must be a valid json!")
+                with FileReader(self.recode) as fr:
+                    fr.exists()
+            if self.geography_lookup is not None:
+                if not self.geography_lookup.lower().endswith(".csv"):
+                    raise IOError(f"Inputted geography lookup file ({self.geography_lookup}) must be a valid csv!")
+                with FileReader(self.geography_lookup) as fr:
+                    fr.exists()
             if self.dataset_id is None:
                 raise ValueError("Must include dataset id (-i flag) if not handling metadata.")
             if self.dataset_title is None:
@@ -113,6 +165,13 @@ class Arguments:
                     if len(s) == 0:
                         raise ValueError("query_variable contains empty strings")
 
+                if self.filters is not None:
+                    self.filters = self.decode_filters(self.filters, self.query_variables)
+
+                if self.append_files is not None:
+                    print("-a flag will be ignored.")
+                    self.append_files = None
+
         elif not self.metadata:
             ignore: List[str] = []
             if self.query_variables is not None:
@@ -140,6 +199,18 @@ class Arguments:
                     raise IOError(f"Inputted query file ({self.filename}) must be a valid json!")
                 with FileReader(self.filename) as fr:
                     fr.exists()
+                if self.filters is not None:
+                    self.filters = self.decode_filters(self.filters)
+                if self.append_files is not None:
+                    self.append_files = [filename.strip() for filename in self.append_files.split(",")]
+                    for filename in self.append_files:
+                        if not filename.lower().endswith(".json"):
+                            raise IOError(f"Inputted appended file ({filename}) must be a valid json!")
+                        with FileReader(filename) as fr:
+                            fr.exists()
+            elif self.append_files is not None:
+                print("-a flag will be ignored.")
+                self.append_files = None
 
         if self.log_file is not None and not self.log_file.endswith(".log"):
             raise FileNotFoundError(f"Inputted log file ({self.log_file}) not a valid .log file. Program halting.")
@@ -151,3 +222,52 @@ class Arguments:
                 fr.exists()
 
         return True
+
+    @staticmethod
+    def decode_marginals(marginals: str) -> List[List[str]]:
+        """
+        Method for decoding the marginals argument, e.g. "SEX; AGE" or "SEX, AGE; OA", into the list of variables of
+        each marginal dataset.
+
+        :param marginals: The marginals argument.
+        :raises ValueError: If a marginal dataset has no variables, or has a variable more than once.
+        :return: A list of the variables of each marginal dataset.
+        """
+        decoded: List[List[str]] = []
+        for marginal in marginals.split(";"):
+            variables = [variable.strip() for variable in marginal.split(",")]
+            if any(len(variable) == 0 for variable in variables):
+                raise ValueError(f"Invalid marginal dataset '{marginal.strip()}'; marginal datasets must be in the form "
+                                 f"\"VARIABLE, VARIABLE; VARIABLE\".")
+            if len(set(variables)) != len(variables):
+                raise ValueError(f"Marginal dataset '{marginal.strip()}' has a variable more than once.")
+            decoded.append(variables)
+        return decoded
+
+    @staticmethod
+    def decode_filters(filters: str, query_variables: Optional[List[str]] = None) -> Dict[str, List[str]]:
+        """
+        Method for decoding the filters argument, e.g. "SEX=1; AGE=1, 2, 3", into a dictionary of the category codes
+        selected for each variable.
+
+        :param filters: The filters argument.
+        :param query_variables: Optionally, the query variables, to which the filtered variables must belong; when
+            reading from a file, the variables are instead checked against the table once it is read.
+        :raises ValueError: If the filters are malformed, include a variable more than once, or include a variable that
+            isn't being queried.
+        :return: A dictionary of variables and their selected category codes.
+        """
+        decoded: Dict[str, List[str]] = {}
+        for selection in filters.split(";"):
+            variable, separator, codes = selection.partition("=")
+            variable = variable.strip()
+            codes = [code.strip() for code in codes.split(",")]
+            if len(separator) == 0 or len(variable) == 0 or any(len(code) == 0 for code in codes):
+                raise ValueError(f"Invalid filter '{selection.strip()}'; filters must be in the form "
+                                 f"\"VARIABLE=CODE, CODE; VARIABLE=CODE\".")
+            if variable in decoded:
+                raise ValueError(f"Variable {variable} is filtered more than once.")
+            if query_variables is not None and variable not in query_variables:
+                raise ValueError(f"Variable {variable} is filtered but isn't one of the query variables.")
+            decoded[variable] = codes
+        return decoded
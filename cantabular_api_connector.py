@@ -1,8 +1,18 @@
 from api_connector import ApiConnector
-from data_source import DataSource
+from data_source import DataSource, CHUNK_SIZE
+from query_cache import QueryCache
+from table_operations import TableOperations
+from type_hints import *
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+from collections import OrderedDict
+from urllib.parse import quote
 from logging import getLogger
 from pyjstat import pyjstat  # type: ignore
+import numpy as np
+import threading
 import requests
+import copy
+import json
 logger = getLogger('DTS-Logger')
 
 
@@ -11,32 +21,339 @@ class CantabularApiConnector(ApiConnector, DataSource):
     Class for communicating directly with the Cantabular API, in order to retrieve a jsonstat dataset based on
     specific queries. Currently only configured to work with data (i.e., not metadata).
 
+    Where a geography variable and a partition size are given, and the geography has more categories than the partition
+    size, the query is split into partitions of the geography categories (using category filters), which are retrieved
+    concurrently and merged into a single table, identical to the one the whole query would have returned.
+
+    Identical queries made at the same time (by connectors in different threads) share a single request: the first
+    connector retrieves the table, and every connector then receives its own copy of the table's metadata with a
+    read-only view of the same values.
+
     :param dataset: Name/ID of a dataset to retrieve from the Cantabular system.
     :param variables: A list containing valid variables.
+    :param filters: Optionally, a dictionary of variables and the category codes to which each is restricted; only the
+        selected categories are then tallied and transferred by Cantabular.
+    :param cache: Optionally, a `QueryCache` in which query results are kept between runs.
+    :param geography: Optionally, the geography variable of the query, along which the query may be partitioned.
+    :param partition_size: Optionally, the maximum number of geography categories to retrieve in a single request.
+    :param max_workers: The maximum number of partitions to retrieve at once.
     :ivar query_url: URL with endpoints derived from params dataset and variables.
     :vartype query_url: str
+    :cvar in_flight: The queries currently being retrieved, keyed by query_key(), with the futures of their tables.
+    :vartype in_flight: Dict[tuple, Future]
 
     """
-    def __init__(self, dataset: str, variables: list, credentials, address, port=None) -> None:
+
+    in_flight: Dict[tuple, Future] = {}
+    in_flight_lock = threading.Lock()
+
+    def __init__(self, dataset: str, variables: list, credentials, address, port=None,
+                 filters: Optional[Dict[str, List[str]]] = None,
+                 cache: Optional[QueryCache] = None, geography: Optional[str] = None,
+                 partition_size: Optional[int] = None, max_workers: int = 4) -> None:
         super().__init__(credentials, address, port)
 
         self.dataset = dataset
         self.variables = variables
+        self.filters = filters if filters is not None else {}
+        self.cache = cache
+        self.geography = geography
+        self.partition_size = partition_size
+        self.max_workers = max_workers
+
+        # Construct the query url with endpoints using base url (client), dataset, variables and filters.
+        self.query_url = self.build_query_url(dataset, variables, self.filters)
+
+    def build_query_url(self, dataset: str, variables: List[str], filters: Optional[Dict[str, List[str]]] = None) -> str:
+        """
+        Method for constructing the URL of a query for a dataset and a list of variables, optionally restricting any of
+        the variables to some of their categories.
+
+        :param dataset: Name/ID of a dataset.
+        :param variables: A list containing valid variables.
+        :param filters: Optionally, a dictionary of variables and the category codes to which each is restricted.
+        :return: The query URL.
+        """
+        parameters = [f'v={v}' for v in variables]
+        if filters:
+            parameters += [f'f={v},{",".join(quote(code, safe="") for code in codes)}' for v, codes in filters.items()]
+        return self.client + '/v8/query-json-stat/%s?%s' % (dataset, '&'.join(parameters))
 
-        # Construct the query url with endpoints using base url (client), dataset and variables.
-        self.query_url = self.client + '/v8/query-json-stat/%s?%s' % (dataset, '&'.join([f'v={v}' for v in variables]))
+    def query_key(self) -> tuple:
+        """
+        Method for returning the key identifying the query among those in flight; the order of the variables is
+        included, as it determines the layout of the table.
+        """
+        filters = tuple(sorted((v, tuple(codes)) for v, codes in self.filters.items()))
+        return self.client, self.session.auth, self.dataset, tuple(self.variables), filters
 
     def query(self) -> pyjstat.Dataset:
         """
         Method for making a query to the Cantabular API using the argument variables. This is the Cantabular API
-            connector version of the query() abstract method, inherited from the `DataSource` class.
+            connector version of the query() abstract method, inherited from the `DataSource` class. If an identical
+            query is already in flight, its table is shared rather than retrieved again.
 
         :raises requests.HTTPError: Raised in the case of a network partition or invalid query to the Cantabular API.
+        :return: A cantabular table in the form of a jsonstat dataframe, with read-only values.
+        """
+        key = self.query_key()
+        with self.in_flight_lock:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self.in_flight[key] = Future()
+
+        if leader:
+            try:
+                future.set_result(self.retrieve_query())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self.in_flight_lock:
+                    del self.in_flight[key]
+        else:
+            logger.info(f"{self.dataset} dataset with variables {self.variables} is already being retrieved; "
+                        f"waiting for it.")
+
+        return self.share(future.result())
+
+    def retrieve_query(self) -> pyjstat.Dataset:
+        """
+        Method for retrieving the table for the query, partitioned along the geography variable where this is configured
+        and worthwhile.
+
+        :return: A cantabular table in the form of a jsonstat dataframe.
+        """
+        if self.geography is not None and self.partition_size is not None:
+            categories = self.geography_categories()
+            if len(categories) > self.partition_size:
+                return self.query_partitioned(categories)
+
+        return self.retrieve(self.variables, self.filters)
+
+    def retrieve(self, variables: List[str], filters: Optional[Dict[str, List[str]]] = None) -> pyjstat.Dataset:
+        """
+        Method for retrieving the table for a single query. If a cache is in use, then a cached result is returned
+            instead where it is fresh or can be revalidated; a stale entry is revalidated with a conditional request if
+            the API supplied an ETag or Last-Modified header, and otherwise by comparing its dataset digest with that of
+            a minimal query for the same dataset. The response is streamed and parsed as it arrives (and written to the
+            cache at the same time), rather than being held in full.
+
+        :param variables: A list containing valid variables.
+        :param filters: Optionally, a dictionary of variables and the category codes to which each is restricted.
         :return: A cantabular table in the form of a jsonstat dataframe.
         """
+        url = self.build_query_url(self.dataset, variables, filters)
+        if self.cache is None:
+            return self.load_jsonstat_stream(self.fetch(url).iter_content(CHUNK_SIZE))
+
+        key = self.cache.key(self.client, self.dataset, variables, filters)
+        entry = self.cache.get(key)
+
+        # The key ignores the order of the variables; a cached table with its variables in another order is reordered
+        if entry is not None and entry["variables"] != list(variables):
+            logger.debug(f"Cached query for {self.dataset} has its variables in a different order; reordering it.")
+
+        headers = {}
+        if entry is not None:
+            if self.cache.is_fresh(entry):
+                return self.load_cached(key, variables)
+            if entry["etag"] is not None:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"] is not None:
+                headers["If-Modified-Since"] = entry["last_modified"]
+            if len(headers) == 0 and self.dataset_digest(entry) == entry["digest"]:
+                self.cache.revalidate(key)
+                return self.load_cached(key, variables)
+
+        res = self.fetch(url, headers)
+        if res.status_code == 304:
+            self.cache.revalidate(key)
+            return self.load_cached(key, variables)
+
+        try:
+            with open(self.cache.temp_path(key), 'wb') as f:
+                table = self.load_jsonstat_stream(self.write_through(res.iter_content(CHUNK_SIZE), f))
+        except Exception:
+            self.cache.discard(key)
+            raise
+
+        digest = table['extension']['cantabular']['dataset']['digest']
+        self.cache.invalidate_dataset(self.client, self.dataset, digest)
+        self.cache.put(key, {
+            "client": self.client,
+            "dataset": self.dataset,
+            "variables": list(variables),
+            "sizes": list(table['size']),
+            "digest": digest,
+            "etag": res.headers.get('ETag'),
+            "last_modified": res.headers.get('Last-Modified')
+        })
+        return table
+
+    def geography_categories(self) -> List[str]:
+        """
+        Method for retrieving the codes of all of the (selected) categories of the geography variable, in order, by
+        querying the dataset for the geography variable alone.
+        """
+        filters = {self.geography: self.filters[self.geography]} if self.geography in self.filters else None
+        table = self.retrieve([self.geography], filters)
+        return list(table['dimension'][self.geography]['category']['index'])
+
+    def query_partitioned(self, categories: List[str]) -> pyjstat.Dataset:
+        """
+        Method for retrieving the table for the query in partitions of the geography categories, concurrently. As each
+        partition arrives, its values are written straight into their place in a cube preallocated for the whole table,
+        and the partition is then discarded.
+
+        :param categories: The codes of all of the categories of the geography variable, in order.
+        :raises ValueError: If the partitions retrieved do not together make up the whole table.
+        :return: The whole table, as a jsonstat dataframe.
+        """
+        partitions = [categories[i:i + self.partition_size] for i in range(0, len(categories), self.partition_size)]
+        logger.info(f"Retrieving {self.dataset} in {len(partitions)} partitions of {self.geography}.")
+
+        cube: Optional[np.ndarray] = None
+        tables: List[Optional[pyjstat.Dataset]] = [None] * len(partitions)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.retrieve, self.variables, dict(self.filters, **{self.geography: partition})): i
+                for i, partition in enumerate(partitions)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                table = future.result()
+                axis = table['id'].index(self.geography)
+                if table['size'][axis] != len(partitions[i]):
+                    raise ValueError(f"Partition {i} of {self.dataset} does not contain the categories requested.")
+
+                values = np.asarray(table['value'])
+                if cube is None:
+                    shape = list(table['size'])
+                    shape[axis] = len(categories)
+                    cube = np.empty(shape, dtype=values.dtype)
+                elif cube.dtype != np.result_type(cube.dtype, values.dtype):
+                    cube = cube.astype(np.result_type(cube.dtype, values.dtype))
+
+                position = [slice(None)] * cube.ndim
+                position[axis] = slice(i * self.partition_size, i * self.partition_size + len(partitions[i]))
+                cube[tuple(position)] = values.reshape(table['size'])
+
+                del table['value']
+                tables[i] = table
+
+        return self.merge_partitions(tables, cube, categories)
+
+    def merge_partitions(self, tables: List[pyjstat.Dataset], cube: np.ndarray,
+                         categories: List[str]) -> pyjstat.Dataset:
+        """
+        Method for combining the metadata of the partitions of a table with its values.
+
+        :param tables: The partitions of the table, in order, without their values.
+        :param cube: The values of the whole table.
+        :param categories: The codes of all of the categories of the geography variable, in order.
+        :raises ValueError: If the geography categories of the partitions differ from those expected.
+        :return: The whole table, as a jsonstat dataframe.
+        """
+        index: List[str] = []
+        labels: Dict[str, str] = OrderedDict()
+        for table in tables:
+            category = table['dimension'][self.geography]['category']
+            index += list(category['index'])
+            labels.update(category['label'])
+        if index != categories:
+            raise ValueError(f"The partitions of {self.dataset} do not match the categories of {self.geography}.")
+
+        merged = tables[0]
+        axis = merged['id'].index(self.geography)
+        merged['size'][axis] = len(categories)
+        merged['dimension'][self.geography]['category']['index'] = index
+        merged['dimension'][self.geography]['category']['label'] = labels
+        blocked = [t['extension']['cantabular']['blocked'] for t in tables if t['extension']['cantabular']['blocked']]
+        merged['extension']['cantabular']['blocked'] = blocked[0] if len(blocked) > 0 else None
+        merged['value'] = cube.reshape(-1)
+
+        logger.info(f"{len(tables)} partitions of {self.dataset} merged successfully.")
+        return merged
+
+    @staticmethod
+    def share(table: pyjstat.Dataset) -> pyjstat.Dataset:
+        """
+        Method for making a copy of a table that can be handed to one of the callers sharing it. The metadata is copied,
+        so that it can be changed freely, while the values (by far the largest part of the table) are shared as a
+        read-only view.
+
+        :param table: The table, as retrieved.
+        :return: A copy of the table, with read-only values.
+        """
+        shared = pyjstat.Dataset(table)
+        for key in ('id', 'size', 'dimension', 'extension'):
+            if key in table:
+                shared[key] = copy.deepcopy(table[key])
+
+        values = table['value']
+        if isinstance(values, np.ndarray):
+            values = values.view()
+            values.flags.writeable = False
+        else:
+            values = copy.deepcopy(values)
+        shared['value'] = values
+        return shared
+
+    def load_cached(self, key: str, variables: Optional[List[str]] = None) -> pyjstat.Dataset:
+        """
+        Method for loading a table from the cache.
+
+        :param key: The key of the cache entry.
+        :param variables: Optionally, the variables in the order in which the table is wanted; the table is reordered
+            if it was cached with its variables in another order.
+        """
+        logger.info(f"{self.dataset} dataset with variables {self.variables} retrieved from the local cache.")
+        with self.cache.open(key) as f:
+            table = self.load_jsonstat_stream(iter(lambda: f.read(CHUNK_SIZE), b''))
+        if variables is not None and sorted(table['id']) == sorted(variables):
+            table = TableOperations.reorder(table, list(variables))
+        return table
+
+    @staticmethod
+    def write_through(chunks: Iterable[bytes], file: BinaryIO) -> Iterable[bytes]:
+        """
+        Generator for writing each chunk of a response to a file as it is passed on.
+        """
+        for chunk in chunks:
+            file.write(chunk)
+            yield chunk
+
+    def dataset_digest(self, entry: dict) -> Union[str, None]:
+        """
+        Method for retrieving the current digest of the dataset of a cache entry, by querying the dataset for only the
+        cached variable with the fewest categories.
+
+        :param entry: The details of a cache entry.
+        :return: The digest of the dataset, or `None` if it could not be retrieved.
+        """
+        smallest = min(range(len(entry["variables"])), key=lambda i: entry["sizes"][i])
+        try:
+            res = self.fetch(self.build_query_url(self.dataset, [entry["variables"][smallest]]))
+            return json.loads(res.content)['extension']['cantabular']['dataset']['digest']
+        except Exception as e:
+            logger.debug(f"Unable to retrieve the digest of {self.dataset}. ({e})")
+            return None
+
+    def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """
+        Method for making a GET request to the Cantabular API and checking the response.
+
+        :param url: The query URL.
+        :param headers: Optionally, additional headers to send with the request.
+
+        :raises requests.ConnectionError: If the API cannot be reached.
+        :raises requests.HTTPError: If a negative response is received from the API.
+        :return: The response received from the API.
+        """
         try:
             logger.debug(f"Attempting to connect to the Cantabular API at {self.client}.")
-            res = self.session.get(self.query_url)
+            res = self.session.get(url, headers=headers, stream=True)
             logger.info(f"Connection successfully established with the Cantabular API at {self.client}.")
         except Exception as e:
             raise requests.ConnectionError(f"Unable to connect to client. ({e})")
@@ -55,7 +372,6 @@ class CantabularApiConnector(ApiConnector, DataSource):
         elif not res.ok:
             raise requests.HTTPError(f'Bad response from the Cantabular API: {res.text}.')
 
-        logger.info(f"{self.dataset} dataset with variables {self.variables} retrieved successfully.")
-
-        # Load response into a pyjstat dataframe.
-        return self.load_jsonstat(res.content.decode('utf-8'))
+        if res.status_code != 304:
+            logger.info(f"{self.dataset} dataset with variables {self.variables} retrieved successfully.")
+        return res
@@ -30,6 +30,11 @@ DEFAULT_CONFIG_FILE = '''
     "address": "https://localhost",
     "port": "5001"
   },
+  "Cantabular Cache": null,
+  "Cantabular Partitioning": null,
+  "Rate Limits": null,
+  "Nomis Catalog": null,
+  "Metadata Cache": null,
   "Geography Variables": [
     "OA",
     "LSOA",
@@ -129,6 +129,20 @@ class ConfigManager:
 
         return json.loads(geography_variables)
 
+    def decode_options(self, key: str) -> Union[dict, None]:
+        """
+        Retrieve the settings of an optional feature from the config file for the 'key' parameter.
+
+        :param key: The 'key' corresponding to the feature in the config file - e.g. 'Cantabular Cache'.
+        :return: A dictionary of the settings, or `None` if the feature has not been configured (i.e., is missing from
+            the config file, or set to null); each of the optional features is off unless configured.
+        """
+        options = self.config.get(key)
+
+        if options is not None and not isinstance(options, dict):
+            raise TypeError(f"{key} must be either an object or null. Please check the config file.")
+        return options
+
     def decode_configuration(self) -> Configuration:
         """
         Create an instance of Configuration by combining an instances of Credentials and ConnectionInfo for each of
@@ -159,4 +173,13 @@ class ConfigManager:
         # Add the geography to the configurations
         variables = {"geography": self.decode_geography_variables("Geography Variables")}
 
-        return Configuration(configurations, variables)
+        # Add the settings of the optional features
+        options = {
+            "cantabular_cache": self.decode_options("Cantabular Cache"),
+            "cantabular_partitioning": self.decode_options("Cantabular Partitioning"),
+            "rate_limits": self.decode_options("Rate Limits"),
+            "nomis_catalog": self.decode_options("Nomis Catalog"),
+            "metadata_cache": self.decode_options("Metadata Cache")
+        }
+
+        return Configuration(configurations, variables, options)
@@ -12,18 +12,24 @@ class Configuration:
 
     :param config: A list of `namedtuple`s containing instances of ConnectionInfo and Credentials for all APIs.
     :param var: Dictionary of special variables that must be acknowledged by the program.
+    :param options: Dictionary of the settings of optional features, such as the Cantabular cache.
     :ivar config: Initial value: config.
     :vartype config: Dict[str, CredentialsConninfo, List[str]]
     :ivar var: Initial value: var.
     :vartype var: Optional[Dict[List[str]]
+    :ivar options: Initial value: options.
+    :vartype options: Optional[Dict[str, Optional[dict]]]
     """
 
     config: Dict[str, CredentialsConninfo]
     var: Union[Dict[str, List[str]], None]
+    options: Union[Dict[str, Union[dict, None]], None]
 
-    def __init__(self, config: Dict[str, CredentialsConninfo], var: Dict[str, List[str]] = None) -> None:
+    def __init__(self, config: Dict[str, CredentialsConninfo], var: Dict[str, List[str]] = None,
+                 options: Dict[str, Union[dict, None]] = None) -> None:
         self.config = config
         self.var = var
+        self.options = options
 
     def get_credentials(self, api: str) -> Tuple[str, str]:
         """
@@ -69,3 +75,14 @@ class Configuration:
             return self.var["geography"]
         except KeyError:
             raise KeyError(f"Geography is not recognised")
+
+    def get_options(self, feature: str) -> Union[dict, None]:
+        """
+        Method for returning the settings of an optional feature.
+
+        :param feature: String representing the feature, e.g. cantabular_cache.
+        :return: A dictionary of the settings of the feature, or `None` if the feature is disabled or not configured.
+        """
+        if self.options is None:
+            return None
+        return self.options.get(feature.lower())
@@ -1,8 +1,13 @@
+from jsonstat_parser import JsonStatParser
+from type_hints import *
 from logging import getLogger
 from pyjstat import pyjstat  # type: ignore
 from abc import abstractmethod
 logger = getLogger("DTS-Logger")
 
+# Number of bytes read at a time when streaming a dataset
+CHUNK_SIZE = 1024 * 1024
+
 
 class DataSource:
     """
@@ -32,8 +37,31 @@ class DataSource:
         """
 
         # Load response into a pyjstat dataframe.
-        table = pyjstat.Dataset.read(data)
+        return DataSource.verify_jsonstat(JsonStatParser.intern_categories(pyjstat.Dataset.read(data)))
+
+    @staticmethod
+    def load_jsonstat_stream(chunks: Iterable[bytes]) -> pyjstat.Dataset:
+        """
+        Static method for parsing a JSONstat dataset as it is streamed in, chunk by chunk, and returning a valid/verified
+        pyjstat dataframe. Unlike load_jsonstat(), the value array of the dataframe is a numpy array.
 
+        :param chunks: The bytes of the dataset, in order.
+        :return: A pyjstat Dataframe containing the query information.
+        """
+        parser = JsonStatParser()
+        for chunk in chunks:
+            parser.feed(chunk)
+        return DataSource.verify_jsonstat(parser.close())
+
+    @staticmethod
+    def verify_jsonstat(table: pyjstat.Dataset) -> pyjstat.Dataset:
+        """
+        Static method for verifying that a pyjstat dataframe represents a Cantabular dataset, and reporting any blocked
+        categories.
+
+        :raises ValueError: If the dataframe does not represent a valid dataset.
+        :return: The dataframe, once verified.
+        """
         if 'extension' not in table:
             raise ValueError("The file used to initialise the table does not represent a valid dataset.")
 
@@ -1,6 +1,9 @@
 from type_hints import *
 from pyjstat import pyjstat  # type: ignore
+from table_operations import TableOperations
+from table_view import TableView
 from logging import getLogger
+import numpy as np
 
 logger = getLogger("DTS-Logger")
 
@@ -11,32 +14,163 @@ class DatasetTransformations:
     to the Nomis system.
 
     :param table: A pyjstat dataframe containing the data to be used/transformed.
-    :ivar table: Initial value: table.
+    :param geography_flag: Whether the dataset has a geography.
+    :param table_geography: The table including the geography, if `table` is a view of it without the geography.
+    :param geography: The name of the geography variable of `table_geography`; by default, the last of the dimensions
+        hidden from `table`.
+    :ivar table: Initial value: table; or, if it is a view, the same view of `table_geography`.
     :vartype table: Dataset
+    :ivar table_geography: Initial value: table_geography, reordered so that the geography comes first.
+    :vartype table_geography: Union[Dataset, None]
+    :ivar geography: The name of the geography variable, if there is one.
+    :vartype geography: Union[str, None]
+    :ivar dimensions: The index of the dimensions of the table, built once on initialisation and read by each of the
+        request builders.
+    :vartype dimensions: Tuple[DimensionIndex, ...]
+    :ivar observation_dimensions: The index of the dimensions of the table from which observations are made (i.e.,
+        `table_geography`, if given).
+    :vartype observation_dimensions: Tuple[DimensionIndex, ...]
     """
 
     def __init__(self, table: pyjstat.Dataset,
                  geography_flag: bool = False,
-                 table_geography: Union[pyjstat.Dataset, None] = None) -> None:
+                 table_geography: Union[pyjstat.Dataset, None] = None,
+                 geography: Optional[str] = None) -> None:
         self.table = table
         self.geography_flag = geography_flag
         self.table_geography = table_geography
         self.validate_table()
 
+        # The geography is the first dimension of the observations, as it is of the dimensions of the dataset
+        if table_geography is not None and geography is None:
+            hidden = [name for name in table_geography["id"] if name not in table["dimension"]]
+            geography = hidden[-1] if len(hidden) > 0 else None
+        self.geography = geography if geography_flag else None
+        if table_geography is not None and self.geography is not None:
+            self.table_geography = table_geography = TableOperations.move_to_front(table_geography, [self.geography])
+            if isinstance(table, TableView):
+                self.table = table = TableView(table_geography, table.excluded)
+        self.dimensions = self.index_dimensions(table)
+        self.observation_dimensions = self.index_dimensions(table_geography) if table_geography is not None \
+            else self.dimensions
+
     def validate_table(self):
         """
-        Method for validating the table, ensuring it is of the correct type and contains sufficient keys.
+        Method for validating the table, ensuring it is of the correct type and contains sufficient keys, and that its
+        values and categories are sound (see validate_cube()); so that a malformed table is rejected before anything is
+        sent to Nomis.
 
-        :raises TypeError: If the dataset is not of the correct type, i.e., a pyjstat Dataset.
+        :raises TypeError: If the dataset is not of the correct type, i.e., a pyjstat Dataset, or its values are not
+            numbers.
         :raises LookupError: If the table is devoid of a "dimension" key, which is required for the transformations.
+        :raises ValueError: If the values or categories of the table are malformed.
         """
         if not isinstance(self.table, pyjstat.Dataset):
             raise TypeError(f"Table was detected as type {type(self.table)}. "
                             f"This is invalid, the table must be a pyjstat.Dataset.")
         if "dimension" not in self.table:
             raise KeyError("Table supplied contains no dimensions key.")
+        self.validate_cube(self.table_geography if self.table_geography is not None else self.table)
         logger.debug("Table validated successfully.")
 
+    @staticmethod
+    def validate_cube(table: pyjstat.Dataset) -> None:
+        """
+        Method for validating the values of a table and the categories of its dimensions as a whole, with numpy
+        reductions over the value array rather than a check of each value. The size of each dimension must match its
+        categories, the categories of each dimension must be distinct, and there must be one value for each cell of the
+        table; each value must be a non-negative integer, or null. A view of a table is validated as the whole table.
+
+        :raises KeyError: If the table has no values, or a dimension named in its id is missing.
+        :raises TypeError: If any value is not a number.
+        :raises ValueError: If the sizes, categories or values of the table are malformed.
+        """
+        whole = table.table if isinstance(table, TableView) else table
+        names = whole["id"] if "id" in whole else list(whole["dimension"])
+        missing = [name for name in names if name not in whole["dimension"]]
+        if len(missing) > 0:
+            raise KeyError(f"Table has no dimension information for {', '.join(missing)}.")
+
+        sizes = []
+        for name in names:
+            index = whole["dimension"][name]["category"]["index"]
+            if isinstance(index, dict):
+                positions = np.fromiter(index.values(), dtype=np.int64, count=len(index))
+                if not np.array_equal(np.sort(positions), np.arange(len(index))):
+                    raise ValueError(f"The categories of {name} do not have distinct positions from 0 to "
+                                     f"{len(index) - 1}.")
+            elif len(set(index)) != len(index):
+                raise ValueError(f"The categories of {name} include {len(index) - len(set(index))} duplicate codes.")
+            sizes.append(len(index))
+        if "size" in whole and list(whole["size"]) != sizes:
+            raise ValueError(f"Table size {whole['size']} does not match the numbers of categories, {sizes}.")
+
+        if "value" not in whole:
+            raise KeyError("Table supplied contains no values.")
+        cells = int(np.prod(sizes))
+        values = whole["value"]
+        if isinstance(values, dict):
+            positions = np.array([int(position) for position in values], dtype=np.int64)
+            if np.any(positions < 0) or np.any(positions >= cells):
+                raise ValueError(f"Table has values for positions outside its {cells} cells.")
+            values = list(values.values())
+        else:
+            values = np.asarray(values)
+            if values.size != cells:
+                raise ValueError(f"Table has {values.size} values, but its dimensions have {cells} cells.")
+
+        values = np.asarray(values)
+        if values.dtype == object:
+            try:
+                values = values[values != None].astype(float)  # noqa: E711 (element-wise comparison)
+            except (TypeError, ValueError):
+                raise TypeError("Table contains values that are not numbers.")
+        elif values.dtype.kind not in "iuf":
+            raise TypeError(f"Table contains values of type {values.dtype}, rather than numbers.")
+
+        if values.dtype.kind == "f":
+            values = values[~np.isnan(values)]
+            if np.any(np.isinf(values)):
+                raise ValueError("Table contains infinite values.")
+            if np.any(values != np.floor(values)):
+                raise ValueError(f"Table contains {int(np.count_nonzero(values != np.floor(values)))} values that "
+                                 f"are not integers.")
+        if np.any(values < 0):
+            raise ValueError(f"Table contains {int(np.count_nonzero(values < 0))} negative values.")
+
+    @staticmethod
+    def index_dimensions(table: pyjstat.Dataset) -> Tuple[DimensionIndex, ...]:
+        """
+        Method for indexing the dimensions of a table in a single pass: the name, label, codes (in order) and category
+        labels of each dimension, along with its size and its stride in the values of the table (i.e., the distance
+        between the values of consecutive categories). The strides of a view of a table are those of the whole table.
+        The codes and labels are the strings of the table itself, so nothing is copied but the references to them.
+
+        :param table: A pyjstat dataframe.
+        :return: A tuple of `DimensionIndex` namedtuples, one per dimension, in order.
+        """
+        whole = table.table if isinstance(table, TableView) else table
+        names = whole["id"] if "id" in whole else list(whole["dimension"])
+
+        sizes = [len(whole["dimension"][name]["category"]["index"]) for name in names]
+        strides = [int(np.prod(sizes[position + 1:])) for position in range(len(sizes))]
+
+        index = []
+        for name, size, stride in zip(names, sizes, strides):
+            if name not in table["dimension"]:
+                continue
+            codes = TableOperations.codes(whole, name)
+            labels = whole["dimension"][name]["category"].get("label") or {}
+            index.append(DimensionIndex(
+                name=name,
+                label=table["dimension"][name]["label"],
+                codes=tuple(codes),
+                labels=tuple(labels.get(code, code) for code in codes),
+                size=size,
+                stride=stride
+            ))
+        return tuple(index)
+
     @staticmethod
     def dataset_creation(dataset_id: str, dataset_title: str) -> NomisDataset:
         """
@@ -82,11 +216,11 @@ class DatasetTransformations:
         """
         requests = [
             {
-                "name": dimension,
-                "label": self.table["dimension"][dimension]["label"],
+                "name": dimension.name,
+                "label": dimension.label,
                 "defaults": None
             }
-            for dimension in self.table["dimension"]
+            for dimension in self.dimensions
         ]
         logger.debug("Prepared the variable requests.")
         return requests
@@ -100,13 +234,13 @@ class DatasetTransformations:
         :return: A list of types (should usually be a single dictionary inside of a list)
         """
         requests = []
-        for dimension in self.table["dimension"]:
+        for dimension in self.dimensions:
             requests.append(
                 {
                     "id": "1000000",
-                    "reference": dimension,
-                    "title": self.table["dimension"][dimension]["label"],
-                    "titlePlural": self.table["dimension"][dimension]["label"],
+                    "reference": dimension.name,
+                    "title": dimension.label,
+                    "titlePlural": dimension.label,
                 }
             )
         logger.debug("Prepared types requests.")
@@ -124,12 +258,12 @@ class DatasetTransformations:
 
         requests = []
         counter = 0
-        for dimension in self.table["dimension"]:
-            for label in self.table["dimension"][dimension]["category"]["label"]:
+        for dimension in self.dimensions:
+            for code, label in zip(dimension.codes, dimension.labels):
                 requests.append(
                     {
-                        "code": label,
-                        "title": self.table["dimension"][dimension]["category"]["label"][label],
+                        "code": code,
+                        "title": label,
                         "ancestors": None,
                         "typeId": type_ids[counter],
                         "validity": {
@@ -178,18 +312,18 @@ class DatasetTransformations:
             )
             index += 1
 
-        for dimension in self.table["dimension"]:
-            if dimension == key:
+        for dimension in self.dimensions:
+            if dimension.name == key:
                 is_key = True
             else:
                 is_key = False
             requests.append(
                 {
-                    "name": dimension,
-                    "label": self.table["dimension"][dimension]["label"],
+                    "name": dimension.name,
+                    "label": dimension.label,
                     "isAdditive": True,
                     "variable": {
-                        "name": dimension,
+                        "name": dimension.name,
                         "view": None
                     },
                     "role": "Normal",
@@ -231,17 +365,9 @@ class DatasetTransformations:
 
         dimensions = []
         codes = []
-
-        counter = 0
-        for dimension in data["dimension"]:
-            if counter == 0:
-                dimensions.append("geography")
-                codes.append(data["dimension"][dimension]["category"]["index"])
-                counter += 1
-                continue
-
-            dimensions.append(dimension)
-            codes.append(data["dimension"][dimension]["category"]["index"])
+        for dimension in self.observation_dimensions:
+            dimensions.append("geography" if dimension.name == self.geography else dimension.name)
+            codes.append(list(dimension.codes))
 
         logger.debug("Prepared observations.")
         return (
@@ -249,11 +375,35 @@ class DatasetTransformations:
                 "dataset": dataset_id,
                 "dimensions": dimensions,
                 "codes": codes,
-                "values": data["value"],
+                "values": self.serialise_values(data["value"]),
                 "statuses": None
             }
         )
 
+    @staticmethod
+    def serialise_values(values: Union[list, np.ndarray]) -> list:
+        """
+        Method for converting the values of a table into a list that can be encoded as JSON. Tables streamed from
+        Cantabular hold their values in a numpy array, of integers, or of floats (with NaN for null) if any value is not
+        an integer.
+
+        :param values: The values of a table, either as a list or a numpy array.
+        :return: The values as a list, with `None` in place of NaN, and integers in place of any integral floats.
+        """
+        if not isinstance(values, np.ndarray):
+            return values
+        if values.dtype.kind != 'f':
+            return values.tolist()
+
+        missing = np.isnan(values)
+        filled = np.where(missing, 0, values)
+        if np.array_equal(filled, np.round(filled)):
+            serialised = filled.astype(np.int64).astype(object)
+        else:
+            serialised = values.astype(object)
+        serialised[missing] = None
+        return serialised.tolist()
+
     @staticmethod
     def variable_metadata_request(uuids_metadata: List[UuidMetadata]) -> list:
         """
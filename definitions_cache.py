@@ -0,0 +1,223 @@
+from type_hints import *
+from file_lock import FileLock
+from contextlib import contextmanager
+from logging import getLogger
+import threading
+import tempfile
+import copy
+import json
+import time
+import os
+logger = getLogger("DTS-Logger")
+
+Metadata = Dict[str, Union[str, List[str]]]
+
+
+class DefinitionsCache:
+    """
+    Class for keeping a local copy of all of the metadata definitions on a Nomis metadata server, so that the full list
+    need not be downloaded each time the existing metadata is checked. The definitions are kept in a JSON file, per
+    client, and are used until they are `ttl` seconds old; in the meantime, they are updated in place with any metadata
+    added or updated through the utility. The definitions are indexed by their id and by the object they belong to.
+
+    The file may be shared by several processes: each change is made while holding a lock on the file, to the
+    definitions as last written by any of them, so that no process overwrites the changes of another.
+
+    The cache is bounded: a list of more than `max_size` definitions is not cached, and the definitions of the clients
+    refreshed least recently are dropped once the cache holds more than `max_size` definitions in total.
+
+    :param path: Path of the JSON file.
+    :param ttl: The number of seconds for which the definitions are used.
+    :param max_size: The maximum number of definitions kept.
+
+    :ivar path: Initial value: path.
+    :vartype path: str
+    :ivar ttl: Initial value: ttl.
+    :vartype ttl: int
+    :ivar max_size: Initial value: max_size.
+    :vartype max_size: int
+    """
+
+    def __init__(self, path: str, ttl: int, max_size: int) -> None:
+        if not isinstance(path, str):
+            raise TypeError("The metadata cache path must be a valid string. Please check the config file.")
+        if not isinstance(ttl, int) or not isinstance(max_size, int):
+            raise TypeError("The metadata cache ttl and max_size must be integers. Please check the config file.")
+        if ttl < 0 or max_size < 0:
+            raise ValueError("The metadata cache ttl and max_size cannot be negative. Please check the config file.")
+
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if len(directory) > 0:
+            os.makedirs(directory, exist_ok=True)
+
+        # The definitions of each client, keyed by id, and the ids of the definitions belonging to each object
+        self.refreshed: Dict[str, float] = {}
+        self.by_id: Dict[str, Dict[str, Metadata]] = {}
+        self.by_object: Dict[str, Dict[str, List[str]]] = {}
+        # The modification time and size of the file when it was last read or written
+        self.version: Optional[Tuple[int, int]] = None
+        self.load()
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """
+        Context manager for changing the cache while holding the lock on its file, so that no other thread or process
+        changes it in the meantime. The definitions are first reloaded if another process has changed the file, so
+        that its changes are kept when the file is next written (by save()).
+        """
+        with self.lock, FileLock(f"{self.path}.lock"):
+            self.load()
+            yield
+
+    def load(self) -> None:
+        """
+        Method for reading the definitions from the file, if it has changed since it was last read or written.
+        """
+        try:
+            stat = os.stat(self.path)
+            version: Optional[Tuple[int, int]] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            version = None
+        if version == self.version:
+            return
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+        self.refreshed, self.by_id, self.by_object = {}, {}, {}
+        for client, entry in entries.items():
+            self.index(client, entry["definitions"], entry["refreshed"])
+        self.version = version
+
+    def index(self, client: str, definitions: List[Metadata], refreshed: float) -> None:
+        """
+        Method for replacing the definitions of a client, and their indices.
+        """
+        self.refreshed[client] = refreshed
+        self.by_id[client] = {}
+        self.by_object[client] = {}
+        for data in definitions:
+            self.add(client, data)
+
+    def add(self, client: str, data: Metadata) -> None:
+        """
+        Method for adding (or replacing) a single definition in the indices of a client.
+        """
+        id = str(data["id"])
+        previous = self.by_id[client].get(id)
+        if previous is not None and previous.get("belongsTo") is not None:
+            self.by_object[client][str(previous["belongsTo"])].remove(id)
+        self.by_id[client][id] = data
+        if data.get("belongsTo") is not None:
+            self.by_object[client].setdefault(str(data["belongsTo"]), []).append(id)
+
+    def fresh(self, client: str) -> bool:
+        """
+        Method for checking whether the definitions of a client are cached and less than `ttl` seconds old.
+        """
+        return client in self.refreshed and time.time() - self.refreshed[client] < self.ttl
+
+    def get(self, client: str) -> Optional[List[Metadata]]:
+        """
+        Method for retrieving all of the definitions of a client.
+
+        :return: A copy of the definitions, or `None` if they are not cached or too old.
+        """
+        with self.lock:
+            self.load()
+            if not self.fresh(client):
+                return None
+            logger.debug(f"{len(self.by_id[client])} metadata definitions for {client} found in the local cache.")
+            return copy.deepcopy(list(self.by_id[client].values()))
+
+    def get_for_objects(self, client: str, objects: List[str]) -> Optional[Dict[str, List[Metadata]]]:
+        """
+        Method for retrieving the definitions of a client that belong to each of several objects, from the index of the
+        definitions by the object they belong to; only these definitions are copied.
+
+        :return: A copy of the definitions belonging to each object (possibly none), keyed by object; or `None` if the
+            definitions are not cached or too old.
+        """
+        with self.lock:
+            self.load()
+            if not self.fresh(client):
+                return None
+            return {str(belongs_to): [copy.deepcopy(self.by_id[client][id])
+                                      for id in self.by_object[client].get(str(belongs_to), [])]
+                    for belongs_to in objects}
+
+    def put(self, client: str, definitions: List[Metadata]) -> None:
+        """
+        Method for caching all of the definitions of a client, as retrieved from the server.
+        """
+        with self.locked():
+            if len(definitions) > self.max_size:
+                logger.debug(f"{len(definitions)} metadata definitions for {client} is too many to cache.")
+                self.discard_client(client)
+            else:
+                self.index(client, copy.deepcopy(definitions), time.time())
+                self.evict(client)
+            self.save()
+
+    def update(self, client: str, definitions: List[Metadata]) -> None:
+        """
+        Method for updating the cached definitions of a client in place, once metadata has been added or updated on
+        the server. Each definition given is merged into the cached definition with the same id (so that a partial
+        update leaves the other fields as they were), or added if there is none. Nothing is done if the definitions of
+        the client are not cached or too old.
+        """
+        with self.locked():
+            if not self.fresh(client):
+                return
+            for data in definitions:
+                merged = dict(self.by_id[client].get(str(data["id"]), {}))
+                merged.update(copy.deepcopy(data))
+                self.add(client, merged)
+            if len(self.by_id[client]) > self.max_size:
+                self.discard_client(client)
+            self.save()
+
+    def discard(self, client: str) -> None:
+        """
+        Method for removing the cached definitions of a client, e.g. once they are known to be out of date.
+        """
+        with self.locked():
+            self.discard_client(client)
+            self.save()
+
+    def discard_client(self, client: str) -> None:
+        self.refreshed.pop(client, None)
+        self.by_id.pop(client, None)
+        self.by_object.pop(client, None)
+
+    def evict(self, keep: str) -> None:
+        """
+        Method for dropping the definitions of the clients refreshed least recently (other than `keep`) until at most
+        `max_size` definitions are cached.
+        """
+        for client in sorted(self.refreshed, key=self.refreshed.get):
+            if sum(len(definitions) for definitions in self.by_id.values()) <= self.max_size:
+                break
+            if client != keep:
+                self.discard_client(client)
+
+    def save(self) -> None:
+        """
+        Method for writing the cache to its file, while holding the lock (see locked()). The file is replaced in a
+        single step, so that other processes never read a partial file.
+        """
+        entries = {client: {"refreshed": self.refreshed[client], "definitions": list(self.by_id[client].values())}
+                   for client in self.refreshed}
+        directory = os.path.dirname(self.path)
+        fd, temp = tempfile.mkstemp(dir=directory if len(directory) > 0 else None, suffix=".tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(temp, self.path)
+        stat = os.stat(self.path)
+        self.version = (stat.st_mtime_ns, stat.st_size)
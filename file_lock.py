@@ -0,0 +1,67 @@
+from type_hints import *
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    Class for an exclusive lock on a file, shared by every process (and thread) on the host that uses the same path;
+    used as a context manager, e.g. around the read-modify-replace of a file shared between processes. The lock file
+    itself is created if necessary, and is left in place.
+
+    :param path: The path of the lock file.
+
+    :ivar path: Initial value: path.
+    :vartype path: str
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file: Optional[BinaryIO] = None
+
+    def __enter__(self) -> "FileLock":
+        self.file = open(self.path, 'a+b')
+        try:
+            self.lock(self.file)
+        except BaseException:
+            self.file.close()
+            raise
+        return self
+
+    def __exit__(self, *args) -> None:
+        try:
+            self.unlock(self.file)
+        finally:
+            self.file.close()
+            self.file = None
+
+    @staticmethod
+    def lock(file: BinaryIO) -> None:
+        """
+        Method for taking an exclusive lock on an open file, waiting for any other process holding it.
+        """
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                    return
+                except OSError:
+                    # LK_LOCK gives up after ten seconds
+                    continue
+
+    @staticmethod
+    def unlock(file: BinaryIO) -> None:
+        """
+        Method for releasing the lock on an open file.
+        """
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
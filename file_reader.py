@@ -5,6 +5,9 @@ import json
 import os
 logger = getLogger("DTS-Logger")
 
+# Number of bytes from the start of a file used to detect its encoding
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
 
 class FileReader:
     """
@@ -39,11 +42,23 @@ class FileReader:
             logger.debug(f"File '{self.file}' has been found to exist.")
             return True
 
+    def detect_encoding(self) -> str:
+        """
+        Detect the encoding of the file from a sample of its start, rather than the whole file. As a sample that is
+        entirely ASCII says nothing of the rest of the file, ASCII is widened to UTF-8 (of which it is a subset).
+        """
+        with open(self.file, 'rb') as f:
+            enc = chardet.detect(f.read(ENCODING_SAMPLE_SIZE))['encoding']
+        if enc is None or enc.lower() == 'ascii':
+            enc = 'utf-8'
+        logger.debug(f"File '{self.file}' detected as {enc}.")
+        return enc
+
     def load_json(self) -> dict:
         """
         Check the encoding of the file and load it in as a json string.
         """
-        enc = chardet.detect(open(self.file, 'rb').read())['encoding']
+        enc = self.detect_encoding()
         with open(self.file, 'r', encoding=enc) as json_file:
             data = json.load(json_file)
         return data
@@ -0,0 +1,84 @@
+from file_reader import FileReader
+from type_hints import *
+from logging import getLogger
+import csv
+logger = getLogger("DTS-Logger")
+
+
+class GeographyLookupReader(FileReader):
+    """
+    Class for reading a geography lookup file; that is, a CSV file with a header naming the geography levels from the
+    finest to the coarsest (e.g. "OA,LSOA,MSOA,LA"), followed by a row for each category of the finest level giving the
+    code of the category that contains it at each of the levels.
+
+    :param file: A string representing the location of a file for use in the program.
+
+    :ivar levels: The geography levels, from the finest to the coarsest, once the file has been read.
+    :vartype levels: List[str]
+    :ivar rows: The codes of each row of the file, once it has been read.
+    :vartype rows: List[List[str]]
+    """
+
+    def __init__(self, file: str) -> None:
+        super().__init__(file)
+        self.levels: List[str] = []
+        self.rows: List[List[str]] = []
+
+    def read(self) -> 'GeographyLookupReader':
+        """
+        Method for reading the lookup file.
+
+        :raises FileNotFoundError: If the lookup file can't be located.
+        :raises ValueError: If the file has fewer than two levels, a level named more than once, or a row with the wrong
+            number of codes.
+        :return: The reader itself, once the file has been read.
+        """
+        self.exists()
+        encoding = self.detect_encoding()
+        with open(self.file, 'r', newline='', encoding='utf-8-sig' if encoding.lower() == 'utf-8' else encoding) as f:
+            reader = csv.reader(f)
+            self.levels = [level.strip() for level in next(reader, [])]
+            self.rows = [[code.strip() for code in row] for row in reader if len(row) > 0]
+
+        if len(self.levels) < 2:
+            raise ValueError(f"The geography lookup file {self.file} must name at least two geography levels.")
+        if len(set(self.levels)) != len(self.levels):
+            raise ValueError(f"The geography lookup file {self.file} names a geography level more than once.")
+        for number, row in enumerate(self.rows, 2):
+            if len(row) != len(self.levels):
+                raise ValueError(f"Line {number} of the geography lookup file {self.file} has {len(row)} codes, "
+                                 f"rather than one for each of the {len(self.levels)} levels.")
+
+        logger.info(f"Read a geography lookup of {len(self.rows)} rows, for levels {', '.join(self.levels)}.")
+        return self
+
+    def coarser_levels(self, level: str) -> List[str]:
+        """
+        Method for listing the levels coarser than a given level, from the finest to the coarsest.
+
+        :raises KeyError: If the level is not in the lookup.
+        """
+        if level not in self.levels:
+            raise KeyError(f"Geography level {level} is not in the geography lookup file {self.file}.")
+        return self.levels[self.levels.index(level) + 1:]
+
+    def parents(self, level: str, parent_level: str) -> Dict[str, str]:
+        """
+        Method for retrieving the code of the category containing each category of one level at a coarser level.
+
+        :raises KeyError: If either level is not in the lookup.
+        :raises ValueError: If a category is contained by more than one category of the coarser level.
+        :return: A dictionary of the codes of the coarser level, keyed by the codes of the finer level, in the order in
+            which they first appear in the file.
+        """
+        for name in (level, parent_level):
+            if name not in self.levels:
+                raise KeyError(f"Geography level {name} is not in the geography lookup file {self.file}.")
+        child, parent = self.levels.index(level), self.levels.index(parent_level)
+
+        parents: Dict[str, str] = {}
+        for row in self.rows:
+            if parents.setdefault(row[child], row[parent]) != row[parent]:
+                raise ValueError(f"{level} {row[child]} is in more than one {parent_level} in the geography lookup "
+                                 f"file {self.file}.")
+        return parents
@@ -0,0 +1,210 @@
+from type_hints import *
+from collections import OrderedDict
+from functools import reduce
+from logging import getLogger
+from pyjstat import pyjstat  # type: ignore
+import numpy as np
+import json
+import re
+logger = getLogger("DTS-Logger")
+
+# A complete JSON string, an unterminated one, or a bracket
+TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|"|[\[\]{}]')
+# What may follow the top-level "value" key: the start of an array, or whatever hasn't yet arrived
+VALUE_ARRAY = re.compile(rb'\s*:\s*\[')
+INCOMPLETE = re.compile(rb'\s*(?::\s*)?')
+# The characters that may make up a run of values
+INTEGER_CHARACTERS = b'0123456789-, \t\r\n'
+FLOAT_CHARACTERS = INTEGER_CHARACTERS + b'.eE+na'
+
+
+class JsonStatParser:
+    """
+    Class for parsing a JSON-stat dataset incrementally, as its bytes arrive, so that a large response never needs to be
+    held in memory in full. Everything other than the value array (i.e., the dimension metadata) is kept as JSON text
+    and parsed when the dataset is complete, while the value array is parsed chunk by chunk straight into a numpy array,
+    preallocated from the `size` of the dataset where the size is given before the values (as Cantabular does).
+
+    Values are held as 64-bit integers; the array is converted to floats (with NaN for null) only if any value in the
+    dataset is not an integer. If the value array cannot be streamed (for instance, if it is given in the sparse,
+    object form), the dataset is instead buffered in full and parsed once complete.
+
+    The category codes and labels of the dataset are interned as it is completed (see intern_categories()).
+
+    :ivar head: The JSON text preceding the value array.
+    :vartype head: bytearray
+    :ivar values: The value array, once its start has been found.
+    :vartype values: Optional[ndarray]
+    """
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.state = "head"
+        self.position = 0
+        self.depth = 0
+        self.values: Optional[np.ndarray] = None
+        self.count = 0
+
+    def feed(self, chunk: bytes) -> None:
+        """
+        Method for passing the next chunk of the dataset to the parser.
+
+        :param chunk: The next bytes of the dataset.
+        :raises ValueError: If the value array is malformed.
+        """
+        if self.state == "tail" or self.state == "buffered":
+            (self.tail if self.state == "tail" else self.buffer).extend(chunk)
+            return
+
+        self.buffer.extend(chunk)
+        if self.state == "head":
+            self.scan_head()
+        if self.state == "value":
+            self.scan_values()
+
+    def scan_head(self) -> None:
+        """
+        Method for scanning the buffered metadata for the start of the top-level value array, keeping track of the depth
+        of nesting (and skipping over strings, which may contain brackets).
+        """
+        for match in TOKEN.finditer(self.buffer, self.position):
+            token = match.group()
+            if token == b'"':
+                # An unterminated string; wait for the rest of it
+                self.position = match.start()
+                return
+            elif token in (b'{', b'['):
+                self.depth += 1
+            elif token in (b'}', b']'):
+                self.depth -= 1
+            elif self.depth == 1 and token == b'"value"':
+                start = VALUE_ARRAY.match(self.buffer, match.end())
+                if start is not None:
+                    self.start_values(start.end())
+                    return
+                rest = INCOMPLETE.match(self.buffer, match.end())
+                if rest.end() == len(self.buffer):
+                    self.position = match.start()
+                    return
+                if b':' in rest.group():
+                    logger.debug("The value array is not in the dense form; buffering the dataset in full.")
+                    self.state = "buffered"
+                    return
+        self.position = len(self.buffer)
+
+    def start_values(self, start: int) -> None:
+        """
+        Method for switching from the metadata to the value array, preallocating the array if the size is known.
+
+        :param start: The position in the buffer at which the value array begins (i.e., just after the '[').
+        """
+        self.head = self.buffer[:start - 1]
+        self.buffer = self.buffer[start:]
+        self.state = "value"
+
+        size = self.metadata(b'null}').get('size')
+        if isinstance(size, list):
+            self.values = np.empty(reduce(lambda x, y: x * y, size, 1), dtype=np.int64)
+        else:
+            self.values = np.empty(0, dtype=np.int64)
+
+    def scan_values(self) -> None:
+        """
+        Method for parsing all of the complete values in the buffer into the value array.
+        """
+        end = self.buffer.find(b']')
+        if end != -1:
+            self.add_values(bytes(self.buffer[:end]))
+            self.tail = self.buffer[end + 1:]
+            self.buffer = bytearray()
+            self.state = "tail"
+            return
+
+        split = self.buffer.rfind(b',')
+        if split != -1:
+            self.add_values(bytes(self.buffer[:split]))
+            del self.buffer[:split + 1]
+
+    def add_values(self, text: bytes) -> None:
+        """
+        Method for converting a comma-separated run of values and writing them into the value array.
+
+        :param text: The values, without the leading or trailing comma.
+        :raises ValueError: If any of the values is not a number or null.
+        """
+        expected = text.count(b',') + 1 if text.strip() else 0
+        if expected == 0:
+            return
+
+        is_float = any(c in text for c in (b'.', b'e', b'E', b'n'))
+        if is_float:
+            text = text.replace(b'null', b'nan')
+        if len(text.translate(None, FLOAT_CHARACTERS if is_float else INTEGER_CHARACTERS)) != 0:
+            raise ValueError("The value array of the dataset contains values that are not numbers.")
+
+        parsed = np.fromstring(text, dtype=np.float64 if is_float else np.int64, sep=',')
+        if len(parsed) != expected:
+            raise ValueError("The value array of the dataset is malformed.")
+
+        if is_float and self.values.dtype != np.float64:
+            self.values = self.values.astype(np.float64)
+        if self.count + expected > len(self.values):
+            self.values = np.concatenate((self.values[:self.count], np.empty(
+                max(self.count + expected, 2 * len(self.values)) - self.count, dtype=self.values.dtype)))
+        self.values[self.count:self.count + expected] = parsed
+        self.count += expected
+
+    def metadata(self, rest: bytes) -> OrderedDict:
+        """
+        Method for parsing the metadata, i.e., the head of the dataset followed by `rest`.
+        """
+        return json.loads(bytes(self.head + rest), object_pairs_hook=OrderedDict)
+
+    def close(self) -> pyjstat.Dataset:
+        """
+        Method for completing the parse, once all of the dataset has been fed to the parser.
+
+        :raises ValueError: If the dataset is incomplete or malformed.
+        :return: The dataset, with its value array as a numpy array.
+        """
+        if self.state in ("head", "buffered"):
+            return self.intern_categories(pyjstat.Dataset.read(self.buffer.decode('utf-8')))
+        if self.state != "tail":
+            raise ValueError("The dataset ended part way through the value array.")
+
+        table = pyjstat.Dataset(self.metadata(b'null' + bytes(self.tail)))
+        if len(self.values) != self.count:
+            self.values = self.values[:self.count].copy()
+        table['value'] = self.values
+        logger.debug(f"Parsed a dataset with {self.count} values.")
+        return self.intern_categories(table)
+
+    @staticmethod
+    def intern_categories(table: pyjstat.Dataset) -> pyjstat.Dataset:
+        """
+        Method for interning the category codes and labels of a newly parsed dataset, so that each distinct string is
+        held once. JSON parsing creates a separate string for each code in the index of a dimension, and for each label
+        (the keys of the labels are shared with those of a dict index, but not with the codes of a list index); a code
+        in a large geography dimension would otherwise be held two or three times over. The tables derived from the
+        dataset share its strings in turn.
+
+        The dataset is changed in place, so this is only for a dataset that nothing else holds yet.
+
+        :return: The dataset.
+        """
+        strings: Dict[str, str] = {}
+        for dimension in table.get("dimension", {}).values():
+            category = dimension["category"]
+            index = category["index"]
+            if isinstance(index, dict):
+                category["index"] = type(index)((strings.setdefault(code, code), position)
+                                                for code, position in index.items())
+            else:
+                category["index"] = [strings.setdefault(code, code) for code in index]
+            labels = category.get("label")
+            if labels:
+                category["label"] = type(labels)((strings.setdefault(code, code), strings.setdefault(label, label))
+                                                 for code, label in labels.items())
+        return table
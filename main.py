@@ -1,18 +1,33 @@
 from nomis_metadata_api_connector import NomisMetadataApiConnector
 from cantabular_api_connector import CantabularApiConnector
 from dataset_transformations import DatasetTransformations
+from table_view import TableView
+from table_operations import TableOperations
+from geography_lookup_reader import GeographyLookupReader
+from recode_file_reader import RecodeFileReader
 from dataset_file_reader import DatasetFileReader
 from nomis_api_connector import NomisApiConnector
+from api_connector import ApiConnector
 from config_manager import ConfigManager
+from query_cache import QueryCache
+from nomis_catalog import NomisCatalog
+from definitions_cache import DefinitionsCache
+from rate_limiter import RateLimiter
 from configuration import Configuration
 from args_manager import ArgsManager
 from file_reader import FileReader
+from ons_metadata_reader import OnsMetadataReader
 from type_hints import *
 from arguments import Arguments
 from pyjstat import pyjstat  # type: ignore
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 import logging
 import sys
-import copy
+
+# Maximum number of requests made to the Nomis APIs at once, by worker threads sharing the session of a connector (see
+# ApiConnector.mount_adapter())
+MAX_WORKERS = 8
 
 # ---------- Initialisation ---------- #
 
@@ -78,19 +93,99 @@ def collect_configuration(arguments: Arguments) -> Configuration:
     return configuration
 
 
+# Limit request rates
+def set_rate_limits(configuration: Configuration) -> None:
+    """
+    Set up the rate limiters for each of the APIs with a rate limit in the configuration. The limits are shared with
+    any other DTS processes on the host using the same rate limit directory.
+
+    :param configuration: An instance of `Configuration` containing the established configuration details for a given
+        run.
+    :raises TypeError: If the rate limit of an API is neither an object nor null.
+    """
+    limits = configuration.get_options('rate_limits')
+    if limits is None:
+        return
+
+    for api in ("cantabular", "nomis", "nomis_metadata"):
+        limit = limits.get(api)
+        if limit is None:
+            continue
+        if not isinstance(limit, dict):
+            raise TypeError(f"The {api} rate limit must be either an object or null. Please check the config file.")
+        ApiConnector.rate_limiters[configuration.get_client(api)] = RateLimiter(api, directory=limits.get("directory"),
+                                                                                **limit)
+        logger.debug(f"Requests to the {api} API limited to {limit['rate']} per second.")
+
+
+# Open local caches
+def nomis_catalog() -> Union[NomisCatalog, None]:
+    """
+    Open the local catalog of what exists in Nomis, if one is configured.
+
+    :return: An instance of `NomisCatalog`, refreshed rather than read from if the -e flag was used; or `None` if the
+        catalog has been disabled.
+    """
+    options = config.get_options('nomis_catalog')
+    if options is None:
+        return None
+    return NomisCatalog(**options, refresh=args.refresh_catalog)
+
+
+def metadata_cache() -> Union[DefinitionsCache, None]:
+    """
+    Open the local cache of the metadata definitions in Nomis, if one is configured.
+
+    :return: An instance of `DefinitionsCache`, with the cached definitions of the metadata API dropped if the -k flag
+        was used; or `None` if the cache has been disabled.
+    """
+    options = config.get_options('metadata_cache')
+    if options is None:
+        return None
+    cache = DefinitionsCache(**options)
+    if args.refresh_metadata:
+        cache.discard(config.get_client('nomis_metadata'))
+    return cache
+
+
+# Warm up connections
+def warm_up_connections(configuration: Configuration) -> None:
+    """
+    Open connections to all of the configured APIs in parallel, so that the first request made to each of them does
+    not have to wait for the connection to be established.
+
+    :param configuration: An instance of `Configuration` containing the established configuration details for a given
+        run.
+    """
+    # FORMAT: ("API Name", verify TLS certificate)
+    apis = [("cantabular", True), ("nomis", False), ("nomis_metadata", False)]
+
+    with ThreadPoolExecutor(max_workers=len(apis)) as executor:
+        warmed = executor.map(
+            lambda api: ApiConnector.warm_up(configuration.get_credentials(api[0]),
+                                             configuration.get_client(api[0]),
+                                             api[1]),
+            apis
+        )
+        for (api, _), success in zip(apis, warmed):
+            if not success:
+                logger.info(f"Unable to warm up the connection to the {api} API.")
+
+
 # ---------- Data Functions ---------- #
 
 
-def check_dataset_exists(connector: NomisApiConnector) -> bool:
+def check_dataset_exists(connector: NomisApiConnector, dataset_id: str) -> bool:
     """
     Check whether the dataset already exists in the Nomis database, handle appropriately.
 
     :param connector: An open, initialised instance of `NomisApiConnector`.
+    :param dataset_id: The ID of the dataset.
     :return: A bool indicating if the dataset does exist (`True`) or it doesn't exist (`False`).
     """
-    exists = connector.get_dataset(args.dataset_id, return_bool=True)
+    exists = connector.get_dataset(dataset_id, return_bool=True)
     if exists and not args.suppress_prompts:
-        print(f"A DATASET WITH ID {args.dataset_id} ALREADY EXISTS. DO YOU WANT TO UPDATE IT? y/n")
+        print(f"A DATASET WITH ID {dataset_id} ALREADY EXISTS. DO YOU WANT TO UPDATE IT? y/n")
         while 1:
             answer = input()
             if answer.lower() == 'n':
@@ -105,41 +200,148 @@ def check_dataset_exists(connector: NomisApiConnector) -> bool:
         raise TypeError("Received unexpected type from Nomis API Connector.")
 
 
+def query_plan() -> List[str]:
+    """
+    Plan the query to make to Cantabular: the finest cross-tabulation needed for the dataset and for all of the
+    marginal datasets (-m flag), so that a single query serves every dataset. That is, the query variables followed by
+    any variables of the marginal datasets that aren't among them.
+
+    :return: The variables to query.
+    """
+    variables = list(args.query_variables)
+    for marginal in args.marginals if args.marginals is not None else []:
+        variables += [variable for variable in marginal if variable not in variables]
+    return variables
+
+
 def retrieve_data() -> Tuple[pyjstat.Dataset, List[str]]:
     """
-    Query the Cantabular API to retrieve a jsonstat table for use in dataset construction and transformation.
+    Query the Cantabular API to retrieve a jsonstat table for use in dataset construction and transformation. A table
+    read from a file is concatenated along the geography with the tables of any files appended with the -a flag (e.g.
+    regional extracts), and narrowed to the categories selected with the -s flag, if any.
+
+    :raises ValueError: If files are appended to a table without a geography variable, or their tables don't match.
 
     :return: A tuple containing a valid pyjstat dataset, retrieved from cantabular or a file, and a list of query
-        variables, retrieved from the arguments or from a file.
+        variables, retrieved from the query plan or from a file.
     """
     if args.filename is not None:
         with DatasetFileReader(args.filename) as dfr:
             table = dfr.query()
-            variables = table['id']
+        if args.append_files is not None:
+            geography = [variable for variable in table['id'] if variable in config.get_geography()]
+            if len(geography) == 0:
+                raise ValueError(f"The table in {args.filename} has no geography variable to append the tables of "
+                                 f"other files along.")
+            tables = [table]
+            for filename in args.append_files:
+                with DatasetFileReader(filename) as dfr:
+                    tables.append(dfr.query())
+            table = TableOperations.concatenate(tables, geography[-1])
+        if args.filters is not None:
+            table = TableOperations.select(table, args.filters)
+        variables = table['id']
     else:
+        cache_options = config.get_options('cantabular_cache')
+        partition_options = config.get_options('cantabular_partitioning')
+        query_variables = query_plan()
+        geography = [variable for variable in query_variables if variable in config.get_geography()]
         with CantabularApiConnector(
                 args.query_dataset,
-                args.query_variables,
+                query_variables,
                 config.get_credentials('cantabular'),
                 config.get_client('cantabular'),
+                filters=args.filters,
+                cache=QueryCache(**cache_options) if cache_options is not None else None,
+                geography=geography[0] if len(geography) > 0 else None,
+                **(partition_options if partition_options is not None else {})
         ) as cc:
             table = cc.query()
-            variables = args.query_variables
+            variables = query_variables
     return table, variables
 
 
+def read_recodes(data: Tuple[pyjstat.Dataset, List[str]]) -> Dict[str, Recode]:
+    """
+    Read the recodes of the recode file, if one is given (-x flag).
+
+    :param data: A tuple containing the retrieved pyjstat dataset and the list of variables it was retrieved for.
+    :raises KeyError: If a recoded dimension is not in the data.
+    :return: A dictionary of the recode of each dimension to recode (see `RecodeFileReader`); empty if there is no
+        recode file.
+    """
+    if args.recode is None:
+        return {}
+
+    recodes = RecodeFileReader(args.recode).recodes()
+    missing = [dimension for dimension in recodes if dimension not in data[0]["id"]]
+    if len(missing) > 0:
+        raise KeyError(f"Recoded dimensions {', '.join(missing)} are not in the data.")
+    return recodes
+
+
+def recode_data(data: Tuple[pyjstat.Dataset, List[str]],
+                recodes: Dict[str, Recode]) -> Tuple[pyjstat.Dataset, List[str]]:
+    """
+    Recode a dataset into coarser categories, replacing each recoded dimension with the new variable of its recode; so
+    that the categories of the variables of the original dimensions are never changed in Nomis. Dimensions of the
+    recodes that are not in the dataset (e.g. a marginal dataset) are left out.
+
+    :param data: A tuple containing a pyjstat dataset and the list of variables to be assigned to the dataset.
+    :param recodes: The recodes, as read by read_recodes().
+    :raises KeyError: If any of the categories of a recoded dimension is not recoded.
+    :return: A tuple containing the recoded dataset and the list of variables, with the new variables in place of the
+        recoded dimensions.
+    """
+    table, variables = data
+    for dimension, recode in recodes.items():
+        if dimension not in table["id"]:
+            continue
+        table = TableOperations.recode(table, dimension, recode.mapping, recode.name, recode.label, recode.labels)
+        variables = [recode.name if variable == dimension else variable for variable in variables]
+        logger.info(f"{dimension} recoded into {len(table['dimension'][recode.name]['category']['index'])} categories "
+                    f"of {recode.name}.")
+    return table, variables
+
+
+def marginal_datasets(data: Tuple[pyjstat.Dataset, List[str]]
+                      ) -> Iterator[Tuple[str, str, Tuple[pyjstat.Dataset, List[str]]]]:
+    """
+    Generate the dataset for the query variables and, if marginal datasets are requested (-m flag), each marginal
+    dataset, derived from the retrieved data by summing out the other variables rather than queried separately. Each
+    dataset is derived only when it is reached.
+
+    :param data: A tuple containing a pyjstat dataset and the list of variables it was retrieved for.
+    :raises KeyError: If a marginal dataset has a variable that isn't in the data.
+    :return: A generator of tuples, each containing the ID and title of a dataset and its data; each marginal dataset
+        has its variables appended to the ID and title given.
+    """
+    table, variables = data
+    if args.filename is None and list(args.query_variables) != list(variables):
+        yield args.dataset_id, args.dataset_title, (TableOperations.marginalise(table, args.query_variables),
+                                                    list(args.query_variables))
+    else:
+        yield args.dataset_id, args.dataset_title, data
+
+    for marginal in args.marginals if args.marginals is not None else []:
+        yield f"{args.dataset_id}_{'_'.join(marginal)}", f"{args.dataset_title} ({', '.join(marginal)})", \
+            (TableOperations.marginalise(table, marginal), list(marginal))
+
+
 def check_dataset_dimensions(connector: NomisApiConnector,
-                             dimensions: list
+                             dimensions: list,
+                             dataset_id: str
                              ) -> bool:
     """
     Obtain a list of all variables marked for posting that haven't already been assigned to the dataset.
 
     :param connector: An open, initialised instance of `NomisApiConnector`.
     :param dimensions: List of dimensions.
+    :param dataset_id: The ID of the dataset.
     :return: A list of variables (from the arguments) that have not yet been assigned to the dataset.
     """
 
-    assigned_variables_json = connector.get_dataset_dimensions(args.dataset_id)
+    assigned_variables_json = connector.get_dataset_dimensions(dataset_id)
     if isinstance(assigned_variables_json, list):
         assigned_variables = [assigned_variables_json[i]['name'] for i in range(len(assigned_variables_json))]
     else:
@@ -170,19 +372,23 @@ def get_type_ids(type_requests: List[dict]) -> List[str]:
 
 
 def create_dataset(connector: NomisApiConnector,
-                   transformations: DatasetTransformations
+                   transformations: DatasetTransformations,
+                   dataset_id: str,
+                   dataset_title: str
                    ) -> None:
     """
     Initialise a dataset using the jsonstat table either read in or retrieved from Cantabular.
 
     :param connector: An open, initialised instance of `NomisApiConnector`.
     :param transformations: An initialised instance of `DatasetTransformations` with a valid table attribute.
+    :param dataset_id: The ID of the dataset.
+    :param dataset_title: The title of the dataset.
     """
     connector.create_dataset(
-        args.dataset_id,
+        dataset_id,
         transformations.dataset_creation(
-            args.dataset_id,
-            args.dataset_title
+            dataset_id,
+            dataset_title
         )
     )
 
@@ -192,7 +398,8 @@ def handle_variables(connector: NomisApiConnector,
                      variables: List[str]
                      ) -> None:
     """
-    Handle variable transmission/manipulation.
+    Handle variable transmission/manipulation. Variables that don't yet exist are created, along with their types and
+    categories; the categories of variables that already exist are synced with those in the table.
 
     :param connector: An open, initialised instance of `NomisApiConnector`.
     :param transformations: An initialised instance of `DatasetTransformations` with a valid table attribute.
@@ -205,9 +412,21 @@ def handle_variables(connector: NomisApiConnector,
     variable_request_body = transformations.variable_creation()
     type_request_body = transformations.type_creation()
     type_ids = get_type_ids(type_request_body)
-    category_request_body = transformations.category_creation(type_ids)
+    category_request_body = iter(transformations.category_creation(type_ids))
+
+    # The category requests are built dimension by dimension, so are kept per dimension: two variables may well share a
+    # category code and title. Each variable's requests are then found by the codes and labels they were built from (a
+    # category with no label being labelled by its code)
+    dimensions = {dimension.name: dimension for dimension in transformations.dimensions}
+    category_requests: Dict[str, Dict[Tuple[str, str], dict]] = {}
+    for dimension in transformations.dimensions:
+        category_requests[dimension.name] = {(request["code"], request["title"]): request
+                                             for request in islice(category_request_body, len(dimension.codes))}
 
     for variable in variables:
+        dimension = dimensions[variable]
+        requests = [category_requests[variable][(code, label)]
+                    for code, label in zip(dimension.codes, dimension.labels)]
 
         # Check to see variables already exist for the given dimensions; IF the variable does NOT exist then create it
         if not connector.get_variable(variable, return_bool=True):
@@ -218,27 +437,53 @@ def handle_variables(connector: NomisApiConnector,
                     connector.create_variable(variable, request)
 
             # Create variable type
-            requests = []
-            for request in type_request_body:
-                if request["reference"] == variable:
-                    requests.append(request)
-            connector.create_variable_type(variable, requests)
+            connector.create_variable_type(
+                variable,
+                [request for request in type_request_body if request["reference"] == variable]
+            )
 
             # Create the categories for this new variable
-            requests = []
-            for category in transformations.table["dimension"][variable]["category"]["index"]:
-                for request in category_request_body:
-                    if category == request["code"] and transformations \
-                            .table["dimension"][variable]["category"]["label"][category] == request["title"]:
-                        requests.append(request)
-
             connector.create_variable_category(variable, requests)
 
+        else:
+            sync_variable_categories(connector, variable, requests)
+
+
+def sync_variable_categories(connector: NomisApiConnector,
+                             variable: str,
+                             requests: List[dict]
+                             ) -> None:
+    """
+    Bring the categories of an existing variable into line with those in the table: the categories already in Nomis are
+    retrieved once, and then only the categories that are missing are created, and only those whose titles have
+    changed are updated.
+
+    :param connector: An open, initialised instance of `NomisApiConnector`.
+    :param variable: The name of an existing variable.
+    :param requests: The category requests for all of the categories of the variable in the table.
+    """
+    existing = {category["code"]: category.get("title") for category in connector.get_variable_categories(variable)}
+    missing = [request for request in requests if request["code"] not in existing]
+    changed = [request for request in requests
+               if request["code"] in existing and existing[request["code"]] != request["title"]]
+    logger.debug(f"Variable {variable}: {len(missing)} categories to create, {len(changed)} to update and "
+                 f"{len(requests) - len(missing) - len(changed)} unchanged.")
+
+    if len(missing) > 0:
+        connector.create_variable_category(variable, missing)
+    if len(changed) > 0:
+        with ThreadPoolExecutor(max_workers=min(len(changed), MAX_WORKERS)) as executor:
+            updates = [executor.submit(connector.update_variable_category, variable, request["code"],
+                                       {"title": request["title"]}) for request in changed]
+        for update in updates:
+            update.result()
+
 
 # Assign dimensions to dataset
 def handle_dimensions(connector: NomisApiConnector,
                       transformations: DatasetTransformations,
                       key: Union[str, None],
+                      dataset_id: str
                       ) -> None:
     """
     Assign dimensions to the dataset.
@@ -246,11 +491,12 @@ def handle_dimensions(connector: NomisApiConnector,
     :param connector: An open, initialised instance of `NomisApiConnector`.
     :param transformations: An initialised instance of `DatasetTransformations` with a valid table attribute.
     :param key: Key value for dimensions.
+    :param dataset_id: The ID of the dataset.
     """
 
     logger.debug("\n-----ASSIGNING DIMENSIONS-----")
     connector.assign_dimensions_to_dataset(
-        args.dataset_id,
+        dataset_id,
         transformations.assign_dimensions(key)
     )
 
@@ -258,77 +504,155 @@ def handle_dimensions(connector: NomisApiConnector,
 # Append observations into dataset
 def handle_observations(connector: NomisApiConnector,
                         transformations: DatasetTransformations,
+                        dataset_id: str
                         ) -> None:
     """
     Append/overwrite observations to the dataset.
 
     :param connector: An open, initialised instance of `NomisApiConnector`.
     :param transformations: An initialised instance of `DatasetTransformations` with a valid table attribute.
+    :param dataset_id: The ID of the dataset.
     """
 
     logger.debug("\n-----APPENDING OBSERVATIONS-----")
     connector.overwrite_dataset_observations(
-        args.dataset_id,
-        transformations.observations(args.dataset_id)
+        dataset_id,
+        transformations.observations(dataset_id)
     )
 
 
 def dataset_transformations(connector: NomisApiConnector,
-                            exists: bool,
-                            data: Tuple[pyjstat.Dataset, List[str]]
-                            ) -> None:
+                            data: Tuple[pyjstat.Dataset, List[str]],
+                            dataset_id: str,
+                            dataset_title: str
+                            ) -> bool:
     """
-    Function containing the dataset transformation operations.
+    Function containing the dataset transformation operations. The table is validated before any request is made to
+    Nomis; then, if the dataset exists, it is updated, and otherwise it is created.
 
     :param connector: An open, initialised instance of `NomisApiConnector`.
-    :param exists: A bool indicating whether or not the dataset currently exists; if `True`, then the function will
-        handle for updating an existing dataset. Conversely, the function will create a new dataset if exists is
-        `False`.
     :param data: A tuple containing the required data. That is, a pyjstat dataset corresponding with the query made to
         cantabular, and the list of variables to be assigned to the dataset.
+    :param dataset_id: The ID of the dataset.
+    :param dataset_title: The title of the dataset.
+    :return: A bool indicating whether the dataset already existed (and so was updated rather than created).
     """
     logger.info("Commencing dataset transformations.")
 
     table, variables = data
 
-    # Check variables against known geographies. If geography then remove from list and make key.
+    # Check variables against known geographies. If geography then hide it from a view of the table and make key.
     geography_variables = config.get_geography()
 
     key = None
     geography_flag = False
     table_geography = None
-    for variable in variables:
-        if variable in geography_variables:
-            geography_flag = True
-            key = variable
-            table_geography = copy.deepcopy(table)
-            del table["dimension"][variable]
-            table["id"].remove(variable)
-            variables.remove(variable)
+    geography = [variable for variable in variables if variable in geography_variables]
+    if len(geography) > 0:
+        geography_flag = True
+        key = geography[-1]
+        table_geography = table
+        table = TableView(table, geography)
+        variables = [variable for variable in variables if variable not in geography]
 
     # If no variables are geography then make first variable key
     if geography_flag is False:
         key = variables[0]
 
-    transformations = DatasetTransformations(table, geography_flag, table_geography)
+    transformations = DatasetTransformations(table, geography_flag, table_geography, key)
+    exists = check_dataset_exists(connector, dataset_id)
 
     # Create the dataset if it doesn't exist, otherwise retrieve the non-assigned variables
     if not exists:
         non_assigned_variables = variables
-        create_dataset(connector, transformations)
+        create_dataset(connector, transformations, dataset_id, dataset_title)
         handle_variables(connector, transformations, non_assigned_variables)
     else:
-        are_dimensions_same = check_dataset_dimensions(connector, variables)
+        are_dimensions_same = check_dataset_dimensions(connector, variables, dataset_id)
         if are_dimensions_same is False:
             raise KeyError("ERROR: Dimensions are not the same as existing dataset.")
+        handle_variables(connector, transformations, variables)
+
+    handle_dimensions(connector, transformations, key, dataset_id)
+    handle_observations(connector, transformations, dataset_id)
+    return exists
 
-    handle_dimensions(connector, transformations, key)
-    handle_observations(connector, transformations)
+
+def geography_levels(dataset_id: str,
+                     dataset_title: str,
+                     data: Tuple[pyjstat.Dataset, List[str]]
+                     ) -> Iterator[Tuple[str, str, Tuple[pyjstat.Dataset, List[str]]]]:
+    """
+    Generate the dataset for the data as given and, if a geography lookup file is given (-g flag), a dataset for each
+    coarser geography level in the lookup, aggregated locally from the data rather than queried again. Each level is
+    aggregated from the one before it, and only when it is reached.
+
+    :param dataset_id: The ID of the dataset.
+    :param dataset_title: The title of the dataset.
+    :param data: A tuple containing a pyjstat dataset and the list of variables to be assigned to the dataset.
+    :raises KeyError: If any of the coarser levels is not a geography variable in the configuration (checked before
+        any dataset is generated), as it couldn't then be published as the geography of its dataset.
+    :return: A generator of tuples, each containing the ID and title of a dataset and its data; the dataset for each
+        coarser level has the level appended to the ID and title given. If none of the variables is a geography level
+        in the lookup, only the dataset as given is generated.
+    """
+    if args.geography_lookup is None:
+        yield dataset_id, dataset_title, data
+        return
+
+    lookup = GeographyLookupReader(args.geography_lookup).read()
+    table, variables = data
+    geography = [variable for variable in variables if variable in config.get_geography() and
+                 variable in lookup.levels and variable in table["id"]]
+    if len(geography) == 0:
+        logger.info(f"None of the variables of {dataset_id} is a geography level in the geography lookup file; it "
+                    f"will only be published as it is.")
+        yield dataset_id, dataset_title, data
+        return
+
+    level = geography[0]
+    missing = [parent_level for parent_level in lookup.coarser_levels(level)
+               if parent_level not in config.get_geography()]
+    if len(missing) > 0:
+        raise KeyError(f"Geography levels {', '.join(missing)} of the geography lookup file are not geography "
+                       f"variables in the config file, so {dataset_id} cannot be published at them.")
+
+    yield dataset_id, dataset_title, data
+    for parent_level in lookup.coarser_levels(level):
+        table = TableOperations.roll_up(table, level, lookup.parents(level, parent_level), parent_level)
+        variables = [parent_level if variable == level else variable for variable in variables]
+        level = parent_level
+        yield f"{dataset_id}_{level}", f"{dataset_title} ({level})", (table, variables)
 
 
 # ---------- Metadata Functions ---------- #
 
 
+def resolve_variable_uuids(connector: NomisApiConnector, names: List[str]) -> Dict[str, str]:
+    """
+    Obtain the UUIDs of a list of variables. All of the variables are retrieved from Nomis at once and indexed by name;
+    only the variables missing from that index are then looked up individually, concurrently; the worker threads share
+    the session of the connector, which keeps a connection open for each of them.
+
+    :param connector: An open, initialised instance of `NomisApiConnector`.
+    :param names: The names of the variables.
+    :return: A dictionary of the UUID of each variable that exists in the Nomis system, keyed by name.
+    """
+    index = {variable["name"]: variable["uuid"] for variable in connector.get_variable()}
+    uuids = {name: index[name] for name in names if name in index}
+
+    misses = [name for name in dict.fromkeys(names) if name not in index]
+    if len(misses) > 0:
+        logger.debug(f"{len(misses)} variables not found in the list of all variables; looking them up individually.")
+        with ThreadPoolExecutor(max_workers=min(len(misses), MAX_WORKERS)) as executor:
+            found = executor.map(lambda name: connector.get_variable(name, return_bool=True), misses)
+            for name, variable in zip(misses, found):
+                if variable is not False:
+                    uuids[name] = variable["uuid"]
+
+    return uuids
+
+
 def cantabular_metadata(file_data: dict) -> List[UuidMetadata]:
     """
     Function for handling metadata in the Cantabular format.
@@ -341,66 +665,45 @@ def cantabular_metadata(file_data: dict) -> List[UuidMetadata]:
     # Extract variable IDs
     data = [meta["meta"] for meta in file_data["vars"]]
     variables = [meta["id"] for meta in file_data["vars"]]
-    uuids_metadata: List[UuidMetadata] = []
 
     # Get UUIDs from Nomis
     with NomisApiConnector(
             config.get_credentials('nomis'),
-            config.get_client('nomis')
+            config.get_client('nomis'),
+            catalog=nomis_catalog()
     ) as connector:
-        for variable in range(0, len(variables)):
-
-            response = connector.get_variable(
-                variables[variable],
-                return_bool=True
-            )
+        uuids = resolve_variable_uuids(connector, variables)
 
-            if response is not False:
-                uuids_metadata.append(UuidMetadata(response["uuid"], data[variable]))
+    return [UuidMetadata(uuids[variable], meta) for variable, meta in zip(variables, data) if variable in uuids]
 
-    return uuids_metadata
 
-
-def ons_metadata(file_data: dict) -> List[UuidMetadata]:
+def ons_metadata(filename: str) -> Iterator[UuidMetadata]:
     """
-    Function for handling metadata in the ONS format.
+    Function for handling metadata in the ONS format. The metadata file is read as a stream, and the metadata of each
+    data type or data element that exists in the Nomis system is generated as it is reached.
 
-    :param file_data: A dictionary containing a Python dict representation of the inputted metadata file.
-    :return: A list of namedtuples containing a UUID (str) and its associated metadata (dict).
+    :param filename: The location of the metadata file.
+    :return: A generator of namedtuples containing a UUID (str) and its associated metadata (dict).
     """
     logger.info("Handling metadata in the ONS format.")
 
-    # Get a list of all UUIDs in the Nomis system
+    # Get the set of all UUIDs in the Nomis system
     with NomisApiConnector(
             config.get_credentials('nomis'),
-            config.get_client('nomis')
+            config.get_client('nomis'),
+            catalog=nomis_catalog()
     ) as connector:
-        nomis_uuids = [variable["uuid"] for variable in connector.get_variable()]
+        nomis_uuids = {variable["uuid"] for variable in connector.get_variable()}
 
-    uuids_metadata: List[UuidMetadata] = []
-
-    # Extract UUIDs and metadata
-    for meta in file_data["dataModel"]["dataTypes"]:
+    # Extract UUIDs and metadata from the data types and the child data elements (i.e., the other variable branches)
+    for meta in OnsMetadataReader(filename).items():
 
         # Check if the UUIDs match those in the Nomis system; otherwise, skip
         if meta["id"] in nomis_uuids:
-            uuids_metadata.append(UuidMetadata(meta["id"], {"description": meta["description"]}))
+            yield UuidMetadata(meta["id"], {"description": meta["description"]})
         else:
             logger.debug(f"{meta['label']} with UUID {meta['id']} does not exist in NOMIS system")
 
-    for meta_x in file_data["dataModel"]["childDataClasses"]:
-
-        # Check other variable branches
-        for meta_y in meta_x["childDataElements"]:
-
-            # Check if the UUIDs match those in the Nomis system; otherwise, skip
-            if meta_y["id"] in nomis_uuids:
-                uuids_metadata.append(UuidMetadata(meta_y["id"], {"description": meta_y["description"]}))
-            else:
-                logger.debug(f"VARIABLE: '{meta_y['label']}' with UUID: '{meta_y['id']}' does not exist in NOMIS system")
-
-    return uuids_metadata
-
 
 # ---------- Main Functions ---------- #
 
@@ -413,12 +716,17 @@ def data_main() -> None:
 
     with NomisApiConnector(
             config.get_credentials('nomis'),
-            config.get_client('nomis')
+            config.get_client('nomis'),
+            catalog=nomis_catalog()
     ) as connector:
-        exists = check_dataset_exists(connector)
-        dataset_transformations(connector, exists, retrieve_data())
-    logger.info(f"DATA TRANSFORMATION SUCCESS: A dataset with the ID {args.dataset_id} has been "
-                f"{'UPDATED' if exists else 'CREATED'} successfully.")
+        retrieved = retrieve_data()
+        recodes = read_recodes(retrieved)
+        for marginal_id, marginal_title, marginal in marginal_datasets(retrieved):
+            for dataset_id, dataset_title, data in geography_levels(marginal_id, marginal_title,
+                                                                    recode_data(marginal, recodes)):
+                exists = dataset_transformations(connector, data, dataset_id, dataset_title)
+                logger.info(f"DATA TRANSFORMATION SUCCESS: A dataset with the ID {dataset_id} has been "
+                            f"{'UPDATED' if exists else 'CREATED'} successfully.")
 
 
 def metadata_main() -> None:
@@ -427,12 +735,11 @@ def metadata_main() -> None:
     """
     logger.info(f"Commencing metadata transformation service.")
 
-    with FileReader(args.filename) as fr:
-        file_data = fr.load_json()
     if args.metadata_format.lower() == 'c':
-        uuids_metadata = cantabular_metadata(file_data)
+        with FileReader(args.filename) as fr:
+            uuids_metadata = cantabular_metadata(fr.load_json())
     elif args.metadata_format.lower() == 'o':
-        uuids_metadata = ons_metadata(file_data)
+        uuids_metadata = list(ons_metadata(args.filename))
     else:
         raise ValueError("Unrecognised metadata format.")
 
@@ -440,11 +747,16 @@ def metadata_main() -> None:
         variable_metadata_requests = DatasetTransformations.variable_metadata_request(uuids_metadata)
         with NomisMetadataApiConnector(
                 config.get_credentials('nomis_metadata'),
-                config.get_client('nomis_metadata')
+                config.get_client('nomis_metadata'),
+                definitions=metadata_cache()
         ) as metadata_connector:
-            uuids = metadata_connector.add_new_metadata(variable_metadata_requests, return_uuids=True)
+            if args.sync:
+                uuids = metadata_connector.sync_metadata(variable_metadata_requests, return_uuids=True)
+            else:
+                uuids = metadata_connector.add_new_metadata(variable_metadata_requests, return_uuids=True)
         logger.info(f"METADATA TRANSFORMATION SUCCESS. "
-                    f"Metadata was created for entities with the following UUIDS: {uuids}")
+                    f"Metadata was {'synced' if args.sync else 'created'} for entities with the following UUIDS: "
+                    f"{uuids}")
 
     else:
         logger.info("No metadata appended.")
@@ -456,8 +768,13 @@ if __name__ == '__main__':
         args = collect_arguments()
         config = collect_configuration(args)
         logger.info("Configuration and arguments successfully validated.")
+        set_rate_limits(config)
+        if args.warm_up:
+            warm_up_connections(config)
         data_main() if not args.metadata else metadata_main()
         logger.info("DTS has finished successfully.\n")
     except Exception as e:
         logger.error(f"DTS failed due to Exception: {e}\n")
         raise e
+    finally:
+        ApiConnector.close_warm_sessions()
@@ -1,4 +1,5 @@
 from api_connector import ApiConnector
+from nomis_catalog import NomisCatalog, MISSING
 from type_hints import *
 from logging import getLogger
 from uuid import UUID
@@ -15,12 +16,45 @@ class NomisApiConnector(ApiConnector):
     datasets and variables on the Nomis database through the Nomis API. This is the primary point of interaction
     between the utility and the Nomis API, containing methods corresponding with all requests the program needs to make.
     The class is easily extendable to contain more methods should requirements change.
+
+    If a `NomisCatalog` is given, then the existence checks made by get_dataset(), get_dataset_dimensions(),
+    get_variable() and get_variable_categories() are answered from the catalog wherever it has a fresh entry, and their
+    results are recorded in it otherwise. Only what exists is recorded, so that anything not found (e.g. a dataset
+    created since by another process) is always checked against the API again. Successful creates and updates discard
+    the entries for the datasets, variables, categories and dimensions they change, so that these are retrieved again
+    (in the form the API returns them) when next checked.
+
+    :param catalog: Optionally, a local catalog of what exists in Nomis.
     """
 
-    def __init__(self, credentials, address, port=None, record_requests=True) -> None:
+    def __init__(self, credentials, address, port=None, record_requests=True,
+                 catalog: Optional[NomisCatalog] = None) -> None:
         super().__init__(credentials, address, port, record_requests)
+        self.catalog = catalog
         logger.info(f"Establishing connection with the Nomis API at {self.client}")
 
+    def catalog_get(self, kind: str, key: str) -> Any:
+        """
+        Method for retrieving an entry from the catalog, if there is one.
+
+        :return: The value of the entry (`None` if it doesn't exist in Nomis), or `MISSING` if it isn't catalogued.
+        """
+        return self.catalog.get(self.client, kind, key) if self.catalog is not None else MISSING
+
+    def catalog_put(self, kind: str, key: str, value: Any) -> None:
+        """
+        Method for recording an entry in the catalog, if there is one.
+        """
+        if self.catalog is not None:
+            self.catalog.put(self.client, kind, key, value)
+
+    def catalog_discard(self, kind: str, key: str) -> None:
+        """
+        Method for removing an entry from the catalog, if there is one.
+        """
+        if self.catalog is not None:
+            self.catalog.discard(self.client, kind, key)
+
     @staticmethod
     def validate_ds(ds: NomisDataset, id: str = None) -> bool:
         """
@@ -132,6 +166,10 @@ class NomisApiConnector(ApiConnector):
         # Type/value checking
         self.validate_id(id)
 
+        cached = self.catalog_get("dataset", id)
+        if cached is not MISSING:
+            return True if return_bool else cached
+
         # Make the request: Get dataset definition.
         try:
             res = self.session.get(
@@ -146,6 +184,7 @@ class NomisApiConnector(ApiConnector):
         # Handle response
         # If the dataset exists, the response code will be 200; other responses correspond to the API documentation.
         if res.status_code == 200:
+            self.catalog_put("dataset", id, res.json())
             if return_bool:
                 logger.debug(f"Dataset with id '{id}' exists.")
                 return True
@@ -157,6 +196,7 @@ class NomisApiConnector(ApiConnector):
             raise requests.HTTPError("Bad input parameter.")
 
         elif res.status_code == 404:
+            self.catalog_discard("dataset", id)
             if return_bool:
                 logger.debug(f"Dataset with id '{id}' does not exist.")
                 return False
@@ -203,6 +243,7 @@ class NomisApiConnector(ApiConnector):
         # Handle response
         if res.status_code == 200:
             logger.debug("Dataset created successfully.")
+            self.catalog_discard("dataset", id)
             return True
         elif res.status_code == 400:
             raise requests.HTTPError("Bad input parameter.")
@@ -231,6 +272,10 @@ class NomisApiConnector(ApiConnector):
         # Type/value checking
         self.validate_id(id)
 
+        cached = self.catalog_get("dimensions", id)
+        if cached is not MISSING:
+            return True if return_bool else cached
+
         # Make the request: List dimensions available from a /Datasets/{id}/dimensions.
         try:
             res = self.session.get(
@@ -246,12 +291,14 @@ class NomisApiConnector(ApiConnector):
         if res.status_code == 200:
             # If the request is successful, return the dimensions in the form of an array.
             logger.debug("Dataset dimensions retrieved successfully.")
+            self.catalog_put("dimensions", id, res.json())
             if return_bool:
                 return True
             return res.json()
         elif res.status_code == 400:
             raise requests.HTTPError("Bad input parameters.")
         elif res.status_code == 404:
+            self.catalog_discard("dimensions", id)
             if return_bool:
                 return False
             raise requests.HTTPError(f"Dataset (id: '{id}') not found, or has no dimensions. ({res.text})")
@@ -294,6 +341,7 @@ class NomisApiConnector(ApiConnector):
         # Handle response
         if res.status_code == 200:
             logger.debug("Dimensions assigned successfully.")
+            self.catalog_discard("dimensions", id)
             return True
         elif res.status_code == 400:
             raise requests.HTTPError(f"Bad input parameters. ({res.text}).")
@@ -422,6 +470,11 @@ class NomisApiConnector(ApiConnector):
         if name is not None and not isinstance(name, str):
             raise TypeError("Invalid name, must be a string.")
 
+        # All of the variables are catalogued under an empty name
+        cached = self.catalog_get("variable", name if name is not None else "")
+        if cached is not MISSING:
+            return cached
+
         # Make request: Lists a specific variable.
         try:
             res = self.session.get(
@@ -436,10 +489,19 @@ class NomisApiConnector(ApiConnector):
         # Handle response
         if res.status_code == 200:
             logger.debug(f"Queried variable (name: '{name}') retrieved.")
+            if self.catalog is not None:
+                if name is None:
+                    variables = res.json()
+                    self.catalog.put_many(self.client, "variable",
+                                          [(variable["name"], variable) for variable in variables] + [("", variables)])
+                else:
+                    self.catalog_put("variable", name, res.json())
             return res.json()
         elif res.status_code == 400:
             raise requests.HTTPError(f"Bad input parameters. (Response: {res.text})")
         elif res.status_code == 404:
+            if name is not None:
+                self.catalog_discard("variable", name)
             if return_bool:
                 logger.debug(f"Queried variable (name: '{name}') does not exist.")
                 return False
@@ -484,6 +546,8 @@ class NomisApiConnector(ApiConnector):
         # Handle response
         if res.status_code == 200:
             logger.debug(f"Variable (name: '{name}') created successfully.")
+            self.catalog_discard("variable", name)
+            self.catalog_discard("variable", "")
             return True
         elif res.status_code == 400:
             raise requests.HTTPError("Bad input parameters.")
@@ -509,6 +573,10 @@ class NomisApiConnector(ApiConnector):
         if not isinstance(name, str):
             raise TypeError("Invalid name, must be a string.")
 
+        cached = self.catalog_get("categories", name)
+        if cached is not MISSING:
+            return cached
+
         # Make request: Lists the categories in a specific variable.
         try:
             res = self.session.get(
@@ -523,10 +591,12 @@ class NomisApiConnector(ApiConnector):
         # Handle response
         if res.status_code == 200:
             logger.debug(f"Queried variable categories retrieved for variable '{name}'.")
+            self.catalog_put("categories", name, res.json())
             return res.json()
         elif res.status_code == 400:
             raise requests.HTTPError("Bad input parameters.")
         elif res.status_code == 404:
+            self.catalog_discard("categories", name)
             raise requests.HTTPError(f"Variable (name: '{name}') not found.")
         else:
             raise Exception(f"Unexpected response with status code {res.status_code}.")
@@ -568,6 +638,7 @@ class NomisApiConnector(ApiConnector):
         # Handle response
         if res.status_code == 200:
             logger.debug(f"Variable categories created successfully for variable '{name}'.")
+            self.catalog_discard("categories", name)
             return True
         elif res.status_code == 400:
             raise requests.HTTPError("Bad input parameters.")
@@ -621,6 +692,7 @@ class NomisApiConnector(ApiConnector):
         # Handle response
         if res.status_code == 200:
             logger.debug(f"Variable category updated successfully for variable '{name}'.")
+            self.catalog_discard("categories", name)
             return True
         elif res.status_code == 400:
             raise requests.HTTPError("Bad input parameters.")
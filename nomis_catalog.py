@@ -0,0 +1,110 @@
+from type_hints import *
+from contextlib import closing
+from logging import getLogger
+import sqlite3
+import json
+import time
+import os
+logger = getLogger("DTS-Logger")
+
+# Returned by NomisCatalog.get() when there is no fresh entry
+MISSING = object()
+
+
+class NomisCatalog:
+    """
+    Class for keeping a local snapshot of what exists in Nomis (datasets, dataset dimensions, variables, and variable
+    categories) in a SQLite file, so that existence checks need not be made against the Nomis API on every run. The
+    catalog is refreshed incrementally: each entry is recorded when it is retrieved from the API, and is used until it
+    is `max_age` seconds old. Only what exists is recorded: absences (i.e., 404 responses) are not, as something found
+    not to exist may be created at any time by another process, so that each absence is checked against the API again.
+
+    Entries are kept per client, so that a catalog may be shared by different Nomis servers, and the file may be shared
+    by several processes. If `refresh` is set, no entries are read, so that every check is made against the API (and
+    the catalog updated with the results).
+
+    :param path: Path of the SQLite file.
+    :param max_age: The number of seconds for which an entry is used.
+    :param refresh: Toggle for ignoring the existing entries.
+
+    :ivar path: Initial value: path.
+    :vartype path: str
+    :ivar max_age: Initial value: max_age.
+    :vartype max_age: int
+    :ivar refresh: Initial value: refresh.
+    :vartype refresh: bool
+    """
+
+    def __init__(self, path: str, max_age: int, refresh: bool = False) -> None:
+        if not isinstance(path, str):
+            raise TypeError("The catalog path must be a valid string. Please check the config file.")
+        if not isinstance(max_age, int):
+            raise TypeError("The catalog max_age must be an integer. Please check the config file.")
+        if max_age < 0:
+            raise ValueError("The catalog max_age cannot be negative. Please check the config file.")
+
+        self.path = path
+        self.max_age = max_age
+        self.refresh = refresh
+
+        directory = os.path.dirname(path)
+        if len(directory) > 0:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self.connect()) as db, db:
+            db.execute("CREATE TABLE IF NOT EXISTS entries (client TEXT, kind TEXT, key TEXT, value TEXT, "
+                       "refreshed REAL, PRIMARY KEY (client, kind, key))")
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Method for opening a connection to the catalog. A connection is opened for each operation, so that the catalog
+        can be used from any thread.
+        """
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, client: str, kind: str, key: str) -> Any:
+        """
+        Method for retrieving a fresh entry from the catalog.
+
+        :param client: The client of the Nomis API.
+        :param kind: The kind of entry, e.g. 'dataset' or 'variable'.
+        :param key: The id or name of the entry.
+        :return: The value of the entry, or `MISSING` if there is no fresh entry (or the catalog is being refreshed).
+        """
+        if self.refresh:
+            return MISSING
+
+        with closing(self.connect()) as db:
+            row = db.execute("SELECT value, refreshed FROM entries WHERE client = ? AND kind = ? AND key = ?",
+                             (client, kind, key)).fetchone()
+        if row is None or time.time() - row[1] >= self.max_age:
+            return MISSING
+
+        logger.debug(f"Nomis {kind} '{key}' found in the local catalog.")
+        return json.loads(row[0])
+
+    def put(self, client: str, kind: str, key: str, value: Any) -> None:
+        """
+        Method for adding or replacing an entry in the catalog.
+
+        :param value: The value of the entry, as retrieved from Nomis.
+        """
+        self.put_many(client, kind, [(key, value)])
+
+    def put_many(self, client: str, kind: str, entries: List[Tuple[str, Any]]) -> None:
+        """
+        Method for adding or replacing several entries of the same kind in the catalog at once.
+
+        :param entries: The keys and values of the entries.
+        """
+        now = time.time()
+        with closing(self.connect()) as db, db:
+            db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", [
+                (client, kind, key, json.dumps(value), now) for key, value in entries
+            ])
+
+    def discard(self, client: str, kind: str, key: str) -> None:
+        """
+        Method for removing an entry from the catalog, once it is known to have changed.
+        """
+        with closing(self.connect()) as db, db:
+            db.execute("DELETE FROM entries WHERE client = ? AND kind = ? AND key = ?", (client, kind, key))
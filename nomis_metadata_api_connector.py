@@ -1,8 +1,13 @@
 from type_hints import *
 from uuid import UUID
 from api_connector import ApiConnector
+from ttl_cache import TtlCache
+from definitions_cache import DefinitionsCache
+from concurrent.futures import ThreadPoolExecutor
+from urllib3.exceptions import NewConnectionError
 import requests
 import json
+import time
 from logging import getLogger
 logger = getLogger('DTS-Logger')
 
@@ -10,6 +15,18 @@ requests.packages.urllib3.disable_warnings()
 
 Metadata = Dict[str, Union[str, List[str]]]
 
+# Maximum number of metadata records, and of bytes of JSON, posted in a single request
+BATCH_SIZE = 100
+BATCH_BYTES = 1024 * 1024
+# Maximum number of batches posted (or lookups made) at once, by worker threads sharing the session of the connector
+MAX_WORKERS = 4
+# Number of times a batch is retried after it is rate limited or could not be sent, and the delay (doubled on each
+# retry); a POST is not idempotent, so a batch is never retried once it may have reached the server
+RETRIES = 3
+RETRY_DELAY = 1
+# Number of seconds for which the metadata retrieved for an object is reused
+OBJECT_METADATA_TTL = 300
+
 
 class NomisMetadataApiConnector(ApiConnector):
     """
@@ -17,10 +34,22 @@ class NomisMetadataApiConnector(ApiConnector):
     or metadata ID), adding new/overwriting metadata, and updating existing metadata. This is the central hub of
     communication between the Nomis metadata API and the utility. It is easily extendable to contain more methods
     should the requirements change necessitating additional requests.
+
+    :cvar object_metadata: The metadata retrieved for objects by get_metadata_for_objects(), keyed by client and object
+        id; shared by all connectors, and discarded for an object once its metadata is added or updated.
+    :vartype object_metadata: TtlCache
+
+    :ivar definitions: Optionally, a local cache of all of the metadata on the server, used by get_all_metadata() and
+        kept up to date with the metadata added or updated through this connector.
+    :vartype definitions: Union[DefinitionsCache, None]
     """
 
-    def __init__(self, credentials, address, port=None, record_requests=None) -> None:
+    object_metadata = TtlCache(OBJECT_METADATA_TTL)
+
+    def __init__(self, credentials, address, port=None, record_requests=None,
+                 definitions: Optional[DefinitionsCache] = None) -> None:
         super().__init__(credentials, address, port, record_requests)
+        self.definitions = definitions
         logger.info(f"Establishing connection with the Nomis Metadata API at {self.client}.")
 
     @staticmethod
@@ -73,15 +102,24 @@ class NomisMetadataApiConnector(ApiConnector):
 
         return True
 
-    def get_all_metadata(self) -> List[Metadata]:
+    def get_all_metadata(self, use_cache: bool = True) -> List[Metadata]:
         """
-        Method to retrieve all of the metadata on the server.
+        Method to retrieve all of the metadata on the server. If the connector has a definitions cache, the cached
+        metadata is returned while it is fresh, and the cache is refreshed whenever the metadata is retrieved.
+
+        :param use_cache: Toggle for reading the definitions cache; if `False`, the metadata is always retrieved (and
+            the cache refreshed).
 
         :raises requests.ConnectionError: If an error occurs whilst attempting to communicate with the API.
         :raises requests.HTTPError: If a negative response is received from the API.
 
         :return: A list of metadata, if the request is a success; otherwise, an exception will have been raised.
         """
+        if self.definitions is not None and use_cache:
+            cached = self.definitions.get(self.client)
+            if cached is not None:
+                return cached
+
         # Attempt to retrieve the metadata associated with the ID
         try:
             res = self.session.get(f'{self.client}/Definitions', verify=False)
@@ -91,6 +129,8 @@ class NomisMetadataApiConnector(ApiConnector):
         # Handle response
         if res.status_code == 200:
             logger.debug(f"SUCCESS: Metadata retrieved.")
+            if self.definitions is not None:
+                self.definitions.put(self.client, res.json())
             return res.json()
         elif res.status_code == 404:
             raise requests.HTTPError("Metadata not found")
@@ -138,6 +178,56 @@ class NomisMetadataApiConnector(ApiConnector):
                 return False
             raise requests.HTTPError(f"Metadata for object with id {id} not found.")
 
+    def get_metadata_for_objects(self, ids: List[str], use_cache: bool = True) -> Dict[str, MetadataLookup]:
+        """
+        Method for retrieving the metadata associated with many objects, with up to `MAX_WORKERS` requests made at once.
+        Rather than a single failure stopping the lookup, the outcome of each lookup is reported separately, along with
+        the time it took. Metadata retrieved less than `OBJECT_METADATA_TTL` seconds earlier (during this run) is
+        reused.
+
+        :param ids: Valid strings in uuid format representing the ids of objects in the Nomis database.
+        :param use_cache: Toggle for reusing metadata already retrieved; if `False`, the metadata of every object is
+            retrieved again (and the cache refreshed).
+
+        :return: A dictionary of `MetadataLookup` namedtuples, keyed by object id; each contains the metadata of the
+            object (or `None` if it couldn't be retrieved), the number of seconds the lookup took, the error (if any),
+            and whether the metadata came from the cache.
+        """
+        results: Dict[str, MetadataLookup] = {}
+        missing: List[str] = []
+        for id in dict.fromkeys(ids):
+            cached = self.object_metadata.get((self.client, id)) if use_cache else None
+            if cached is not None:
+                results[id] = MetadataLookup(id, cached, 0.0, None, True)
+            else:
+                missing.append(id)
+
+        if len(missing) > 0:
+            with ThreadPoolExecutor(max_workers=min(len(missing), MAX_WORKERS)) as executor:
+                for lookup in executor.map(self.lookup_metadata_for_object, missing):
+                    results[lookup.uuid] = lookup
+
+        failed = [lookup for lookup in results.values() if lookup.error is not None]
+        logger.debug(f"Metadata retrieved for {len(results) - len(failed)} of {len(results)} objects "
+                     f"({len(results) - len(missing)} from the cache).")
+        for lookup in failed:
+            logger.debug(f"Unable to retrieve metadata for object with ID {lookup.uuid} after {lookup.seconds:.2f} "
+                         f"seconds. ({lookup.error})")
+        return {id: results[id] for id in ids}
+
+    def lookup_metadata_for_object(self, id: str) -> MetadataLookup:
+        """
+        Method for retrieving the metadata associated with a single object for get_metadata_for_objects(), timing the
+        request and catching any error.
+        """
+        start = time.perf_counter()
+        try:
+            metadata = self.get_metadata_for_object(id)
+        except Exception as e:
+            return MetadataLookup(id, None, time.perf_counter() - start, str(e) or type(e).__name__, False)
+        self.object_metadata.put((self.client, id), metadata)
+        return MetadataLookup(id, metadata, time.perf_counter() - start, None, False)
+
     def get_metadata_by_id(self, id: str, return_bool: bool = False) -> Union[Metadata, bool]:
         """
         This takes a uuid representing the id of some metadata in the database as a parameter, and makes a GET request
@@ -176,8 +266,8 @@ class NomisMetadataApiConnector(ApiConnector):
                     return False
                 raise requests.HTTPError(f"Metadata with id {id} not found")
 
-        except (requests.ConnectionError, requests.HTTPError):
-            logger.debug("ERROR: Unable to connect to the metadata API.")
+        except (requests.ConnectionError, requests.HTTPError) as e:
+            logger.debug(f"ERROR: Unable to retrieve metadata with ID {id} from the metadata API. ({e})")
         except Exception as e:
             logger.debug(f"ERROR: Unexpected error occurred when attempting to retrieve metadata by ID. ({str(e)})")
         return False
@@ -193,39 +283,232 @@ class NomisMetadataApiConnector(ApiConnector):
         or won't overwrite anything by calling this method. This method returns the uuid of the metadata that was
         appended to the server.
 
+        The metadata is posted in batches of at most `BATCH_SIZE` records and `BATCH_BYTES` bytes, several at once. A
+        batch that could not be sent (or was rate limited) is retried, and a batch that is rejected (with a 400 or 409
+        response) is split in half and each half posted again, until the records responsible are found; so every valid
+        record is added, even if others are rejected.
+
         :param metadata: Valid list of dictionary of strings representing metadata.
         :param return_uuids: Toggle for returning uuids instead of a boolean confirmation - for testing purposes.
 
-        :return: Bool indicating the success of the request, or the ids of the appended datasets if toggled for.
+        :raises requests.HTTPError: If any of the records were rejected (once all the others have been added), or if a
+            batch could not be posted; in the latter case, the ids of the records that were added are logged first, so
+            that they are not added again.
+        :return: Bool indicating the success of the request, or the ids of the appended datasets if toggled for, in the
+            same order as the metadata.
         """
-        # Establish headers
-        headers = {'Content-type': 'application/json', 'Accept': 'application/json'}
-
         # Ensure the metadata is a correct dict instance
         self.validate_metadata(metadata)
 
-        # Attempt to retrieve the metadata associated with the ID
+        ids: List[Optional[str]] = [None] * len(metadata)
+        failures: Dict[int, str] = {}
+        batches = self.batch_metadata(metadata)
+        with ThreadPoolExecutor(max_workers=min(max(len(batches), 1), MAX_WORKERS)) as executor:
+            futures = [executor.submit(self.add_metadata_batch, metadata, batch, ids, failures) for batch in batches]
+        errors = []
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(e)
+
+        if len(errors) > 0:
+            added = [i for i, id in enumerate(ids) if id is not None]
+            logger.error(f"{len(added)} of {len(metadata)} new metadata records were added before a batch failed: " +
+                         ", ".join(f"{ids[i]} (record {i}, belonging to {metadata[i].get('belongsTo')})"
+                                   for i in added))
+            raise errors[0]
+
+        if len(failures) > 0:
+            logger.debug(f"{len(metadata) - len(failures)} of {len(metadata)} new metadata records added successfully.")
+            raise requests.HTTPError(
+                f"Unable to add {len(failures)} of {len(metadata)} new metadata records. " + " ".join(
+                    f"(Record {i}, belonging to {metadata[i].get('belongsTo')}: {failures[i]})"
+                    for i in sorted(failures)
+                ))
+
+        logger.debug(f"SUCCESS: New metadata added successfully")
+        return ids if return_uuids else True
+
+    @staticmethod
+    def batch_metadata(metadata: List[Metadata]) -> List[List[int]]:
+        """
+        Method for dividing metadata into batches of at most `BATCH_SIZE` records and `BATCH_BYTES` bytes of JSON (or a
+        single record, if that alone is larger).
+
+        :return: The indices of the records in each batch.
+        """
+        batches: List[List[int]] = []
+        size = 0
+        for i, data in enumerate(metadata):
+            length = len(json.dumps(data)) + 1
+            if len(batches) == 0 or len(batches[-1]) == BATCH_SIZE or size + length > BATCH_BYTES:
+                batches.append([])
+                size = 1
+            batches[-1].append(i)
+            size += length
+        return batches
+
+    def add_metadata_batch(self, metadata: List[Metadata], batch: List[int], ids: List[Optional[str]],
+                           failures: Dict[int, str]) -> None:
+        """
+        Method for adding a batch of metadata, bisecting it if it is rejected. The uuid of each record added is written
+        to its place in `ids`, and the reason for each record rejected to `failures`.
+
+        :param metadata: The full list of metadata.
+        :param batch: The indices of the records in the batch.
+        :param ids: The uuids of the records, in the same order as the metadata.
+        :param failures: The reasons the records that have been rejected were rejected, keyed by index.
+        """
         try:
-            res = self.session.post(f'{self.client}/Definitions',
-                                    data=json.dumps(metadata), headers=headers, verify=False)
-        except Exception as e:
-            raise requests.ConnectionError(f"Unable to connect to client. ({e})")
+            uuids = self.post_metadata([metadata[i] for i in batch])
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code not in (400, 409):
+                raise
+            if len(batch) == 1:
+                failures[batch[0]] = str(e)
+                return
+            logger.debug(f"Batch of {len(batch)} metadata records rejected; splitting it.")
+            self.add_metadata_batch(metadata, batch[:len(batch) // 2], ids, failures)
+            self.add_metadata_batch(metadata, batch[len(batch) // 2:], ids, failures)
+            return
+
+        for i, uuid in zip(batch, uuids):
+            ids[i] = uuid
+            if metadata[i].get("belongsTo") is not None:
+                self.object_metadata.discard((self.client, str(metadata[i]["belongsTo"])))
+        if self.definitions is not None:
+            self.definitions.update(self.client, [{**metadata[i], "id": uuid} for i, uuid in zip(batch, uuids)])
+
+    def post_metadata(self, metadata: List[Metadata]) -> List[str]:
+        """
+        Method for making a single POST request to add metadata, retrying it (after a growing delay) only if it is known
+        not to have reached the API (see not_sent()) or is rate limited. The request is not idempotent, so it is not
+        retried after a server error, or after a connection failure once it may have been sent, as the metadata may
+        have been added regardless.
 
-        # Handle response
-        if res.status_code == 200:
-            logger.debug(f"SUCCESS: New metadata added successfully")
-            if return_uuids:
-                ids = []
-                for ds in res.json():
-                    ids.append(ds['id'])
+        :param metadata: Valid list of dictionary of strings representing metadata.
+
+        :raises requests.ConnectionError: If the API can't be reached, even after retrying, or the connection fails
+            once the request may have been sent.
+        :raises requests.HTTPError: If a negative response is received from the API; with the response attached.
+        :return: The ids of the appended metadata, in order.
+        """
+        # Establish headers
+        headers = {'Content-type': 'application/json', 'Accept': 'application/json'}
+
+        for attempt in range(RETRIES + 1):
+            if attempt > 0:
+                time.sleep(RETRY_DELAY * 2 ** (attempt - 1))
+
+            try:
+                res = self.session.post(f'{self.client}/Definitions',
+                                        data=json.dumps(metadata), headers=headers, verify=False)
+            except Exception as e:
+                error: requests.RequestException = requests.ConnectionError(f"Unable to connect to client. ({e})")
+                if self.not_sent(e):
+                    continue
+                raise error
+
+            # Handle response
+            if res.status_code == 200:
+                ids = [ds['id'] for ds in res.json()]
+                if len(ids) != len(metadata):
+                    raise requests.HTTPError(f"Unexpected response: {len(ids)} ids returned for {len(metadata)} "
+                                             f"metadata records.", response=res)
                 return ids
+            elif res.status_code == 400:
+                raise requests.HTTPError(f"Unable to add new metadata due to validation errors. ({res.text})",
+                                         response=res)
+            elif res.status_code == 409:
+                raise requests.HTTPError(f"ERROR: Unable to add new metadata due to conflict.", response=res)
+            error = requests.HTTPError(f"Unexpected status code: {res.status_code}. ({res.text})", response=res)
+            if res.status_code != 429:
+                raise error
+
+        logger.debug(f"Unable to add a batch of {len(metadata)} metadata records after {RETRIES} retries.")
+        raise error
+
+    @staticmethod
+    def not_sent(error: Exception) -> bool:
+        """
+        Method for checking whether a failed request is known not to have been sent, i.e. whether the connection to the
+        API could not be established at all (it was refused, or timed out).
+        """
+        if isinstance(error, requests.exceptions.ConnectTimeout):
             return True
-        elif res.status_code == 400:
-            raise requests.HTTPError(f"Unable to add new metadata due to validation errors. ({res.text})")
-        elif res.status_code == 409:
-            raise requests.HTTPError(f"ERROR: Unable to add new metadata due to conflict.")
-        else:
-            raise requests.HTTPError(f"Unexpected status code: {res.status_code}. ({res.text})")
+        if isinstance(error, requests.ConnectionError) and len(error.args) > 0:
+            reason = getattr(error.args[0], "reason", error.args[0])
+            return isinstance(reason, NewConnectionError)
+        return False
+
+    @staticmethod
+    def group_by_object(existing: List[Metadata]) -> Dict[str, List[Metadata]]:
+        """
+        Method for grouping metadata by the object it belongs to, as diff_metadata() expects.
+        """
+        by_object: Dict[str, List[Metadata]] = {}
+        for data in existing:
+            if data.get("belongsTo") is not None:
+                by_object.setdefault(str(data["belongsTo"]), []).append(data)
+        return by_object
+
+    @staticmethod
+    def diff_metadata(metadata: List[Metadata],
+                      by_object: Dict[str, List[Metadata]]) -> Tuple[List[Metadata], List[Metadata], List[Metadata]]:
+        """
+        Method for comparing new metadata with the metadata already on the server, matching them by the object they
+        belong to.
+
+        :param metadata: Valid list of dictionary of strings representing new metadata, each belonging to an object.
+        :param by_object: The metadata on the server, keyed by the object it belongs to (at least for every object that
+            the new metadata belongs to).
+        :return: A tuple of three lists: the new metadata for objects with no metadata on the server; the updates (with
+            the ids of the metadata to update) for objects whose metadata differs from the new metadata; and the
+            metadata that is unchanged.
+        """
+        new, changed, unchanged = [], [], []
+        for data in metadata:
+            current = by_object.get(str(data["belongsTo"]), [])
+            if len(current) == 0:
+                new.append(data)
+            elif any(c.get("meta") == data.get("meta") for c in current):
+                unchanged.append(data)
+            else:
+                changed.append({"id": current[0]["id"], "belongsTo": data["belongsTo"], "meta": data["meta"]})
+        return new, changed, unchanged
+
+    def sync_metadata(self, metadata: List[Metadata], return_uuids: bool = False) -> Union[List[str], bool]:
+        """
+        Method for bringing the metadata on the server into line with the metadata given, making only the requests
+        needed: the metadata on the server (or, if it is cached, only the metadata belonging to the same objects) is
+        retrieved once and compared with the new metadata (see diff_metadata()), and then only the metadata for objects
+        that have none is added, and only the metadata that differs is updated.
+
+        :param metadata: Valid list of dictionary of strings representing metadata, each belonging to an object.
+        :param return_uuids: Toggle for returning the ids of the metadata added or updated, instead of a boolean.
+
+        :raises requests.HTTPError: If any of the new metadata couldn't be added, or any of the updates made.
+        :return: Bool indicating success, or the ids of the metadata added and updated if toggled for.
+        """
+        self.validate_metadata(metadata)
+        # Only the cached metadata belonging to the same objects is needed, if the cache is fresh
+        by_object = None
+        if self.definitions is not None:
+            by_object = self.definitions.get_for_objects(self.client, [str(data["belongsTo"]) for data in metadata])
+        if by_object is None:
+            by_object = self.group_by_object(self.get_all_metadata())
+        new, changed, unchanged = self.diff_metadata(metadata, by_object)
+        logger.info(f"Metadata sync: {len(new)} new, {len(changed)} changed and {len(unchanged)} unchanged.")
+
+        ids = self.add_new_metadata(new, return_uuids=True) if len(new) > 0 else []
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = [executor.submit(self.update_metadata_association, data["id"], data) for data in changed]
+        for future in futures:
+            future.result()
+        ids += [data["id"] for data in changed]
+
+        return ids if return_uuids else True
 
     def update_metadata_association(self, id: str, metadata: Metadata) -> bool:
         """
@@ -260,6 +543,10 @@ class NomisMetadataApiConnector(ApiConnector):
 
         # Handle response
         if res.status_code == 201:
+            if "belongsTo" in metadata and metadata['belongsTo'] is not None:
+                self.object_metadata.discard((self.client, str(metadata['belongsTo'])))
+            if self.definitions is not None:
+                self.definitions.update(self.client, [metadata])
             logger.debug(f"Metadata with ID {id}{belongs_to} successfully updated.")
             return True
         elif res.status_code == 400:
@@ -0,0 +1,84 @@
+from file_reader import FileReader
+from type_hints import *
+from logging import getLogger
+import json
+import re
+logger = getLogger("DTS-Logger")
+
+# Number of characters read at a time when streaming a metadata file
+CHUNK_SIZE = 256 * 1024
+# A complete JSON string, an unterminated one, or a structural character
+TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|"|[\[\]{},:]')
+# The paths of the arrays whose items are read, where '*' stands for any item of an array
+ITEM_PATHS = {
+    ("dataModel", "dataTypes"),
+    ("dataModel", "childDataClasses", "*", "childDataElements")
+}
+
+
+class OnsMetadataReader(FileReader):
+    """
+    Class for reading metadata in the ONS format (i.e., an exported data model) from a file as a stream. Rather than
+    the whole data model being loaded, the file is scanned chunk by chunk and only the data types and the child data
+    elements are parsed, one at a time, as they are reached; so the memory used does not depend on the size of the
+    model.
+
+    :param file: A string representing the location of a file for use in the program.
+    :param chunk_size: The number of characters read from the file at a time.
+    """
+
+    def __init__(self, file: str, chunk_size: int = CHUNK_SIZE) -> None:
+        super().__init__(file)
+        self.chunk_size = chunk_size
+
+    def items(self) -> Iterator[dict]:
+        """
+        Generator for the data types and child data elements of the data model, in the order in which they appear in
+        the file.
+
+        :raises ValueError: If the file is not valid JSON.
+        """
+        # Each frame is an open object or array: [is_object, key or '*', expecting a key]
+        frames: List[list] = []
+        buffer = ""
+        position = 0
+        start: Optional[int] = None
+        item_depth = 0
+
+        with open(self.file, 'r', encoding=self.detect_encoding()) as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), ''):
+                buffer += chunk
+                for match in TOKEN.finditer(buffer, position):
+                    token = match.group()
+                    if token == '"':
+                        # An unterminated string; wait for the rest of it
+                        break
+                    position = match.end()
+
+                    if token == '{' or token == '[':
+                        if token == '{' and start is None and len(frames) > 0 and not frames[-1][0] and \
+                                tuple(frame[1] for frame in frames[:-1]) in ITEM_PATHS:
+                            start = match.start()
+                            item_depth = len(frames)
+                        frames.append([token == '{', '*', token == '{'])
+                    elif token == '}' or token == ']':
+                        frames.pop()
+                        if start is not None and token == '}' and len(frames) == item_depth:
+                            yield json.loads(buffer[start:match.end()])
+                            start = None
+                    elif token == ',':
+                        if frames[-1][0]:
+                            frames[-1][2] = True
+                    elif token != ':' and len(frames) > 0 and frames[-1][0] and frames[-1][2]:
+                        frames[-1][1] = json.loads(token)
+                        frames[-1][2] = False
+
+                # Keep only what is still needed: the item being read, or any unterminated string
+                keep = start if start is not None else position
+                buffer = buffer[keep:]
+                position -= keep
+                if start is not None:
+                    start = 0
+
+        if len(frames) > 0:
+            raise ValueError(f"The metadata file {self.file} ended unexpectedly.")
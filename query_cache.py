@@ -0,0 +1,223 @@
+from type_hints import *
+from file_lock import FileLock
+from contextlib import contextmanager
+from logging import getLogger
+import threading
+import hashlib
+import json
+import os
+import time
+logger = getLogger("DTS-Logger")
+
+
+class QueryCache:
+    """
+    Class for keeping the results of Cantabular queries on disk, so that repeated or overlapping imports of the same
+    dataset and variables do not need to download the table again. Entries are keyed by the client, the dataset, the
+    sorted list of variables and any category filters. An entry is fresh for `ttl` seconds after it was last validated against the API, after
+    which it must be revalidated before it is used again; and once the total size of the cache exceeds `max_size` bytes,
+    the least recently used entries are evicted.
+
+    Responses are written to a temporary file (see temp_path()) as they are downloaded, and only added to the cache by
+    put() once complete. The index is shared with any other processes using the same directory. It is always replaced
+    whole, so a process never reads a partially written index, and every update of it (along with the cached responses
+    it lists) is made while holding a lock on the directory (see locked()), so that concurrent updates from different
+    processes are never lost. A cached response that is missing from the index regardless (e.g. after a process was
+    killed part way through put()) is deleted when the cache is next evicted.
+
+    :param directory: Path of the directory in which the cached responses and the cache index are kept.
+    :param max_size: The maximum total size, in bytes, of the cached responses.
+    :param ttl: The number of seconds for which an entry may be used without being revalidated.
+
+    :ivar directory: Initial value: directory.
+    :vartype directory: str
+    :ivar max_size: Initial value: max_size.
+    :vartype max_size: int
+    :ivar ttl: Initial value: ttl.
+    :vartype ttl: int
+    """
+
+    INDEX_FILE = "index.json"
+    LOCK_FILE = "index.lock"
+
+    def __init__(self, directory: str, max_size: int, ttl: int) -> None:
+        if not isinstance(directory, str):
+            raise TypeError("The cache directory must be a valid string. Please check the config file.")
+        if not isinstance(max_size, int) or not isinstance(ttl, int):
+            raise TypeError("The cache max_size and ttl must be integers. Please check the config file.")
+        if max_size <= 0 or ttl < 0:
+            raise ValueError("The cache max_size must be positive and the ttl cannot be negative. Please check the "
+                             "config file.")
+
+        self.directory = directory
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.RLock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(client: str, dataset: str, variables: List[str], filters: Optional[Dict[str, List[str]]] = None) -> str:
+        """
+        Method for deriving the key of a query, from the client, the dataset, the sorted list of variables and any
+        category filters.
+
+        :return: A hex digest identifying the query.
+        """
+        query = json.dumps([client, dataset, sorted(variables),
+                            sorted([v, sorted(codes)] for v, codes in filters.items()) if filters else None])
+        return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+    def path(self, key: str) -> str:
+        """
+        Method for returning the path of the file containing the cached response for a key.
+        """
+        return os.path.join(self.directory, f"{key}.json")
+
+    def temp_path(self, key: str) -> str:
+        """
+        Method for returning the path of the temporary file to which a response for a key is written before put().
+        """
+        return f"{self.path(key)}.{os.getpid()}-{threading.get_ident()}.tmp"
+
+    @contextmanager
+    def locked(self) -> Iterator[Dict[str, dict]]:
+        """
+        Context manager for reading (and then writing) the cache index while holding the lock on the cache directory,
+        so that no other thread or process updates it in the meantime.
+        """
+        with self.lock, FileLock(os.path.join(self.directory, self.LOCK_FILE)):
+            yield self.load_index()
+
+    def load_index(self) -> Dict[str, dict]:
+        """
+        Method for loading the cache index, which holds the details of every entry in the cache.
+
+        :return: A dictionary of entries, keyed by query key. Empty if the index does not exist or cannot be read.
+        """
+        try:
+            with open(os.path.join(self.directory, self.INDEX_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_index(self, index: Dict[str, dict]) -> None:
+        """
+        Method for writing out the cache index. The index is written to a temporary file that then replaces the old
+        index, so that other processes sharing the cache never read a partially written index.
+        """
+        index_file = os.path.join(self.directory, self.INDEX_FILE)
+        temp_file = f"{index_file}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(temp_file, index_file)
+
+    def get(self, key: str) -> Union[dict, None]:
+        """
+        Method for retrieving the details of a cache entry.
+
+        :return: The entry for the key, or `None` if the key isn't cached.
+        """
+        entry = self.load_index().get(key)
+        if entry is None or not os.path.exists(self.path(key)):
+            return None
+        return entry
+
+    def is_fresh(self, entry: dict) -> bool:
+        """
+        Method for checking whether an entry can be used without revalidation.
+        """
+        return time.time() - entry["validated"] < self.ttl
+
+    def open(self, key: str) -> BinaryIO:
+        """
+        Method for opening a cached response for reading, marking the entry as the most recently used.
+        """
+        with self.locked() as index:
+            if key in index:
+                index[key]["accessed"] = time.time()
+                self.write_index(index)
+        return open(self.path(key), 'rb')
+
+    def revalidate(self, key: str) -> None:
+        """
+        Method for marking an entry as having been confirmed as up to date by the API.
+        """
+        with self.locked() as index:
+            if key in index:
+                index[key]["validated"] = time.time()
+                self.write_index(index)
+
+    def put(self, key: str, entry: dict) -> None:
+        """
+        Method for adding the response written to the temporary file for a key to the cache, and then evicting the
+        least recently used entries as necessary. The temporary file is deleted if the response can't be added.
+
+        :param key: The key of the query.
+        :param entry: The details of the entry: the `client`, `dataset`, `variables`, `sizes` and `digest` of the table,
+            as well as the `etag` and `last_modified` headers of the response (if any).
+        """
+        try:
+            with self.locked() as index:
+                os.replace(self.temp_path(key), self.path(key))
+                now = time.time()
+                index[key] = dict(entry, size=os.path.getsize(self.path(key)), validated=now, accessed=now)
+                self.write_index(self.evict(index))
+        except Exception:
+            self.discard(key)
+            raise
+        logger.debug(f"Query for {entry['dataset']} with variables {entry['variables']} added to the cache.")
+
+    def discard(self, key: str) -> None:
+        """
+        Method for deleting the temporary file for a key, if a response could not be completed.
+        """
+        try:
+            os.remove(self.temp_path(key))
+        except FileNotFoundError:
+            pass
+
+    def invalidate_dataset(self, client: str, dataset: str, digest: str) -> None:
+        """
+        Method for removing all entries for a dataset on a client that were cached from a different version of it (i.e.,
+        where the dataset digest differs from the one given).
+        """
+        with self.locked() as index:
+            stale = [key for key, entry in index.items()
+                     if entry["client"] == client and entry["dataset"] == dataset and entry["digest"] != digest]
+            for key in stale:
+                self.remove(key, index)
+            if len(stale) > 0:
+                logger.debug(f"{len(stale)} cached queries for an older version of {dataset} removed.")
+                self.write_index(index)
+
+    def evict(self, index: Dict[str, dict]) -> Dict[str, dict]:
+        """
+        Method for evicting the least recently used entries until the total size of the cache is within its limit, once
+        any cached responses missing from the index have been deleted. To be called while holding the lock.
+
+        :return: The index, without the evicted entries.
+        """
+        for name in os.listdir(self.directory):
+            key, extension = os.path.splitext(name)
+            if extension == ".json" and name != self.INDEX_FILE and key not in index:
+                logger.debug(f"Cached response {name} is not in the cache index; deleting it.")
+                self.remove(key, index)
+
+        total = sum(entry["size"] for entry in index.values())
+        for key in sorted(index, key=lambda k: index[k]["accessed"]):
+            if total <= self.max_size:
+                break
+            total -= index[key]["size"]
+            self.remove(key, index)
+            logger.debug(f"Query with key {key} evicted from the cache.")
+        return index
+
+    def remove(self, key: str, index: Dict[str, dict]) -> None:
+        """
+        Method for removing an entry from the index (in place), if it is there, and deleting its cached response.
+        """
+        index.pop(key, None)
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
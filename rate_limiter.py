@@ -0,0 +1,120 @@
+from type_hints import *
+from file_lock import FileLock
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from logging import getLogger
+import tempfile
+import requests
+import json
+import time
+import os
+logger = getLogger("DTS-Logger")
+
+
+class RateLimiter:
+    """
+    Class for limiting the rate of requests made to an API with a token bucket. The state of the bucket is kept in a
+    small file, locked whenever it is read or updated, so that every process on the host using the same directory
+    shares a single budget for the API.
+
+    Each request takes a token from the bucket, which is refilled at `rate` tokens a second, up to `burst` tokens. A
+    request made when the bucket is empty takes its token in advance (leaving the bucket in debt) and waits until the
+    token would have been added, so that waiting requests are served in turn.
+
+    :param name: The name of the API, which names the file holding the state of its bucket.
+    :param rate: The number of requests allowed per second, on average.
+    :param burst: The number of requests that may be made at once, after a period without any.
+    :param directory: Optionally, the directory in which the state is kept; by default, the temporary directory.
+
+    :ivar path: The path of the file holding the state of the bucket.
+    :vartype path: str
+    """
+
+    def __init__(self, name: str, rate: Union[int, float], burst: int, directory: Optional[str] = None) -> None:
+        if not isinstance(rate, (int, float)) or not isinstance(burst, int):
+            raise TypeError(f"The {name} rate must be a number and the burst an integer. Please check the config file.")
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"The {name} rate and burst must be positive. Please check the config file.")
+        if directory is not None and not isinstance(directory, str):
+            raise TypeError("The rate limit directory must be a valid string. Please check the config file.")
+
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        directory = directory if directory is not None else os.path.join(tempfile.gettempdir(), "dts-rate-limits")
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{name}.json")
+
+    @contextmanager
+    def state(self) -> Iterator[dict]:
+        """
+        Context manager for reading and updating the state of the bucket while holding the lock on its file. The
+        number of tokens is refilled up to the present before the state is yielded, and any changes made to it are
+        written back on exit.
+        """
+        with open(self.path, 'a+b') as f:
+            FileLock.lock(f)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read())
+                except ValueError:
+                    state = {}
+
+                now = time.time()
+                tokens = state.get("tokens", self.burst)
+                updated = state.get("updated", now)
+                state = {"tokens": min(self.burst, tokens + max(0.0, now - updated) * self.rate), "updated": now}
+                yield state
+
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state).encode('utf-8'))
+                f.flush()
+            finally:
+                FileLock.unlock(f)
+
+    def acquire(self) -> float:
+        """
+        Method for taking a token for a request, waiting until it is available if necessary.
+
+        :return: The number of seconds waited.
+        """
+        with self.state() as state:
+            state["tokens"] -= 1
+            wait = max(0.0, -state["tokens"] / self.rate)
+
+        if wait > 0:
+            logger.debug(f"Rate limit for the {self.name} API reached; waiting {wait:.2f} seconds.")
+            time.sleep(wait)
+        return wait
+
+    def drain(self, seconds: float = 0) -> None:
+        """
+        Method for emptying the bucket, after the API has refused a request for exceeding its quota, so that no process
+        makes another request until at least `seconds` (e.g. from the Retry-After header) have passed.
+        """
+        with self.state() as state:
+            state["tokens"] = min(state["tokens"], -seconds * self.rate)
+        logger.debug(f"The {self.name} API reported too many requests; rate limit bucket drained.")
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    Transport adapter for a requests Session, which takes a token from a `RateLimiter` before sending each request, and
+    drains it if the API responds with 429 (Too Many Requests).
+
+    :param limiter: The rate limiter for the API.
+    """
+
+    def __init__(self, limiter: RateLimiter, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.limiter = limiter
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        self.limiter.acquire()
+        res = super().send(request, **kwargs)
+        if res.status_code == 429:
+            retry_after = res.headers.get('Retry-After', '')
+            self.limiter.drain(float(retry_after) if retry_after.isdigit() else 1 / self.limiter.rate)
+        return res
@@ -0,0 +1,69 @@
+from file_reader import FileReader
+from type_hints import *
+from logging import getLogger
+logger = getLogger("DTS-Logger")
+
+
+class RecodeFileReader(FileReader):
+    """
+    Class for reading a recode file; that is, a JSON file giving, for each dimension to recode, the name (and optionally
+    the label) of the new variable, and its categories in order, each with its code, its label, and the codes of the
+    categories merged into it. For example:
+
+    {"AGE": {"name": "AGE_5Y", "label": "Age (5-year bands)",
+             "categories": [{"code": "1", "label": "Aged 0 to 4", "categories": ["0", "1", "2", "3", "4"]}, ...]}}
+
+    The new variable must be named differently from the dimension recoded, as its categories are not those of the
+    dimension's variable in Nomis.
+
+    :param file: A string representing the location of a file for use in the program.
+    """
+
+    def recodes(self) -> Dict[str, Recode]:
+        """
+        Method for reading the recodes from the file.
+
+        :raises FileNotFoundError: If the recode file can't be located.
+        :raises TypeError: If the file is not in the format above.
+        :raises ValueError: If a new variable is named after the dimension recoded (or after another new variable), a
+            new category is given more than once, or a category is merged into more than one new category.
+        :return: A dictionary keyed by dimension, of the name and label of the new variable, the code of the new
+            category into which each category is merged, and the labels of the new categories (in order).
+        """
+        self.exists()
+        data = self.load_json()
+        if not isinstance(data, dict):
+            raise TypeError(f"The recode file {self.file} must contain an object of dimensions.")
+
+        recodes: Dict[str, Recode] = {}
+        for dimension, recode in data.items():
+            if not isinstance(recode, dict) or not isinstance(recode.get("name"), str) or \
+                    not isinstance(recode.get("categories"), list):
+                raise TypeError(f"The recode of {dimension} in {self.file} must have the name of the new variable and "
+                                f"a list of categories.")
+            name = recode["name"].strip()
+            if len(name) == 0 or name == dimension or name in data or \
+                    name in [other.name for other in recodes.values()]:
+                raise ValueError(f"The recode of {dimension} in {self.file} must name a new variable, distinct from "
+                                 f"the dimensions recoded and the other new variables.")
+            categories = recode["categories"]
+
+            mapping: Dict[str, str] = {}
+            labels: Dict[str, str] = {}
+            for category in categories:
+                if not isinstance(category, dict) or not isinstance(category.get("code"), str) or \
+                        not isinstance(category.get("categories"), list):
+                    raise TypeError(f"Each category of the recode of {dimension} in {self.file} must have a code and a "
+                                    f"list of the categories merged into it.")
+                if category["code"] in labels:
+                    raise ValueError(f"Category {category['code']} is given more than once in the recode of "
+                                     f"{dimension}.")
+                labels[category["code"]] = str(category.get("label", category["code"]))
+                for code in category["categories"]:
+                    if mapping.setdefault(str(code), category["code"]) != category["code"]:
+                        raise ValueError(f"Category {code} of {dimension} is merged into more than one category.")
+            recodes[dimension] = Recode(name=name, label=str(recode.get("label", name)), mapping=mapping,
+                                        labels=labels)
+
+        logger.debug(f"Recodes read for {', '.join(recodes)}.")
+        return recodes
@@ -0,0 +1,407 @@
+from type_hints import *
+from pyjstat import pyjstat  # type: ignore
+from collections import OrderedDict
+from logging import getLogger
+import numpy as np
+logger = getLogger("DTS-Logger")
+
+
+class TableOperations:
+    """
+    Class containing operations on whole tables (pyjstat Datasets), carried out on the value array as a numpy array
+    with one axis per dimension (in the order of the table's `id`), rather than cell by cell. Each operation returns a
+    new table, sharing the category structures of any unchanged dimensions with the original; the original table is
+    left as it was.
+    """
+
+    @staticmethod
+    def cube(table: pyjstat.Dataset, key: str = "value") -> np.ndarray:
+        """
+        Method for viewing the values (or statuses) of a table as an array with one axis per dimension, without copying
+        them where they are already held in a numpy array. Values given as a dict keyed by position (the sparse form of
+        JSON-stat) are expanded into an array, with the values missing from the dict null.
+
+        :raises ValueError: If the number of values doesn't match the size of the table.
+        """
+        sizes = [len(table["dimension"][dimension]["category"]["index"]) for dimension in table["id"]]
+        if isinstance(table[key], dict):
+            values = np.full(int(np.prod(sizes)), None, dtype=object)
+            if len(table[key]) > 0:
+                values[np.array([int(position) for position in table[key]])] = list(table[key].values())
+        else:
+            values = np.asarray(table[key])
+        if values.size != int(np.prod(sizes)):
+            raise ValueError(f"The table has {values.size} {key}s, but its dimensions have {int(np.prod(sizes))} "
+                             f"cells.")
+        return values.reshape(sizes)
+
+    @staticmethod
+    def codes(table: pyjstat.Dataset, dimension: str) -> List[str]:
+        """
+        Method for listing the category codes of a dimension of a table in order, whether the categories are indexed by
+        a list or by a dict of positions.
+        """
+        index = table["dimension"][dimension]["category"]["index"]
+        return sorted(index, key=index.get) if isinstance(index, dict) else list(index)
+
+    @staticmethod
+    def derive(table: pyjstat.Dataset, dimensions: Dict[str, dict], values: np.ndarray,
+               status: Any = None) -> pyjstat.Dataset:
+        """
+        Method for building a new table from an existing one, with new dimensions (in order) and values; everything
+        else (e.g., the extension) is carried over.
+
+        :param table: The existing table.
+        :param dimensions: The dimensions of the new table, in order.
+        :param values: The values of the new table, as an array with one axis per dimension.
+        :param status: Optionally, the status of the new table: a single status, or the statuses of its values (as a
+            list, or a dict keyed by the position of the value).
+        """
+        derived = pyjstat.Dataset(
+            (key, value) for key, value in table.items() if key not in ("id", "size", "dimension", "value", "status")
+        )
+        derived["id"] = list(dimensions)
+        derived["size"] = [len(dimension["category"]["index"]) for dimension in dimensions.values()]
+        derived["dimension"] = OrderedDict(dimensions)
+        derived["value"] = values.reshape(-1)
+        if status is not None:
+            derived["status"] = status
+        return derived
+
+    @staticmethod
+    def reorder(table: pyjstat.Dataset, order: List[str]) -> pyjstat.Dataset:
+        """
+        Method for reordering the dimensions of a table. The axes of the value array are permuted and the result is
+        made contiguous, so the values are copied exactly once; per-value statuses are reordered alike.
+
+        :param table: The table to reorder.
+        :param order: The names of all of the dimensions of the table, in their new order.
+
+        :raises ValueError: If the order is not a rearrangement of the dimensions of the table.
+        :return: The reordered table; or the table itself, if its dimensions are already in order.
+        """
+        if sorted(order) != sorted(table["id"]):
+            raise ValueError(f"Dimension order {order} does not match the dimensions of the table, {table['id']}.")
+        if list(order) == list(table["id"]):
+            return table
+
+        axes = [table["id"].index(dimension) for dimension in order]
+        cube = TableOperations.cube(table)
+        values = np.ascontiguousarray(np.transpose(cube, axes))
+
+        status = table.get("status")
+        if isinstance(status, list):
+            status = np.transpose(TableOperations.cube(table, "status"), axes).reshape(-1).tolist()
+        elif isinstance(status, dict) and len(status) > 0:
+            positions = np.array([int(position) for position in status])
+            cells = np.unravel_index(positions, cube.shape)
+            moved = np.ravel_multi_index(tuple(cells[axis] for axis in axes), values.shape)
+            status = {str(position): value for position, value in zip(moved.tolist(), status.values())}
+
+        logger.debug(f"Table dimensions reordered from {table['id']} to {order}.")
+        return TableOperations.derive(table, OrderedDict(
+            (dimension, table["dimension"][dimension]) for dimension in order
+        ), values, status)
+
+    @staticmethod
+    def marginalise(table: pyjstat.Dataset, dimensions: List[str]) -> pyjstat.Dataset:
+        """
+        Method for deriving a table of fewer dimensions from a table, by summing out all of the other dimensions; e.g.,
+        the SEX table from a SEX by AGE table. The sums are taken over all of the summed-out axes at once; null values
+        make their sums null, and the statuses of the values are dropped.
+
+        :param table: The table to marginalise.
+        :param dimensions: The names of the dimensions to keep, in the order wanted.
+
+        :raises KeyError: If any of the dimensions is not in the table.
+        :raises ValueError: If no dimensions, or the same dimension more than once, are kept.
+        :return: The marginal table; or the table itself, if all of its dimensions are kept in order.
+        """
+        missing = [dimension for dimension in dimensions if dimension not in table["id"]]
+        if len(missing) > 0:
+            raise KeyError(f"Dimensions {missing} are not in the table, which has dimensions {table['id']}.")
+        if len(dimensions) == 0 or len(set(dimensions)) != len(dimensions):
+            raise ValueError(f"Invalid dimensions to keep: {dimensions}.")
+        if list(dimensions) == list(table["id"]):
+            return table
+
+        kept = [dimension for dimension in table["id"] if dimension in dimensions]
+        summed = tuple(axis for axis, dimension in enumerate(table["id"]) if dimension not in dimensions)
+        cube = TableOperations.cube(table)
+        if cube.dtype == object:
+            cube = cube.astype(float)
+        values = cube.sum(axis=summed) if len(summed) > 0 else cube
+
+        logger.debug(f"Table marginalised from {table['id']} to {kept}.")
+        marginal = TableOperations.derive(table, OrderedDict(
+            (dimension, table["dimension"][dimension]) for dimension in kept
+        ), values)
+        return TableOperations.reorder(marginal, list(dimensions))
+
+    @staticmethod
+    def select(table: pyjstat.Dataset, selections: Dict[str, List[str]]) -> pyjstat.Dataset:
+        """
+        Method for selecting some of the categories of any of the dimensions of a table, e.g. some areas; the sub-table
+        is taken from the value array with a single fancy index (over all of the dimensions at once), and the category
+        index and labels of each dimension selected from are rewritten to match. The selected categories keep their
+        order in the table, and per-value statuses are selected alike.
+
+        :param table: The table to select from.
+        :param selections: The codes of the categories selected, keyed by dimension; dimensions not included are kept
+            in full.
+
+        :raises KeyError: If any of the dimensions is not in the table, or any of the codes is not one of its
+            categories.
+        :raises ValueError: If no categories of a dimension are selected.
+        :return: The sub-table; or the table itself, if there are no selections.
+        """
+        if len(selections) == 0:
+            return table
+        unknown = [dimension for dimension in selections if dimension not in table["id"]]
+        if len(unknown) > 0:
+            raise KeyError(f"Dimensions {', '.join(unknown)} are not in the table.")
+
+        positions = []
+        dimensions = OrderedDict()
+        for dimension in table["id"]:
+            codes = TableOperations.codes(table, dimension)
+            if dimension not in selections:
+                positions.append(np.arange(len(codes)))
+                dimensions[dimension] = table["dimension"][dimension]
+                continue
+
+            position = {code: i for i, code in enumerate(codes)}
+            unknown = [code for code in selections[dimension] if code not in position]
+            if len(unknown) > 0:
+                raise KeyError(f"Categories {', '.join(unknown)} are not categories of {dimension}.")
+            if len(selections[dimension]) == 0:
+                raise ValueError(f"No categories of {dimension} are selected.")
+            selected = np.unique([position[code] for code in selections[dimension]])
+            positions.append(selected)
+
+            category = dict(table["dimension"][dimension]["category"])
+            category["index"] = [codes[i] for i in selected]
+            if "label" in category:
+                category["label"] = OrderedDict(
+                    (code, category["label"][code]) for code in category["index"] if code in category["label"]
+                )
+            dimensions[dimension] = dict(table["dimension"][dimension], category=category)
+
+        cube = TableOperations.cube(table)
+        values = cube[np.ix_(*positions)]
+
+        status = table.get("status")
+        if isinstance(status, list):
+            status = TableOperations.cube(table, "status")[np.ix_(*positions)].reshape(-1).tolist()
+        elif isinstance(status, dict) and len(status) > 0:
+            # Find the new position of each cell with a status, if the cell is selected
+            cells = np.unravel_index(np.array([int(position) for position in status]), cube.shape)
+            kept = np.ones(len(status), dtype=bool)
+            moved = []
+            for axis, selected in enumerate(positions):
+                lookup = np.full(cube.shape[axis], -1)
+                lookup[selected] = np.arange(len(selected))
+                moved.append(lookup[cells[axis]])
+                kept &= moved[-1] >= 0
+            new = np.ravel_multi_index(tuple(axis[kept] for axis in moved), values.shape)
+            status = {str(position): value for position, value in
+                      zip(new.tolist(), np.array(list(status.values()), dtype=object)[kept])}
+
+        logger.debug(f"Categories selected from {', '.join(selections)}; table reduced from {cube.size} to "
+                     f"{values.size} cells.")
+        return TableOperations.derive(table, dimensions, values, status)
+
+    @staticmethod
+    def concatenate(tables: List[pyjstat.Dataset], dimension: str) -> pyjstat.Dataset:
+        """
+        Method for concatenating tables along one of their dimensions, e.g. tables of the same variables for England and
+        for Wales along the geography; the categories of the dimension are those of each table in turn. The tables must
+        share the rest of their dimensions, category for category, though not necessarily in the same order (each table
+        is reordered to match the first). The values of each table are written straight into their place in an array
+        preallocated for the whole result, and per-value statuses are concatenated alike; everything else (e.g., the
+        extension) is carried over from the first table.
+
+        :param tables: The tables to concatenate, in order.
+        :param dimension: The name of the dimension along which the tables are concatenated.
+
+        :raises KeyError: If the dimension is not in every table.
+        :raises ValueError: If there are no tables, if the other dimensions of the tables differ, or if a category of
+            the dimension is in more than one table.
+        :return: The concatenated table; or the table itself, if there is only one.
+        """
+        if len(tables) == 0:
+            raise ValueError("There are no tables to concatenate.")
+        for number, table in enumerate(tables):
+            if dimension not in table["id"]:
+                raise KeyError(f"Dimension {dimension} is not in table {number}.")
+        if len(tables) == 1:
+            return tables[0]
+
+        first = tables[0]
+        for number, table in enumerate(tables[1:], 1):
+            if sorted(table["id"]) != sorted(first["id"]):
+                raise ValueError(f"Table {number} has dimensions {table['id']}, rather than {first['id']}.")
+            for other in first["id"]:
+                if other != dimension and TableOperations.codes(table, other) != TableOperations.codes(first, other):
+                    raise ValueError(f"The categories of {other} in table {number} differ from those in table 0.")
+        tables = [TableOperations.reorder(table, first["id"]) for table in tables]
+
+        index: List[str] = []
+        labels: Dict[str, str] = OrderedDict()
+        for table in tables:
+            index += TableOperations.codes(table, dimension)
+            labels.update(table["dimension"][dimension]["category"].get("label", {}))
+        if len(set(index)) != len(index):
+            raise ValueError(f"{len(index) - len(set(index))} categories of {dimension} are in more than one table.")
+
+        axis = first["id"].index(dimension)
+        cubes = [TableOperations.cube(table) for table in tables]
+        shape = list(cubes[0].shape)
+        shape[axis] = len(index)
+        values = np.empty(shape, dtype=np.result_type(*cubes))
+        statuses = None
+        if any(table.get("status") is not None for table in tables):
+            statuses = np.empty(shape, dtype=object)
+
+        position = [slice(None)] * len(shape)
+        start = 0
+        for table, cube in zip(tables, cubes):
+            position[axis] = slice(start, start + cube.shape[axis])
+            values[tuple(position)] = cube
+            if statuses is not None:
+                statuses[tuple(position)] = TableOperations.status_cube(table)
+            start += cube.shape[axis]
+
+        category = {"index": index, "label": labels} if len(labels) > 0 else {"index": index}
+        dimensions = OrderedDict(
+            (other, dict(first["dimension"][other], category=category) if other == dimension
+             else first["dimension"][other]) for other in first["id"]
+        )
+        logger.debug(f"{len(tables)} tables concatenated along {dimension}, with {len(index)} categories in all.")
+        return TableOperations.derive(first, dimensions, values,
+                                      statuses.reshape(-1).tolist() if statuses is not None else None)
+
+    @staticmethod
+    def status_cube(table: pyjstat.Dataset) -> np.ndarray:
+        """
+        Method for expanding the status of a table, in any of its forms (a single status, or the statuses of its values
+        as a list or a dict keyed by position), into an array of the status of each value, with one axis per dimension.
+        """
+        sizes = [len(table["dimension"][dimension]["category"]["index"]) for dimension in table["id"]]
+        status = table.get("status")
+        if isinstance(status, list):
+            return TableOperations.cube(table, "status")
+        statuses = np.full(int(np.prod(sizes)), None if isinstance(status, dict) else status, dtype=object)
+        if isinstance(status, dict) and len(status) > 0:
+            statuses[np.array([int(position) for position in status])] = list(status.values())
+        return statuses.reshape(sizes)
+
+    @staticmethod
+    def move_to_front(table: pyjstat.Dataset, dimensions: List[str]) -> pyjstat.Dataset:
+        """
+        Method for reordering a table so that the given dimensions (e.g., the geography) come first, with the rest of
+        the dimensions left in the same order.
+        """
+        return TableOperations.reorder(table, list(dimensions) + [d for d in table["id"] if d not in dimensions])
+
+    @staticmethod
+    def merge_categories(table: pyjstat.Dataset, dimension: str, mapping: Dict[str, str], name: str, label: str,
+                         labels: Optional[Dict[str, str]] = None) -> pyjstat.Dataset:
+        """
+        Method for merging the categories of a dimension of a table into fewer categories, summing their values. The
+        values are grouped along the axis of the dimension and summed in a single pass (with `numpy.add.reduceat`),
+        rather than category by category; null values make their sums null, and the statuses of the values are dropped.
+
+        :param table: The table.
+        :param dimension: The name of the dimension.
+        :param mapping: The code of the new category into which each category of the dimension is merged.
+        :param name: The name of the new dimension, in place of the dimension.
+        :param label: The label of the new dimension.
+        :param labels: Optionally, the labels of the new categories, which are in the order of this dictionary;
+            otherwise, the new categories are labelled by their codes, in the order in which they appear in `mapping`.
+
+        :raises KeyError: If the dimension is not in the table, or any of its categories is not mapped to a new
+            category (with a label, if labels are given).
+        :return: The table with the merged categories. Only the new categories into which any category is merged are
+            included.
+        """
+        if dimension not in table["id"]:
+            raise KeyError(f"Dimension {dimension} is not in the table.")
+
+        codes = TableOperations.codes(table, dimension)
+        missing = [code for code in codes
+                   if code not in mapping or (labels is not None and mapping[code] not in labels)]
+        if len(missing) > 0:
+            raise KeyError(f"{len(missing)} categories of {dimension} are not mapped to a category of {name}, e.g. "
+                           f"{', '.join(missing[:5])}.")
+
+        # Number the new categories in order, and group the categories of the dimension by them
+        merged = list(labels) if labels is not None else list(dict.fromkeys(mapping.values()))
+        position = {code: i for i, code in enumerate(merged)}
+        groups = np.array([position[mapping[code]] for code in codes], dtype=np.int64)
+        order = np.argsort(groups, kind='stable')
+        starts = np.flatnonzero(np.r_[True, np.diff(groups[order]) != 0])
+        index = [merged[i] for i in np.unique(groups)]
+
+        axis = table["id"].index(dimension)
+        cube = TableOperations.cube(table)
+        if cube.dtype == object:
+            cube = cube.astype(float)
+        if not np.array_equal(order, np.arange(len(order))):
+            cube = cube.take(order, axis=axis)
+        values = np.add.reduceat(cube, starts, axis=axis) if len(codes) > 0 else cube
+
+        logger.debug(f"Table aggregated from {len(codes)} {dimension} categories to {len(index)} {name} categories.")
+        dimensions = OrderedDict()
+        for other in table["id"]:
+            if other == dimension:
+                dimensions[name] = {"label": label, "category": {"index": index, "label": OrderedDict(
+                    (code, labels[code] if labels is not None else code) for code in index
+                )}}
+            else:
+                dimensions[other] = table["dimension"][other]
+        return TableOperations.derive(table, dimensions, values)
+
+    @staticmethod
+    def roll_up(table: pyjstat.Dataset, dimension: str, parents: Dict[str, str], level: str) -> pyjstat.Dataset:
+        """
+        Method for aggregating a geography dimension of a table to a coarser geography level, summing the values of the
+        categories contained by each category of the coarser level (see merge_categories()). The categories of the
+        coarser level are in the order in which they appear in `parents`.
+
+        :param table: The table to aggregate.
+        :param dimension: The name of the geography dimension.
+        :param parents: The code of the category of the coarser level containing each category of the dimension.
+        :param level: The name of the coarser level, which names the new dimension.
+
+        :raises KeyError: If the dimension is not in the table, or any of its categories has no parent.
+        :raises ValueError: If the table already has a dimension named after the coarser level.
+        :return: The aggregated table, with the coarser level in place of the dimension.
+        """
+        if level in table["id"]:
+            raise ValueError(f"The table already has a dimension named {level}.")
+        return TableOperations.merge_categories(table, dimension, parents, level, level)
+
+    @staticmethod
+    def recode(table: pyjstat.Dataset, dimension: str, mapping: Dict[str, str], name: str, label: str,
+               labels: Optional[Dict[str, str]] = None) -> pyjstat.Dataset:
+        """
+        Method for recoding a dimension of a table into coarser categories, e.g. single years of age into five-year
+        bands, summing the values of the categories merged into each (see merge_categories()). The recoded dimension is
+        a new variable, in place of the dimension, so it must be named differently: its categories are not those of the
+        variable of the dimension.
+
+        :param table: The table to recode.
+        :param dimension: The name of the dimension.
+        :param mapping: The code of the new category into which each category of the dimension is merged.
+        :param name: The name of the new dimension.
+        :param label: The label of the new dimension.
+        :param labels: Optionally, the labels of the new categories, in order.
+
+        :raises KeyError: If the dimension is not in the table, or any of its categories is not mapped.
+        :raises ValueError: If the table already has a dimension with the new name.
+        :return: The recoded table, with the new dimension in place of the dimension.
+        """
+        if name in table["id"]:
+            raise ValueError(f"The table already has a dimension named {name}.")
+        return TableOperations.merge_categories(table, dimension, mapping, name, label, labels)
@@ -0,0 +1,42 @@
+from type_hints import *
+from pyjstat import pyjstat  # type: ignore
+from collections import OrderedDict
+
+
+class TableView(pyjstat.Dataset):
+    """
+    Class for a view of a table without some of its dimensions; used where the rest of the table is needed on its own,
+    e.g. for creating the variables, types and categories of the non-geography dimensions. Nothing is copied: the view
+    shares the values and the category structures of each remaining dimension with the original table, and only the
+    lists naming the dimensions are new. The original table is left as it was.
+
+    Note that the values of the view are those of the whole table, in its original shape; only the dimensions are
+    hidden.
+
+    :param table: The original table.
+    :param excluded: The names of the dimensions that are hidden.
+
+    :raises KeyError: If any of the excluded dimensions is not in the table.
+
+    :ivar table: Initial value: table.
+    :vartype table: pyjstat.Dataset
+    :ivar excluded: Initial value: excluded.
+    :vartype excluded: List[str]
+    """
+
+    def __init__(self, table: pyjstat.Dataset, excluded: List[str]) -> None:
+        for dimension in excluded:
+            if dimension not in table["dimension"]:
+                raise KeyError(f"Dimension {dimension} is not in the table.")
+
+        super().__init__((key, value) for key, value in table.items() if key not in ("id", "size", "dimension"))
+        if "id" in table:
+            self["id"] = [dimension for dimension in table["id"] if dimension not in excluded]
+        if "size" in table:
+            self["size"] = [size for dimension, size in zip(table["id"], table["size"]) if dimension not in excluded]
+        self["dimension"] = OrderedDict(
+            (dimension, table["dimension"][dimension]) for dimension in table["dimension"] if dimension not in excluded
+        )
+
+        self.table = table
+        self.excluded = excluded
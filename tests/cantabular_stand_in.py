@@ -0,0 +1,146 @@
+# type: ignore
+
+"""
+A stand-in for the Cantabular API, for testing without a connection to the real API. It holds a small synthetic
+dataset with a geography variable (OA), SEX and AGE, and answers query-json-stat requests for it in the same form as
+Cantabular, including category filters (f=VARIABLE,CODE,CODE...). The queries can be answered directly, with
+query_json_stat(), or over HTTP by a StandInServer running in the background.
+"""
+
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl, unquote
+import threading
+import time
+import itertools
+import base64
+import json
+
+DATASET = 'Usual-Residents'
+DIGEST = 'c932e250328b1cb6083ad580e9cc4ed6e3d7d3073ae8295b7589c8914bd5c834'
+
+VARIABLES = OrderedDict([
+    ('OA', ('Output Area', OrderedDict((f'E0000{i:04d}', f'Output Area {i}') for i in range(1, 26)))),
+    ('SEX', ('Sex', OrderedDict([('1', 'Male'), ('2', 'Female')]))),
+    ('AGE', ('Age', OrderedDict((str(i), f'Age {i}') for i in range(1, 8)))),
+])
+
+
+def count(cell: dict) -> int:
+    """A deterministic count for a cell of the full dataset, given the category code of each variable."""
+    return sum((i + 2) * sum(map(ord, cell[v])) for i, v in enumerate(VARIABLES)) % 1000
+
+
+def query_json_stat(url: str) -> (int, bytes):
+    """
+    Answer a query-json-stat request.
+
+    :return: The status code and the body of the response.
+    """
+    parts = urlsplit(url)
+    dataset = unquote(parts.path.rstrip('/').split('/')[-1])
+    if dataset != DATASET:
+        return 404, json.dumps({"message": "dataset not found"}).encode()
+
+    variables, filters = [], {}
+    for name, value in parse_qsl(parts.query):
+        if name == 'v':
+            variables.append(value)
+        elif name == 'f':
+            variable, *codes = value.split(',')
+            filters[variable] = codes
+    for variable in variables + list(filters):
+        if variable not in VARIABLES:
+            return 400, json.dumps({"message": f"variable {variable} not found"}).encode()
+
+    dimension = OrderedDict()
+    for variable in variables:
+        label, categories = VARIABLES[variable]
+        codes = [code for code in categories if variable not in filters or code in filters[variable]]
+        dimension[variable] = OrderedDict([
+            ('label', label),
+            ('category', OrderedDict([
+                ('index', codes),
+                ('label', OrderedDict((code, categories[code]) for code in codes))
+            ]))
+        ])
+
+    # Only the categories of queried variables are tallied; for unqueried variables, the count is summed over them
+    others = [v for v in VARIABLES if v not in variables]
+    other_codes = [[code for code in VARIABLES[v][1] if v not in filters or code in filters[v]] for v in others]
+    values = []
+    for cell in itertools.product(*[dimension[v]['category']['index'] for v in variables]):
+        values.append(sum(count(dict(zip(variables + others, cell + rest)))
+                          for rest in itertools.product(*other_codes)))
+
+    table = OrderedDict([
+        ('version', '2.0'),
+        ('class', 'dataset'),
+        ('source', 'Usual Residents: England and Wales'),
+        ('updated', '2021-02-13T01:15:59Z'),
+        ('id', variables),
+        ('size', [len(dimension[v]['category']['index']) for v in variables]),
+        ('dimension', dimension),
+        ('extension', OrderedDict([
+            ('cantabular', OrderedDict([
+                ('dataset', OrderedDict([('name', DATASET), ('digest', DIGEST)])),
+                ('blocked', None)
+            ]))
+        ])),
+        ('value', values)
+    ])
+    return 200, json.dumps(table).encode()
+
+
+class StandInServer:
+    """
+    A local HTTP server answering query-json-stat requests with query_json_stat(), for use as a context manager:
+
+        with StandInServer(credentials) as server:
+            CantabularApiConnector(DATASET, ['SEX'], credentials, server.address)
+
+    Requests without the given (basic auth) credentials are refused. The paths of all requests made are kept in
+    `requests`, and every response may be delayed by `delay` seconds.
+    """
+
+    def __init__(self, credentials: (str, str), delay: float = 0) -> None:
+        self.delay = delay
+        self.authorization = 'Basic ' + base64.b64encode(':'.join(credentials).encode()).decode()
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_HEAD(self):
+                self.respond(200, b'')
+
+            def do_GET(self):
+                server.requests.append(self.path)
+                time.sleep(server.delay)
+                if self.headers.get('Authorization') != server.authorization:
+                    self.respond(401, json.dumps({"message": "unauthorized"}).encode())
+                else:
+                    self.respond(*query_json_stat(self.path))
+
+            def respond(self, status_code, body):
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.address = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self) -> 'StandInServer':
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
@@ -0,0 +1,72 @@
+# type: ignore
+
+import sys; sys.path.append('..')
+import unittest
+from unittest.mock import patch, MagicMock
+from api_connector import ApiConnector, POOL_SIZE
+import requests
+
+"""
+Prerequisites:
+ - None
+
+To run all tests:
+ - python test_api_connector.py
+
+To run specific tests:
+ - python -m unittest test_api_connector.TestApiConnector.[test]
+for instance,
+ - python -m unittest test_api_connector.TestApiConnector.test_warm_up
+ - python -m unittest test_api_connector.TestApiConnector.test_shared_session
+
+Note: include -b flag to silence stdout
+"""
+
+VALID_CLIENT = "https://localhost:5001"
+VALID_CREDENTIALS = ("user", "pass")
+
+
+class TestApiConnector(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        ApiConnector.close_warm_sessions()
+
+    def test_warm_up(self):
+        with patch.object(requests.Session, 'head', return_value=MagicMock()) as head:
+            self.assertTrue(ApiConnector.warm_up(VALID_CREDENTIALS, VALID_CLIENT, verify=False))
+            head.assert_called_once()
+        self.assertIn(VALID_CLIENT, ApiConnector.warm_sessions)
+
+        # A connector for the same client picks up the warm session, and leaves it open on exit
+        with ApiConnector(VALID_CREDENTIALS, VALID_CLIENT, None, record_requests=False) as con:
+            self.assertIs(con.session, ApiConnector.warm_sessions[VALID_CLIENT])
+        self.assertIn(VALID_CLIENT, ApiConnector.warm_sessions)
+
+        ApiConnector.close_warm_sessions()
+        self.assertEqual(ApiConnector.warm_sessions, {})
+
+    def test_warm_up_failure(self):
+        with patch.object(requests.Session, 'head', side_effect=requests.ConnectionError):
+            self.assertFalse(ApiConnector.warm_up(VALID_CREDENTIALS, VALID_CLIENT))
+        self.assertNotIn(VALID_CLIENT, ApiConnector.warm_sessions)
+
+        with ApiConnector(VALID_CREDENTIALS, VALID_CLIENT, None, record_requests=False) as con:
+            self.assertFalse(con.shared_session)
+
+    def test_shared_session(self):
+        # The worker threads sharing a session each have a connection of their own
+        with patch.object(requests.Session, 'head', return_value=MagicMock()):
+            ApiConnector.warm_up(VALID_CREDENTIALS, VALID_CLIENT)
+        with ApiConnector(VALID_CREDENTIALS, VALID_CLIENT, None, record_requests=False) as con:
+            adapter = con.session.get_adapter(VALID_CLIENT + "/api/v01/dataset")
+            self.assertIs(adapter, ApiConnector.warm_sessions[VALID_CLIENT].get_adapter(VALID_CLIENT))
+            self.assertEqual(adapter.poolmanager.connection_pool_kw["maxsize"], POOL_SIZE)
+        ApiConnector.close_warm_sessions()
+
+        with ApiConnector(VALID_CREDENTIALS, VALID_CLIENT, None, record_requests=False) as con:
+            adapter = con.session.get_adapter(VALID_CLIENT + "/api/v01/dataset")
+            self.assertEqual(adapter.poolmanager.connection_pool_kw["maxsize"], POOL_SIZE)
+
+
+if __name__ == '__main__':
+    unittest.main()
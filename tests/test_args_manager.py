@@ -158,5 +158,84 @@ class TestArgsManager(unittest.TestCase):
                 args_manager.decode_arguments()
 
 
+    def test_append_files(self):
+        args = [
+            'prog',
+            'data',
+            '-f', '../examples/cantabular_query_england_example.json',
+            '-a', '../examples/cantabular_query_wales_example.json, not-real.json',
+            '-i', 'DC1101EW',
+            '-t', 'Dataset Title'
+        ]
+        with patch.object(sys, 'argv', args):
+            with self.assertRaises(FileNotFoundError):
+                ArgsManager().decode_arguments()
+        with patch.object(sys, 'argv', args[:5] + ['../examples/cantabular_query_wales_example.json'] + args[6:]):
+            arguments = ArgsManager().decode_arguments()
+            self.assertEqual(arguments.append_files, ['../examples/cantabular_query_wales_example.json'])
+
+    def test_filters(self):
+        args = [
+            'prog',
+            'data',
+            '-q', 'OA, SEX, AGE',
+            '-s', 'OA=E00000001, E00000002; AGE=1,2, 3',
+            '-d', 'Usual-Residents',
+            '-i', 'DC1101EW',
+            '-t', 'Dataset Title'
+        ]
+        with patch.object(sys, 'argv', args):
+            arguments = ArgsManager().decode_arguments()
+            self.assertEqual(arguments.filters, {'OA': ['E00000001', 'E00000002'], 'AGE': ['1', '2', '3']})
+
+        for filters in ('OA', 'OA=', 'OA=E00000001,; SEX=1', 'SEX=1; SEX=2', 'COUNTRY=E92000001'):
+            with patch.object(sys, 'argv', args[:5] + [filters] + args[6:]):
+                with self.assertRaises(ValueError):
+                    ArgsManager().decode_arguments()
+
+        # When reading from a file, the filters are checked against the table once it is read
+        with patch.object(sys, 'argv', ['prog', 'data', '-f', 'test_config.json', '-s', 'COUNTRY=E92000001',
+                                        '-i', 'DC1101EW', '-t', 'Dataset Title']):
+            arguments = ArgsManager().decode_arguments()
+            self.assertEqual(arguments.filters, {'COUNTRY': ['E92000001']})
+
+    def test_marginals(self):
+        args = [
+            'prog',
+            'data',
+            '-q', 'OA, SEX',
+            '-d', 'Usual-Residents',
+            '-i', 'DC1101EW',
+            '-t', 'Dataset Title',
+            '-m', 'SEX; OA, AGE'
+        ]
+        with patch.object(sys, 'argv', args):
+            self.assertEqual(ArgsManager().decode_arguments().marginals, [['SEX'], ['OA', 'AGE']])
+        for marginals in ('SEX;', 'SEX, , AGE', 'SEX, SEX'):
+            with patch.object(sys, 'argv', args[:-1] + [marginals]):
+                with self.assertRaises(ValueError):
+                    ArgsManager().decode_arguments()
+
+    def test_geography_lookup(self):
+        args = [
+            'prog',
+            'data',
+            '-q', 'OA, SEX',
+            '-d', 'Usual-Residents',
+            '-i', 'DC1101EW',
+            '-t', 'Dataset Title',
+            '-g', '../examples/geography_lookup_example.csv'
+        ]
+        with patch.object(sys, 'argv', args):
+            self.assertEqual(ArgsManager().decode_arguments().geography_lookup,
+                             '../examples/geography_lookup_example.csv')
+        with patch.object(sys, 'argv', args[:-1] + ['test_config.json']):
+            with self.assertRaises(IOError):
+                ArgsManager().decode_arguments()
+        with patch.object(sys, 'argv', args[:-1] + ['missing.csv']):
+            with self.assertRaises(FileNotFoundError):
+                ArgsManager().decode_arguments()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -2,13 +2,17 @@
 
 import sys; sys.path.append('..')
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 import requests
+import numpy as np
 from pyjstat import pyjstat
 from cantabular_api_connector import CantabularApiConnector
+import cantabular_stand_in
 
 """
 Prerequisites:
- - The Cantabular API server must be operational
+ - The Cantabular API server must be operational (other than for TestCantabularApiConnectorOffline, which uses a
+   stand-in for the API)
  
 To run all tests:
  - python test_cantabular_api_connector.py
@@ -64,5 +68,100 @@ class TestCantabularApiConnector(unittest.TestCase):
                 con.query()
 
 
+class TestCantabularApiConnectorOffline(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = cantabular_stand_in.StandInServer(VALID_CREDENTIALS).__enter__()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.__exit__(None, None, None)
+
+    def query(self, variables, **kwargs):
+        self.server.requests.clear()
+        with CantabularApiConnector(cantabular_stand_in.DATASET, variables, VALID_CREDENTIALS, self.server.address,
+                                    **kwargs) as con:
+            return con.query(), len(self.server.requests)
+
+    def test_query(self):
+        table, calls = self.query(['SEX', 'AGE'])
+        self.assertIsInstance(table, pyjstat.Dataset)
+        self.assertEqual(table['size'], [2, 7])
+        self.assertEqual(len(table['value']), 14)
+        self.assertEqual(calls, 1)
+
+    def test_unauthorised(self):
+        with self.assertRaises(requests.HTTPError):
+            with CantabularApiConnector(cantabular_stand_in.DATASET, ['SEX'], INVALID_CREDENTIALS,
+                                        self.server.address) as con:
+                con.query()
+
+    def test_partitioned_query(self):
+        for variables in (['OA', 'SEX'], ['SEX', 'OA', 'AGE'], ['AGE', 'OA']):
+            table, _ = self.query(variables)
+            for partition_size, partitions in ((4, 7), (10, 3), (25, 1)):
+                partitioned, calls = self.query(variables, geography='OA', partition_size=partition_size,
+                                                max_workers=3)
+                # One request for the geography categories, then one per partition (if partitioned at all)
+                self.assertEqual(calls, 1 + (partitions if partitions > 1 else 1))
+                self.assertEqual(partitioned['id'], table['id'])
+                self.assertEqual(partitioned['size'], table['size'])
+                self.assertEqual(partitioned['dimension'], table['dimension'])
+                self.assertTrue(np.array_equal(partitioned['value'], table['value']))
+
+    def test_filtered_query(self):
+        table, _ = self.query(['OA', 'SEX', 'AGE'])
+        values = np.reshape(table['value'], table['size'])
+
+        filters = {'OA': ['E00000003', 'E00000007', 'E00000011'], 'AGE': ['2', '5']}
+        filtered, calls = self.query(['OA', 'SEX', 'AGE'], filters=filters)
+        self.assertEqual(calls, 1)
+        self.assertEqual(filtered['size'], [3, 2, 2])
+        self.assertEqual(filtered['dimension']['OA']['category']['index'], filters['OA'])
+        self.assertEqual(list(filtered['dimension']['SEX']['category']['index']), ['1', '2'])
+        self.assertTrue(np.array_equal(np.reshape(filtered['value'], filtered['size']),
+                                       values[np.ix_([2, 6, 10], [0, 1], [1, 4])]))
+
+        # A filtered query is partitioned over the selected geography categories only
+        partitioned, calls = self.query(['OA', 'SEX', 'AGE'], filters=filters, geography='OA', partition_size=2)
+        self.assertEqual(calls, 3)
+        self.assertEqual(partitioned['dimension'], filtered['dimension'])
+        self.assertTrue(np.array_equal(partitioned['value'], filtered['value']))
+
+    def test_invalid_filter(self):
+        with self.assertRaises(requests.HTTPError):
+            self.query(['SEX'], filters={'NOT': ['1']})
+
+    def test_concurrent_queries(self):
+        def query(variables):
+            with CantabularApiConnector(cantabular_stand_in.DATASET, variables, VALID_CREDENTIALS,
+                                        self.server.address) as con:
+                return con.query()
+
+        self.server.requests.clear()
+        self.server.delay = 0.5
+        try:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                futures = [executor.submit(query, variables)
+                           for variables in (['SEX', 'AGE'], ['SEX', 'AGE'], ['SEX', 'AGE'], ['AGE', 'SEX'])]
+                tables = [future.result() for future in futures]
+        finally:
+            self.server.delay = 0
+
+        # The three identical queries share a single request
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(tables[0]['id'], tables[1]['id'])
+        self.assertEqual(tables[3]['id'], ['AGE', 'SEX'])
+        self.assertEqual(CantabularApiConnector.in_flight, {})
+
+        # Each caller may change its metadata, but not the values, which are shared
+        tables[0]['dimension']['SEX']['label'] = 'Changed'
+        self.assertEqual(tables[1]['dimension']['SEX']['label'], 'Sex')
+        self.assertTrue(np.shares_memory(tables[0]['value'], tables[1]['value']))
+        with self.assertRaises(ValueError):
+            tables[0]['value'][0] = 0
+
+
 if __name__ == '__main__':
     unittest.main()
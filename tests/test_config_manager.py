@@ -154,6 +154,18 @@ class TestConfigManager(unittest.TestCase):
         self.assertIsInstance(config, Configuration)
         print(config.get_client("cantabular"))
 
+    def test_decode_options(self):
+        """Test that the optional features are off unless they are configured
+        """
+        self.config_manager.config = {"Nomis Catalog": {"path": "nomis_catalog.sqlite", "max_age": 3600},
+                                      "Metadata Cache": None, "Rate Limits": 5}
+        self.assertEqual(self.config_manager.decode_options("Nomis Catalog"),
+                         {"path": "nomis_catalog.sqlite", "max_age": 3600})
+        self.assertIsNone(self.config_manager.decode_options("Metadata Cache"))
+        self.assertIsNone(self.config_manager.decode_options("Cantabular Cache"))
+        with self.assertRaises(TypeError):
+            self.config_manager.decode_options("Rate Limits")
+
     def test_invalid_connection_info(self):
         inv_con_info_1 = ConnectionInfo("unresolvable-address.not.real", 5001)
         with self.assertRaises(ValueError):
@@ -2,10 +2,13 @@
 
 import sys; sys.path.append('..')
 import unittest
+import copy
 from dataset_transformations import DatasetTransformations
+from table_view import TableView
 from collections import OrderedDict
 from type_hints import *
 from pyjstat import pyjstat
+import numpy as np
 
 """
 Prerequisite:
@@ -100,6 +103,57 @@ class TestDatasetTransformations(unittest.TestCase):
         with self.assertRaises(TypeError):
             DatasetTransformations({"dimensions": True})
 
+    def test_validate_cube(self):
+        """Test that malformed values and categories are rejected before any transformations are made
+        """
+        DatasetTransformations.validate_cube(VALID_TABLE)
+        DatasetTransformations.validate_cube(pyjstat.Dataset(VALID_TABLE, value=np.array([1.0, np.nan])))
+        DatasetTransformations.validate_cube(pyjstat.Dataset(VALID_TABLE, value=[None, 2]))
+
+        for values in ([1], [1, 2, 3], [1, -2], [1, 2.5], np.array([1, np.inf])):
+            with self.assertRaises(ValueError):
+                DatasetTransformations(pyjstat.Dataset(VALID_TABLE, value=values))
+        for values in (["1", "2"], [True, False]):
+            with self.assertRaises(TypeError):
+                DatasetTransformations(pyjstat.Dataset(VALID_TABLE, value=values))
+        with self.assertRaises(ValueError):
+            DatasetTransformations(pyjstat.Dataset(VALID_TABLE, size=[3]))
+
+        duplicated = pyjstat.Dataset(VALID_TABLE, dimension=OrderedDict([
+            ('SEX', {'label': 'Sex', 'category': {'index': ['1', '1']}})
+        ]))
+        with self.assertRaises(ValueError):
+            DatasetTransformations(duplicated)
+        misplaced = pyjstat.Dataset(VALID_TABLE, dimension=OrderedDict([
+            ('SEX', {'label': 'Sex', 'category': {'index': {'1': 0, '2': 0}}})
+        ]))
+        with self.assertRaises(ValueError):
+            DatasetTransformations(misplaced)
+
+    def test_index_dimensions(self):
+        """Test that the dimensions of the table are indexed on initialisation, whether the categories are indexed by a
+        list or by a dict
+        """
+        self.assertEqual(self.valid_dataset_transformations.dimensions, (
+            DimensionIndex(name="SEX", label="Sex", codes=("1", "2"), labels=("Male", "Female"), size=2, stride=1),
+        ))
+        table = pyjstat.Dataset({
+            "id": ["AGE", "SEX"],
+            "dimension": {
+                "AGE": {"label": "Age", "category": {"index": {"2": 1, "1": 0, "3": 2}, "label": {"1": "Young"}}},
+                "SEX": VALID_TABLE["dimension"]["SEX"]
+            }
+        })
+        original = copy.deepcopy(table)
+        age, sex = DatasetTransformations.index_dimensions(table)
+        self.assertEqual(age.codes, ("1", "2", "3"))
+        self.assertEqual(age.labels, ("Young", "2", "3"))
+
+        # The codes are the strings of the table itself, and the table is left unchanged
+        self.assertIs(sex.codes[0], table["dimension"]["SEX"]["category"]["index"][0])
+        self.assertEqual(table, original)
+        self.assertEqual((age.size, age.stride, sex.stride), (3, 2, 1))
+
     def test_dataset_creation(self) -> None:
         """Test the dataset_creation() method of the DatasetTransformations class by asserting that expected exceptions
         are raised on invalid parameters, and that on valid calls all returned values and types are as expected. Also 
@@ -160,6 +214,39 @@ class TestDatasetTransformations(unittest.TestCase):
         obs = self.valid_dataset_transformations.observations(VALID_ID)
         self.assertIsInstance(obs, dict)
         self.assertEqual(obs["dataset"], VALID_ID)
+        # Without a geography, the dimensions keep their names
+        self.assertEqual(obs["dimensions"], ["SEX"])
+
+    def test_observations_geography(self) -> None:
+        """Test that the geography is made the first dimension of the observations, wherever it is in the table
+        """
+        table = pyjstat.Dataset({
+            "id": ["SEX", "OA"],
+            "size": [2, 3],
+            "dimension": {
+                "SEX": VALID_TABLE["dimension"]["SEX"],
+                "OA": {"label": "Output Area", "category": {"index": ["E1", "E2", "E3"]}}
+            },
+            "value": list(range(6))
+        })
+        transformations = DatasetTransformations(TableView(table, ["OA"]), True, table, "OA")
+        self.assertEqual(transformations.geography, "OA")
+        self.assertEqual(table["id"], ["SEX", "OA"])
+        obs = transformations.observations(VALID_ID)
+        self.assertEqual(obs["dimensions"], ["geography", "SEX"])
+        self.assertEqual(obs["codes"], [["E1", "E2", "E3"], ["1", "2"]])
+        self.assertEqual(obs["values"], [0, 3, 1, 4, 2, 5])
+        self.assertEqual([dimension["name"] for dimension in transformations.assign_dimensions("OA")],
+                         ["geography", "SEX"])
+
+    def test_serialise_values(self):
+        """Test the serialise_values() method, for values held in lists and numpy arrays
+        """
+        self.assertEqual(DatasetTransformations.serialise_values([1, 2]), [1, 2])
+        self.assertEqual(DatasetTransformations.serialise_values(np.array([1, 2])), [1, 2])
+        self.assertEqual(DatasetTransformations.serialise_values(np.array([1, np.nan])), [1, None])
+        self.assertEqual(DatasetTransformations.serialise_values(np.array([1.5, np.nan])), [1.5, None])
+        self.assertIsInstance(DatasetTransformations.serialise_values(np.array([1.0]))[0], int)
 
     def test_variable_metadata_request(self):
         """Test the variable_metadata_request() method
@@ -0,0 +1,141 @@
+# type: ignore
+
+import sys; sys.path.append('..')
+import unittest
+from unittest.mock import patch
+from definitions_cache import DefinitionsCache
+from nomis_metadata_api_connector import NomisMetadataApiConnector
+import tempfile
+import requests
+import uuid
+import json
+import os
+
+"""
+Prerequisites:
+ - None
+
+To run all tests:
+ - python test_definitions_cache.py
+
+To run specific tests:
+ - python -m unittest test_definitions_cache.TestDefinitionsCache.[test]
+for instance,
+ - python -m unittest test_definitions_cache.TestDefinitionsCache.test_definitions
+ - python -m unittest test_definitions_cache.TestDefinitionsCache.test_connector
+ - python -m unittest test_definitions_cache.TestDefinitionsCache.test_shared_file
+
+Note: include -b flag to silence stdout
+"""
+
+VALID_CLIENT = "https://localhost:5001/api/v1"
+VALID_CREDENTIALS = ("user", "pass")
+OBJECTS = [str(uuid.uuid4()) for _ in range(3)]
+DEFINITIONS = [{"id": str(uuid.uuid4()), "belongsTo": OBJECTS[0], "meta": [{"key": "a"}]},
+               {"id": str(uuid.uuid4()), "belongsTo": OBJECTS[1], "meta": [{"key": "b"}]}]
+
+
+def definitions_response(status_code, content=None):
+    res = requests.Response()
+    res.status_code = status_code
+    res._content = json.dumps(content).encode()
+    return res
+
+
+class TestDefinitionsCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache", "definitions.json")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_invalid_options(self):
+        with self.assertRaises(TypeError):
+            DefinitionsCache(1, 600, 100)
+        with self.assertRaises(TypeError):
+            DefinitionsCache(self.path, "600", 100)
+        with self.assertRaises(ValueError):
+            DefinitionsCache(self.path, 600, -1)
+
+    def test_definitions(self):
+        cache = DefinitionsCache(self.path, 600, 3)
+        self.assertIsNone(cache.get(VALID_CLIENT))
+        cache.put(VALID_CLIENT, DEFINITIONS)
+        self.assertEqual(cache.get(VALID_CLIENT), DEFINITIONS)
+
+        # Updates are merged in place
+        cache.update(VALID_CLIENT, [{"id": DEFINITIONS[1]["id"], "belongsTo": OBJECTS[2]},
+                                    {"id": "new", "belongsTo": OBJECTS[0]}])
+        self.assertEqual(cache.get(VALID_CLIENT), [DEFINITIONS[0], dict(DEFINITIONS[1], belongsTo=OBJECTS[2]),
+                                                   {"id": "new", "belongsTo": OBJECTS[0]}])
+        self.assertEqual(cache.get_for_objects(VALID_CLIENT, OBJECTS),
+                         {OBJECTS[0]: [DEFINITIONS[0], {"id": "new", "belongsTo": OBJECTS[0]}], OBJECTS[1]: [],
+                          OBJECTS[2]: [dict(DEFINITIONS[1], belongsTo=OBJECTS[2])]})
+
+        # The cache is kept between runs, until it is too old
+        self.assertEqual(len(DefinitionsCache(self.path, 600, 3).get(VALID_CLIENT)), 3)
+        self.assertIsNone(DefinitionsCache(self.path, 0, 3).get(VALID_CLIENT))
+
+        # The cache is bounded in size
+        cache.update(VALID_CLIENT, [{"id": "another"}])
+        self.assertIsNone(cache.get(VALID_CLIENT))
+        self.assertIsNone(cache.get_for_objects(VALID_CLIENT, OBJECTS))
+        cache.put(VALID_CLIENT, DEFINITIONS)
+        cache.put("https://localhost:5002", DEFINITIONS)
+        self.assertIsNone(cache.get(VALID_CLIENT))
+        self.assertEqual(cache.get("https://localhost:5002"), DEFINITIONS)
+        cache.put(VALID_CLIENT, DEFINITIONS * 2)
+        self.assertIsNone(cache.get(VALID_CLIENT))
+
+    def test_connector(self):
+        cache = DefinitionsCache(self.path, 600, 100)
+        with NomisMetadataApiConnector(VALID_CREDENTIALS, VALID_CLIENT, record_requests=False,
+                                       definitions=cache) as con:
+            with patch.object(con.session, 'get', return_value=definitions_response(200, DEFINITIONS)) as get:
+                self.assertEqual(con.get_all_metadata(), DEFINITIONS)
+                self.assertEqual(con.get_all_metadata(), DEFINITIONS)
+                get.assert_called_once()
+
+            # Metadata added or updated is reflected in the cache, without the full list being retrieved again
+            added = {"belongsTo": OBJECTS[2], "meta": [{"key": "c"}]}
+            with patch.object(con.session, 'post', return_value=definitions_response(200, [{"id": "added"}])):
+                con.add_new_metadata([added])
+            with patch.object(con.session, 'put', return_value=definitions_response(201)):
+                con.update_metadata_association(DEFINITIONS[0]["id"], {"id": DEFINITIONS[0]["id"],
+                                                                       "belongsTo": OBJECTS[0], "meta": []})
+            with patch.object(con.session, 'get') as get:
+                self.assertEqual(con.get_all_metadata(), [dict(DEFINITIONS[0], meta=[]), DEFINITIONS[1],
+                                                          dict(added, id="added")])
+                get.assert_not_called()
+
+            # Syncing uses the cached metadata of the objects only
+            with patch.object(con, 'get_all_metadata') as get_all, \
+                    patch.object(con, 'update_metadata_association', return_value=True) as put:
+                self.assertEqual(con.sync_metadata([{"belongsTo": OBJECTS[1], "meta": [{"key": "d"}]},
+                                                    added], True), [DEFINITIONS[1]["id"]])
+                get_all.assert_not_called()
+                put.assert_called_once()
+
+            with patch.object(con.session, 'get', return_value=definitions_response(200, DEFINITIONS)) as get:
+                self.assertEqual(con.get_all_metadata(use_cache=False), DEFINITIONS)
+                get.assert_called_once()
+
+    def test_shared_file(self):
+        # Two runs sharing the file keep each other's changes
+        first, second = DefinitionsCache(self.path, 600, 100), DefinitionsCache(self.path, 600, 100)
+        first.put(VALID_CLIENT, DEFINITIONS)
+        second.put("https://localhost:5002", DEFINITIONS[:1])
+        first.update(VALID_CLIENT, [{"id": "new", "belongsTo": OBJECTS[2]}])
+        second.update(VALID_CLIENT, [{"id": "other", "belongsTo": OBJECTS[2]}])
+
+        for cache in (first, second, DefinitionsCache(self.path, 600, 100)):
+            self.assertEqual(cache.get("https://localhost:5002"), DEFINITIONS[:1])
+            self.assertEqual(cache.get_for_objects(VALID_CLIENT, OBJECTS[2:]),
+                             {OBJECTS[2]: [{"id": "new", "belongsTo": OBJECTS[2]},
+                                           {"id": "other", "belongsTo": OBJECTS[2]}]})
+
+
+if __name__ == '__main__':
+    unittest.main()
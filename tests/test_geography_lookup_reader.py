@@ -0,0 +1,73 @@
+# type: ignore
+
+import sys; sys.path.append('..')
+import unittest
+from geography_lookup_reader import GeographyLookupReader
+import tempfile
+import os
+
+"""
+Prerequisites:
+ - None
+
+To run all tests:
+ - python test_geography_lookup_reader.py
+
+To run specific tests:
+ - python -m unittest test_geography_lookup_reader.TestGeographyLookupReader.[test]
+for instance,
+ - python -m unittest test_geography_lookup_reader.TestGeographyLookupReader.test_parents
+
+Note: include -b flag to silence stdout
+"""
+
+VALID_FILE = "../examples/geography_lookup_example.csv"
+
+
+class TestGeographyLookupReader(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def lookup(self, content: str) -> GeographyLookupReader:
+        path = os.path.join(self.directory.name, "lookup.csv")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return GeographyLookupReader(path)
+
+    def test_read(self):
+        lookup = GeographyLookupReader(VALID_FILE).read()
+        self.assertEqual(lookup.levels, ["OA", "LSOA", "MSOA"])
+        self.assertEqual(len(lookup.rows), 5)
+        self.assertEqual(lookup.coarser_levels("OA"), ["LSOA", "MSOA"])
+        self.assertEqual(lookup.coarser_levels("MSOA"), [])
+        with self.assertRaises(KeyError):
+            lookup.coarser_levels("LA")
+
+        with self.assertRaises(FileNotFoundError):
+            GeographyLookupReader("missing.csv").read()
+        with self.assertRaises(ValueError):
+            self.lookup("OA\nE00000001\n").read()
+        with self.assertRaises(ValueError):
+            self.lookup("OA,OA\nE00000001,E00000001\n").read()
+        with self.assertRaises(ValueError):
+            self.lookup("OA,LSOA\nE00000001\n").read()
+
+    def test_parents(self):
+        lookup = GeographyLookupReader(VALID_FILE).read()
+        self.assertEqual(lookup.parents("LSOA", "MSOA"), {"E01000001": "E02000001", "E01000002": "E02000001",
+                                                           "E01000003": "E02000002"})
+        self.assertEqual(list(lookup.parents("OA", "LSOA")), [f"E0000000{i}" for i in range(1, 6)])
+        with self.assertRaises(KeyError):
+            lookup.parents("OA", "LA")
+
+        # A category contained by more than one category of the coarser level
+        with self.assertRaises(ValueError):
+            self.lookup("OA,LSOA\nE00000001,E01000001\nE00000001,E01000002\n").read().parents("OA", "LSOA")
+
+
+if __name__ == '__main__':
+    unittest.main()
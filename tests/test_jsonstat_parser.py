@@ -0,0 +1,91 @@
+# type: ignore
+
+import sys; sys.path.append('..')
+import unittest
+import json
+import numpy as np
+from pyjstat import pyjstat
+from jsonstat_parser import JsonStatParser
+
+"""
+Prerequisites:
+ - None
+
+To run all tests:
+ - python test_jsonstat_parser.py
+
+To run specific tests:
+ - python -m unittest test_jsonstat_parser.TestJsonStatParser.[test]
+for instance,
+ - python -m unittest test_jsonstat_parser.TestJsonStatParser.test_chunked_parse
+ - python -m unittest test_jsonstat_parser.TestJsonStatParser.test_malformed_values
+
+Note: include -b flag to silence stdout
+"""
+
+VALID_FILE = 'test_dataset_file.json'
+
+
+def parse(data: bytes, chunk_size: int) -> pyjstat.Dataset:
+    parser = JsonStatParser()
+    for i in range(0, len(data), chunk_size):
+        parser.feed(data[i:i + chunk_size])
+    return parser.close()
+
+
+class TestJsonStatParser(unittest.TestCase):
+
+    def setUp(self) -> None:
+        with open(VALID_FILE, 'rb') as f:
+            self.data = f.read()
+
+    def test_chunked_parse(self):
+        expected = pyjstat.Dataset.read(self.data.decode('utf-8'))
+        for chunk_size in (1, 2, 7, 64, len(self.data)):
+            table = parse(self.data, chunk_size)
+            self.assertIsInstance(table, pyjstat.Dataset)
+            self.assertEqual(list(table.keys()), list(expected.keys()))
+            self.assertEqual(table["dimension"], expected["dimension"])
+            self.assertIsInstance(table["value"], np.ndarray)
+            self.assertEqual(table["value"].tolist(), expected["value"])
+
+    def test_nulls_and_floats(self):
+        table = parse(b'{"size": [3], "value": [1, null, 2.5], "extension": {}}', 4)
+        self.assertEqual(table["value"].dtype, np.float64)
+        self.assertTrue(np.isnan(table["value"][1]))
+        self.assertEqual(table["extension"], {})
+
+    def test_value_before_size(self):
+        table = parse(b'{"value": [1, 2, 3], "size": [3]}', 3)
+        self.assertEqual(table["value"].tolist(), [1, 2, 3])
+        self.assertEqual(table["size"], [3])
+
+    def test_strings_are_skipped(self):
+        table = parse(b'{"label": "value", "note": "\\"value\\": [9", "value": [1]}', 5)
+        self.assertEqual(table["note"], '"value": [9')
+        self.assertEqual(table["value"].tolist(), [1])
+
+    def test_sparse_values(self):
+        table = parse(b'{"size": [2], "value": {"0": 1, "1": 2}}', 5)
+        self.assertEqual(table["value"], {"0": 1, "1": 2})
+
+    def test_interned_categories(self):
+        data = (b'{"size": [2], "dimension": {"OA": {"label": "OA", "category": {"index": ["E1", "E2"], '
+                b'"label": {"E1": "E1", "E2": "Area 2"}}}}, "value": [1, 2]}')
+        for chunk_size in (4, len(data)):
+            category = parse(data, chunk_size)["dimension"]["OA"]["category"]
+            self.assertEqual(category, {"index": ["E1", "E2"], "label": {"E1": "E1", "E2": "Area 2"}})
+            # Each code is held once, as the code in the index, the key of its label and (here) its label
+            codes = {code: code for code in category["label"]}
+            self.assertIs(category["index"][0], codes["E1"])
+            self.assertIs(category["index"][1], codes["E2"])
+            self.assertIs(category["label"]["E1"], codes["E1"])
+
+    def test_malformed_values(self):
+        for data in (b'{"size": [2], "value": [1, x]}', b'{"size": [2], "value": [1, 2x]}', b'{"size": [2], "value": [1'):
+            with self.assertRaises(ValueError):
+                parse(data, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
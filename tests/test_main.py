@@ -4,7 +4,7 @@ import sys; sys.path.append('..')
 from file_reader import FileReader
 import logging
 import unittest
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
 import main
 
 
@@ -60,6 +60,205 @@ class TestMain(unittest.TestCase):
     def test_collect_configuration(self):
         self.assertIsInstance(main.collect_configuration(self.arguments), main.Configuration)
 
+    def test_warm_up_connections(self):
+        with patch.object(main.ApiConnector, 'warm_up', return_value=True) as warm_up:
+            main.warm_up_connections(self.configuration)
+            self.assertEqual(warm_up.call_count, 3)
+
+    def test_resolve_variable_uuids(self):
+        connector = MagicMock()
+        connector.get_variable.side_effect = lambda name=None, return_bool=False: (
+            [{"name": "SEX", "uuid": "uuid-sex"}, {"name": "AGE", "uuid": "uuid-age"}] if name is None
+            else {"name": name, "uuid": f"uuid-{name.lower()}"} if name == "COUNTRY" else False
+        )
+        uuids = main.resolve_variable_uuids(connector, ["SEX", "COUNTRY", "AGE", "MISSING", "COUNTRY"])
+        self.assertEqual(uuids, {"SEX": "uuid-sex", "AGE": "uuid-age", "COUNTRY": "uuid-country"})
+        # One request for all of the variables, then one for each of the variables missing from it
+        self.assertEqual(connector.get_variable.call_count, 3)
+
+    def test_handle_variables(self):
+        with main.DatasetFileReader("test_dataset_file.json") as dfr:
+            transformations = main.DatasetTransformations(dfr.query())
+
+        # A new variable is created, with all of its categories
+        connector = MagicMock()
+        connector.get_variable.return_value = False
+        main.handle_variables(connector, transformations, ["SEX"])
+        connector.create_variable.assert_called_once()
+        connector.create_variable_type.assert_called_once()
+        self.assertEqual([request["code"] for request in connector.create_variable_category.call_args[0][1]],
+                         ["1", "2"])
+
+        # An existing variable only has its missing categories created and its changed categories updated
+        connector = MagicMock()
+        connector.get_variable.return_value = {"name": "SEX"}
+        connector.get_variable_categories.return_value = [{"code": "2", "title": "Females"}, {"code": "3"}]
+        main.handle_variables(connector, transformations, ["SEX"])
+        connector.create_variable.assert_not_called()
+        self.assertEqual([request["code"] for request in connector.create_variable_category.call_args[0][1]], ["1"])
+        connector.update_variable_category.assert_called_once_with("SEX", "2", {"title": "Female"})
+
+        connector.get_variable_categories.return_value = [{"code": "1", "title": "Male"},
+                                                          {"code": "2", "title": "Female"}]
+        connector.reset_mock()
+        main.handle_variables(connector, transformations, ["SEX"])
+        connector.create_variable_category.assert_not_called()
+        connector.update_variable_category.assert_not_called()
+
+        # A category with no label is titled by its code
+        with main.DatasetFileReader("test_dataset_file.json") as dfr:
+            table = dfr.query()
+        del table["dimension"]["SEX"]["category"]["label"]["2"]
+        transformations = main.DatasetTransformations(table)
+        connector = MagicMock()
+        connector.get_variable.return_value = False
+        main.handle_variables(connector, transformations, ["SEX"])
+        self.assertEqual([(request["code"], request["title"])
+                          for request in connector.create_variable_category.call_args[0][1]],
+                         [("1", "Male"), ("2", "2")])
+
+        # Variables that share category codes and titles each have their own requests
+        sex = {"label": "Sex", "category": {"index": ["1", "2"], "label": {"1": "Male", "2": "Female"}}}
+        table = main.pyjstat.Dataset({"id": ["SEX", "SEX_2"], "size": [2, 2], "dimension": {"SEX": sex, "SEX_2": sex},
+                                      "value": [1, 2, 3, 4]})
+        transformations = main.DatasetTransformations(table)
+        connector = MagicMock()
+        connector.get_variable.return_value = False
+        with patch.object(main, 'get_type_ids', return_value=["type-1", "type-2"]):
+            main.handle_variables(connector, transformations, ["SEX", "SEX_2"])
+        self.assertEqual([[request["typeId"] for request in call[0][1]]
+                          for call in connector.create_variable_category.call_args_list],
+                         [["type-1", "type-1"], ["type-2", "type-2"]])
+
+    def test_marginal_datasets(self):
+        self.arguments.query_variables = ["SEX", "AGE"]
+        self.arguments.marginals = [["SEX"], ["OA", "SEX"]]
+        with patch.object(main, 'args', self.arguments, create=True):
+            self.assertEqual(main.query_plan(), ["SEX", "AGE", "OA"])
+
+            table = main.pyjstat.Dataset({
+                "id": ["SEX", "AGE", "OA"],
+                "dimension": {
+                    "SEX": {"label": "Sex", "category": {"index": ["1", "2"]}},
+                    "AGE": {"label": "Age", "category": {"index": ["1", "2", "3"]}},
+                    "OA": {"label": "OA", "category": {"index": ["E1", "E2"]}}
+                },
+                "value": list(range(12))
+            })
+            datasets = list(main.marginal_datasets((table, ["SEX", "AGE", "OA"])))
+
+        self.assertEqual([(dataset_id, title, variables) for dataset_id, title, (_, variables) in datasets], [
+            ("DC1101EW", "Dataset Title", ["SEX", "AGE"]),
+            ("DC1101EW_SEX", "Dataset Title (SEX)", ["SEX"]),
+            ("DC1101EW_OA_SEX", "Dataset Title (OA, SEX)", ["OA", "SEX"])
+        ])
+        self.assertEqual(list(datasets[0][2][0]["value"]), [1, 5, 9, 13, 17, 21])
+        self.assertEqual(list(datasets[1][2][0]["value"]), [15, 51])
+        self.assertEqual(list(datasets[2][2][0]["value"]), [6, 24, 9, 27])
+
+    def test_append_files(self):
+        self.arguments.filename = "../examples/cantabular_query_england_example.json"
+        self.arguments.append_files = ["../examples/cantabular_query_wales_example.json"]
+        self.arguments.filters = {"SEX": ["2"]}
+        with patch.object(main, 'args', self.arguments, create=True), \
+                patch.object(main, 'config', self.configuration, create=True):
+            table, variables = main.retrieve_data()
+
+        self.assertEqual(variables, ["OA", "SEX"])
+        self.assertEqual(table["dimension"]["OA"]["category"]["index"],
+                         ["E00000001", "E00000002", "W00000001", "W00000002"])
+        self.assertEqual(list(table["value"]), [152, 140, 119, 141])
+
+    def test_recode_data(self):
+        table = main.pyjstat.Dataset({
+            "id": ["SEX", "AGE"],
+            "size": [2, 18],
+            "dimension": {
+                "SEX": {"label": "Sex", "category": {"index": ["1", "2"]}},
+                "AGE": {"label": "Age", "category": {"index": [str(age) for age in range(1, 19)]}}
+            },
+            "value": list(range(36))
+        })
+        self.arguments.recode = "../examples/recode_example.json"
+        with patch.object(main, 'args', self.arguments, create=True):
+            recodes = main.read_recodes((table, ["SEX", "AGE"]))
+            recoded, variables = main.recode_data((table, ["SEX", "AGE"]), recodes)
+            with self.assertRaises(KeyError):
+                main.read_recodes((main.TableOperations.marginalise(table, ["SEX"]), ["SEX"]))
+
+        # The recoded dimension is a new variable, so the categories of AGE in Nomis are left as they are
+        self.assertEqual(variables, ["SEX", "AGE_3A"])
+        self.assertEqual(recoded["id"], ["SEX", "AGE_3A"])
+        self.assertNotEqual(recoded["id"][1], table["id"][1])
+        self.assertEqual(list(recoded["value"]), [10, 35, 108, 100, 125, 252])
+
+        # Datasets without a recoded dimension are left as they are
+        sex = (main.TableOperations.marginalise(table, ["SEX"]), ["SEX"])
+        self.assertIs(main.recode_data(sex, recodes)[0], sex[0])
+
+    def test_geography_levels(self):
+        table = main.pyjstat.Dataset({
+            "id": ["SEX", "OA"],
+            "size": [2, 5],
+            "dimension": {
+                "SEX": {"label": "Sex", "category": {"index": ["1", "2"]}},
+                "OA": {"label": "OA", "category": {"index": [f"E0000000{i}" for i in range(1, 6)]}}
+            },
+            "value": list(range(10))
+        })
+        self.arguments.geography_lookup = "../examples/geography_lookup_example.csv"
+        with patch.object(main, 'args', self.arguments, create=True), \
+                patch.object(main, 'config', self.configuration, create=True):
+            levels = list(main.geography_levels("DC1101EW", "Dataset Title", (table, ["SEX", "OA"])))
+
+        self.assertEqual([(dataset_id, title) for dataset_id, title, _ in levels], [
+            ("DC1101EW", "Dataset Title"), ("DC1101EW_LSOA", "Dataset Title (LSOA)"),
+            ("DC1101EW_MSOA", "Dataset Title (MSOA)")
+        ])
+        self.assertIs(levels[0][2][0], table)
+        lsoa, variables = levels[1][2]
+        self.assertEqual(variables, ["SEX", "LSOA"])
+        self.assertEqual(lsoa["dimension"]["LSOA"]["category"]["index"], ["E01000001", "E01000002", "E01000003"])
+        self.assertEqual(list(lsoa["value"]), [1, 2, 7, 11, 7, 17])
+        msoa, variables = levels[2][2]
+        self.assertEqual(variables, ["SEX", "MSOA"])
+        self.assertEqual(list(msoa["value"]), [3, 7, 18, 17])
+
+        # A rolled-up level is published with its level as the geography of the dataset
+        connector = MagicMock()
+        connector.get_dataset.return_value = False
+        connector.get_variable.return_value = False
+        with patch.object(main, 'args', self.arguments, create=True), \
+                patch.object(main, 'config', self.configuration, create=True):
+            self.assertFalse(main.dataset_transformations(connector, levels[2][2], "DC1101EW_MSOA", "MSOA"))
+        dimensions = connector.assign_dimensions_to_dataset.call_args[0][1]
+        self.assertEqual([dimension["name"] for dimension in dimensions], ["geography", "SEX"])
+        observations = connector.overwrite_dataset_observations.call_args[0][1]
+        self.assertEqual(observations["dimensions"], ["geography", "SEX"])
+        self.assertEqual(observations["codes"], [["E02000001", "E02000002"], ["1", "2"]])
+        self.assertEqual(observations["values"], [3, 18, 7, 17])
+
+        # Every coarser level must be a geography variable in the configuration, before any dataset is generated
+        self.configuration.var["geography"] = ["OA", "LSOA"]
+        with patch.object(main, 'args', self.arguments, create=True), \
+                patch.object(main, 'config', self.configuration, create=True):
+            with self.assertRaises(KeyError):
+                next(main.geography_levels("DC1101EW", "Dataset Title", (table, ["SEX", "OA"])))
+
+    def test_set_rate_limits(self):
+        # No rate limits are set unless they are configured
+        with patch.dict(main.ApiConnector.rate_limiters, clear=True):
+            main.set_rate_limits(self.configuration)
+            self.assertEqual(len(main.ApiConnector.rate_limiters), 0)
+
+        limits = {"directory": None, "cantabular": {"rate": 5, "burst": 10}, "nomis": None, "nomis_metadata": None}
+        with patch.dict(main.ApiConnector.rate_limiters, clear=True), \
+                patch.dict(self.configuration.options, rate_limits=limits):
+            main.set_rate_limits(self.configuration)
+            limiter = main.ApiConnector.rate_limiters[self.configuration.get_client('cantabular')]
+            self.assertIsInstance(limiter, main.RateLimiter)
+            self.assertEqual(len(main.ApiConnector.rate_limiters), 1)
+
 
 
 
@@ -3,11 +3,15 @@
 import sys; sys.path.append('..')
 import unittest.mock
 import uuid
+import json
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+import nomis_metadata_api_connector
 from nomis_metadata_api_connector import NomisMetadataApiConnector
 
 """
 Prerequisites:
- - The metadata API must be running locally 
+ - The metadata API must be running locally (other than for TestMetadataConnectorBatches)
 
 Test all:
  - python test_metadata_connector.py
@@ -19,6 +23,9 @@ for instance,
  - python -m unittest test_metadata_connector.TestMetadataConnector.test_get_metadata_by_id
  - python -m unittest test_metadata_connector.TestMetadataConnector.test_add_new_metadata
  - python -m unittest test_metadata_connector.TestMetadataConnector.test_update_metadata_association
+ - python -m unittest test_metadata_connector.TestMetadataConnectorBatches.test_partial_failure
+ - python -m unittest test_metadata_connector.TestMetadataConnectorBatches.test_sync
+ - python -m unittest test_metadata_connector.TestMetadataConnectorBatches.test_get_metadata_for_objects
 
 """
 
@@ -94,5 +101,149 @@ class TestMetadataConnector(unittest.TestCase):
         self.assertEqual(ret_md["description"], "test")
 
 
+def definitions_response(status_code, content):
+    res = requests.Response()
+    res.status_code = status_code
+    res._content = json.dumps(content).encode()
+    return res
+
+
+class TestMetadataConnectorBatches(unittest.TestCase):
+    def setUp(self) -> None:
+        self.connector = NomisMetadataApiConnector(VALID_CREDENTIALS, VALID_ADDRESS, VALID_PORT)
+        self.metadata = [dict(VALID_METADATA[0], belongsTo=str(uuid.uuid4()), description=f"test {i}")
+                         for i in range(23)]
+        self.posted = []
+
+    def post(self, url, data=None, headers=None, verify=None):
+        batch = json.loads(data)
+        self.posted.append(len(batch))
+        if any(record["description"] in ("test 5", "test 17") for record in batch):
+            return definitions_response(400, {"message": "invalid"})
+        return definitions_response(200, [{"id": f"id-{record['description']}"} for record in batch])
+
+    def test_batches(self):
+        with unittest.mock.patch.object(nomis_metadata_api_connector, 'BATCH_SIZE', 5):
+            self.assertEqual([len(batch) for batch in self.connector.batch_metadata(self.metadata)], [5] * 4 + [3])
+        with unittest.mock.patch.object(nomis_metadata_api_connector, 'BATCH_BYTES', 1000):
+            batches = self.connector.batch_metadata(self.metadata)
+            self.assertGreater(len(batches), 1)
+            self.assertTrue(all(len(json.dumps([self.metadata[i] for i in batch])) <= 1000 for batch in batches))
+            self.assertEqual(sum(batches, []), list(range(23)))
+
+    def test_partial_failure(self):
+        with unittest.mock.patch.object(nomis_metadata_api_connector, 'BATCH_SIZE', 8), \
+                unittest.mock.patch.object(self.connector.session, 'post', side_effect=self.post):
+            with self.assertRaises(requests.HTTPError) as e:
+                self.connector.add_new_metadata(self.metadata, True)
+        self.assertIn("Unable to add 2 of 23", str(e.exception))
+        self.assertIn("Record 5", str(e.exception))
+        self.assertIn("Record 17", str(e.exception))
+        # Three batches, and two rejected batches of 8 bisected down to single records: 3 + 2 * (2 + 2 + 2)
+        self.assertEqual(len(self.posted), 15)
+
+        metadata = [record for record in self.metadata if record["description"] not in ("test 5", "test 17")]
+        with unittest.mock.patch.object(nomis_metadata_api_connector, 'BATCH_SIZE', 4), \
+                unittest.mock.patch.object(self.connector.session, 'post', side_effect=self.post):
+            ids = self.connector.add_new_metadata(metadata, True)
+        self.assertEqual(ids, [f"id-{record['description']}" for record in metadata])
+
+    def test_retry(self):
+        # Only requests that were never sent, or were rate limited, are retried
+        refused = requests.ConnectionError(MaxRetryError(None, "/Definitions", NewConnectionError(None, "refused")))
+        responses = [refused, requests.exceptions.ConnectTimeout(), definitions_response(429, {}),
+                     definitions_response(200, [{"id": "id-0"}])]
+        with unittest.mock.patch.object(nomis_metadata_api_connector, 'RETRY_DELAY', 0), \
+                unittest.mock.patch.object(self.connector.session, 'post', side_effect=responses) as post:
+            self.assertEqual(self.connector.add_new_metadata(self.metadata[:1], True), ["id-0"])
+            self.assertEqual(post.call_count, 4)
+
+        responses = [definitions_response(429, {})] * (nomis_metadata_api_connector.RETRIES + 1)
+        with unittest.mock.patch.object(nomis_metadata_api_connector, 'RETRY_DELAY', 0), \
+                unittest.mock.patch.object(self.connector.session, 'post', side_effect=responses):
+            with self.assertRaises(requests.HTTPError):
+                self.connector.add_new_metadata(self.metadata[:1], True)
+
+        # A server error, or a connection failure once the request may have been sent, could follow the metadata being
+        # added, so is not retried
+        for response, error in ((definitions_response(503, {}), requests.HTTPError),
+                                (requests.ConnectionError("Connection reset by peer"), requests.ConnectionError)):
+            with unittest.mock.patch.object(nomis_metadata_api_connector, 'RETRY_DELAY', 0), \
+                    unittest.mock.patch.object(self.connector.session, 'post', side_effect=[response]) as post:
+                with self.assertRaises(error):
+                    self.connector.add_new_metadata(self.metadata[:1], True)
+                post.assert_called_once()
+
+    def test_failed_batch(self):
+        def post(url, data=None, headers=None, verify=None):
+            batch = json.loads(data)
+            if any(record["description"] == "test 9" for record in batch):
+                return definitions_response(503, {})
+            return definitions_response(200, [{"id": f"id-{record['description']}"} for record in batch])
+
+        # The ids of the records added before a batch failed are logged, so that they are not added again
+        with unittest.mock.patch.object(nomis_metadata_api_connector, 'BATCH_SIZE', 8), \
+                unittest.mock.patch.object(self.connector.session, 'post', side_effect=post):
+            with self.assertLogs('DTS-Logger', 'ERROR') as logs, self.assertRaises(requests.HTTPError):
+                self.connector.add_new_metadata(self.metadata, True)
+        self.assertIn("15 of 23 new metadata records were added", logs.output[0])
+        self.assertIn("id-test 0 (record 0,", logs.output[0])
+        self.assertIn("id-test 22 (record 22,", logs.output[0])
+        self.assertNotIn("id-test 9 ", logs.output[0])
+
+    def test_sync(self):
+        existing = [
+            {"id": "def-0", "belongsTo": self.metadata[0]["belongsTo"], "meta": self.metadata[0]["meta"]},
+            {"id": "def-1", "belongsTo": self.metadata[1]["belongsTo"], "meta": []},
+            {"id": "def-other", "belongsTo": str(uuid.uuid4()), "meta": []}
+        ]
+        new, changed, unchanged = self.connector.diff_metadata(self.metadata[:4],
+                                                               self.connector.group_by_object(existing))
+        self.assertEqual(new, self.metadata[2:4])
+        self.assertEqual(changed, [{"id": "def-1", "belongsTo": self.metadata[1]["belongsTo"],
+                                    "meta": self.metadata[1]["meta"]}])
+        self.assertEqual(unchanged, self.metadata[:1])
+
+        with unittest.mock.patch.object(self.connector, 'get_all_metadata', return_value=existing), \
+                unittest.mock.patch.object(self.connector.session, 'post', side_effect=self.post), \
+                unittest.mock.patch.object(self.connector, 'update_metadata_association', return_value=True) as put:
+            ids = self.connector.sync_metadata(self.metadata[:4], True)
+        self.assertEqual(ids, ["id-test 2", "id-test 3", "def-1"])
+        self.assertEqual(self.posted, [2])
+        put.assert_called_once_with("def-1", changed[0])
+
+    def test_get_metadata_for_objects(self):
+        ids = [record["belongsTo"] for record in self.metadata[:4]]
+
+        def get(url, verify=None):
+            id = url.rsplit("/", 1)[-1]
+            if id == ids[1]:
+                raise requests.ConnectionError("refused")
+            return definitions_response(200, [] if id == ids[2] else [{"id": f"def-{id}", "belongsTo": id}])
+
+        NomisMetadataApiConnector.object_metadata.clear()
+        with unittest.mock.patch.object(self.connector.session, 'get', side_effect=get) as session_get:
+            lookups = self.connector.get_metadata_for_objects(ids + ids[:1])
+            self.assertEqual(list(lookups), ids)
+            self.assertEqual(lookups[ids[0]].metadata, [{"id": f"def-{ids[0]}", "belongsTo": ids[0]}])
+            self.assertIsNone(lookups[ids[0]].error)
+            self.assertIsNone(lookups[ids[1]].metadata)
+            self.assertIn("refused", lookups[ids[1]].error)
+            self.assertEqual(lookups[ids[2]].metadata, [])
+            self.assertTrue(all(lookup.seconds >= 0 and not lookup.cached for lookup in lookups.values()))
+            self.assertEqual(session_get.call_count, 4)
+
+            # Successful lookups are reused, until the metadata of the object changes
+            lookups = self.connector.get_metadata_for_objects(ids)
+            self.assertTrue(lookups[ids[0]].cached)
+            self.assertFalse(lookups[ids[1]].cached)
+            self.assertEqual(session_get.call_count, 5)
+
+            with unittest.mock.patch.object(self.connector.session, 'post', side_effect=self.post):
+                self.connector.add_new_metadata(self.metadata[:1])
+            self.assertFalse(self.connector.get_metadata_for_objects(ids[:1])[ids[0]].cached)
+        NomisMetadataApiConnector.object_metadata.clear()
+
+
 if __name__ == "__main__":
     unittest.main()
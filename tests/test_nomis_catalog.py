@@ -0,0 +1,125 @@
+# type: ignore
+
+import sys; sys.path.append('..')
+import unittest
+from unittest.mock import patch
+from nomis_catalog import NomisCatalog, MISSING
+from nomis_api_connector import NomisApiConnector
+import tempfile
+import requests
+import json
+import os
+
+"""
+Prerequisites:
+ - None
+
+To run all tests:
+ - python test_nomis_catalog.py
+
+To run specific tests:
+ - python -m unittest test_nomis_catalog.TestNomisCatalog.[test]
+for instance,
+ - python -m unittest test_nomis_catalog.TestNomisCatalog.test_entries
+ - python -m unittest test_nomis_catalog.TestNomisCatalog.test_connector
+
+Note: include -b flag to silence stdout
+"""
+
+VALID_CLIENT = "https://localhost:5001"
+VALID_CREDENTIALS = ("user", "pass")
+DATASET = {"id": "DC1102EW", "title": "Test", "contactId": "string", "isAdditive": True, "isFlagged": True,
+           "derivedFrom": "string", "restrictedAccess": True, "minimumRound": 0, "online": True}
+VARIABLES = [{"name": "SEX", "uuid": "uuid-sex"}, {"name": "AGE", "uuid": "uuid-age"}]
+
+
+def nomis_response(status_code, content=None):
+    res = requests.Response()
+    res.status_code = status_code
+    res._content = json.dumps(content).encode()
+    return res
+
+
+def nomis_get(url, verify=None):
+    path = url[len(VALID_CLIENT):]
+    if path == "/Datasets/DC1101EW":
+        return nomis_response(200, {"id": "DC1101EW", "title": "Test"})
+    elif path == "/Variables":
+        return nomis_response(200, VARIABLES)
+    elif path == "/Variables/SEX/categories":
+        return nomis_response(200, [{"code": "1"}, {"code": "2"}])
+    return nomis_response(404, {})
+
+
+class TestNomisCatalog(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "catalog", "nomis.sqlite")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_invalid_options(self):
+        with self.assertRaises(TypeError):
+            NomisCatalog(1, 3600)
+        with self.assertRaises(TypeError):
+            NomisCatalog(self.path, "3600")
+        with self.assertRaises(ValueError):
+            NomisCatalog(self.path, -1)
+
+    def test_entries(self):
+        catalog = NomisCatalog(self.path, 3600)
+        self.assertIs(catalog.get(VALID_CLIENT, "dataset", "DC1101EW"), MISSING)
+        catalog.put(VALID_CLIENT, "dataset", "DC1101EW", {"id": "DC1101EW"})
+        self.assertEqual(catalog.get(VALID_CLIENT, "dataset", "DC1101EW"), {"id": "DC1101EW"})
+        self.assertIs(catalog.get("https://localhost:5002", "dataset", "DC1101EW"), MISSING)
+
+        # The catalog is kept between runs, until the entries are too old
+        self.assertEqual(NomisCatalog(self.path, 3600).get(VALID_CLIENT, "dataset", "DC1101EW"), {"id": "DC1101EW"})
+        self.assertIs(NomisCatalog(self.path, 0).get(VALID_CLIENT, "dataset", "DC1101EW"), MISSING)
+        self.assertIs(NomisCatalog(self.path, 3600, refresh=True).get(VALID_CLIENT, "dataset", "DC1101EW"), MISSING)
+
+        catalog.discard(VALID_CLIENT, "dataset", "DC1101EW")
+        self.assertIs(catalog.get(VALID_CLIENT, "dataset", "DC1101EW"), MISSING)
+
+    def test_connector(self):
+        catalog = NomisCatalog(self.path, 3600)
+        with NomisApiConnector(VALID_CREDENTIALS, VALID_CLIENT, record_requests=False, catalog=catalog) as con:
+            with patch.object(con.session, 'get', side_effect=nomis_get) as get:
+                for _ in range(2):
+                    self.assertTrue(con.get_dataset("DC1101EW", return_bool=True))
+                    self.assertFalse(con.get_dataset("DC1102EW", return_bool=True))
+                    self.assertEqual(con.get_variable(), VARIABLES)
+                    self.assertEqual(con.get_variable("SEX", return_bool=True), VARIABLES[0])
+                    self.assertEqual(con.get_variable_categories("SEX"), [{"code": "1"}, {"code": "2"}])
+                    with self.assertRaises(requests.HTTPError):
+                        con.get_dataset_dimensions("DC1101EW")
+                # Each check of something that exists is only made against the API once (SEX is catalogued by the
+                # request for all variables), while absences are checked each time
+                self.assertEqual(get.call_count, 7)
+
+            # Creating a variable discards its entry (and the list of all variables), as does creating a dataset; they
+            # are recorded in the form the API returns once next retrieved
+            created = dict(DATASET, online=False)
+            with patch.object(con.session, 'put', return_value=nomis_response(200)):
+                con.create_variable("SEX", {"name": "SEX"})
+                con.create_dataset("DC1102EW", DATASET)
+            with patch.object(con.session, 'get', side_effect=lambda url, verify=None: nomis_response(200, created)
+                              if url.endswith("/Datasets/DC1102EW") else nomis_get(url, verify)) as get:
+                for _ in range(2):
+                    self.assertEqual(con.get_dataset("DC1102EW"), created)
+                con.get_variable("SEX", return_bool=True)
+                con.get_variable()
+                self.assertEqual(get.call_count, 3)
+
+        # A refresh checks against the API again
+        with NomisApiConnector(VALID_CREDENTIALS, VALID_CLIENT, record_requests=False,
+                               catalog=NomisCatalog(self.path, 3600, refresh=True)) as con:
+            with patch.object(con.session, 'get', side_effect=nomis_get) as get:
+                self.assertFalse(con.get_dataset("DC1102EW", return_bool=True))
+                get.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# type: ignore
+
+import sys; sys.path.append('..')
+import unittest
+from ons_metadata_reader import OnsMetadataReader
+from file_reader import FileReader
+import tempfile
+import json
+import os
+
+"""
+Prerequisites:
+ - None
+
+To run all tests:
+ - python test_ons_metadata_reader.py
+
+To run specific tests:
+ - python -m unittest test_ons_metadata_reader.TestOnsMetadataReader.[test]
+for instance,
+ - python -m unittest test_ons_metadata_reader.TestOnsMetadataReader.test_example_file
+ - python -m unittest test_ons_metadata_reader.TestOnsMetadataReader.test_small_chunks
+
+Note: include -b flag to silence stdout
+"""
+
+EXAMPLE_FILE = "../examples/ons_metadata_example.json"
+
+DATA_MODEL = {
+    "dataModel": {
+        "id": "model",
+        "label": "A \"model\" with [brackets] and {braces}",
+        "metadata": [{"id": "not-an-item", "dataTypes": [{"id": "also-not-an-item"}]}],
+        "dataTypes": [
+            {"id": "type-1", "label": "Type } 1", "description": "Has \\ \"escapes\" ] and £ ünïcödé",
+             "enumerationValues": [{"id": "value-1", "key": "1"}]},
+            {"id": "type-2", "label": "Type 2", "description": None, "count": 12.5e3}
+        ],
+        "childDataClasses": [
+            {"id": "class-1", "label": "Class 1", "childDataElements": [
+                {"id": "element-1", "label": "Element 1", "description": "First"},
+                {"id": "element-2", "label": "Element 2", "description": "Second"}
+            ]},
+            {"id": "class-2", "label": "Class 2", "childDataElements": []},
+            {"id": "class-3", "childDataElements": [{"id": "element-3", "label": "[", "description": "{"}]}
+        ]
+    }
+}
+
+
+class TestOnsMetadataReader(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.directory.name, "data_model.json")
+        with open(self.file, 'w', encoding='utf-8') as f:
+            json.dump(DATA_MODEL, f, ensure_ascii=False)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def expected(self, data_model):
+        return data_model["dataModel"]["dataTypes"] + [
+            element for data_class in data_model["dataModel"]["childDataClasses"]
+            for element in data_class["childDataElements"]
+        ]
+
+    def test_example_file(self):
+        with FileReader(EXAMPLE_FILE) as fr:
+            expected = self.expected(fr.load_json())
+        self.assertEqual(list(OnsMetadataReader(EXAMPLE_FILE).items()), expected)
+
+    def test_small_chunks(self):
+        expected = self.expected(DATA_MODEL)
+        for chunk_size in (1, 2, 5, 13, 1000):
+            self.assertEqual(list(OnsMetadataReader(self.file, chunk_size).items()), expected)
+
+    def test_lazy(self):
+        items = OnsMetadataReader(self.file, 16).items()
+        self.assertEqual(next(items)["id"], "type-1")
+
+    def test_incomplete_file(self):
+        with open(self.file, 'r+', encoding='utf-8') as f:
+            f.truncate(200)
+        with self.assertRaises(ValueError):
+            list(OnsMetadataReader(self.file).items())
+
+
+if __name__ == '__main__':
+    unittest.main()
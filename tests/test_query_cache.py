@@ -0,0 +1,192 @@
+# type: ignore
+
+import sys; sys.path.append('..')
+import unittest
+import tempfile
+import shutil
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+from query_cache import QueryCache
+from cantabular_api_connector import CantabularApiConnector
+from pyjstat import pyjstat
+import json
+
+"""
+Prerequisites:
+ - None
+
+To run all tests:
+ - python test_query_cache.py
+
+To run specific tests:
+ - python -m unittest test_query_cache.TestQueryCache.[test]
+for instance,
+ - python -m unittest test_query_cache.TestQueryCache.test_eviction
+ - python -m unittest test_query_cache.TestQueryCache.test_cached_query
+
+Note: include -b flag to silence stdout
+"""
+
+VALID_CLIENT = "https://localhost"
+VALID_CREDENTIALS = ('user', 'pass')
+VALID_DATASET = 'Usual-Residents'
+VALID_FILE = 'test_dataset_file.json'
+DIGEST = 'c932e250328b1cb6083ad580e9cc4ed6e3d7d3073ae8295b7589c8914bd5c834'
+
+
+def mock_response(content: bytes, status_code: int = 200, headers: dict = None) -> MagicMock:
+    res = MagicMock()
+    res.status_code = status_code
+    res.ok = status_code < 400
+    res.content = content
+    res.iter_content.side_effect = lambda chunk_size: iter([content[:10], content[10:]])
+    res.headers = headers if headers is not None else {}
+    return res
+
+
+class TestQueryCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.cache = QueryCache(self.directory, 1000, 60)
+        with open(VALID_FILE, 'rb') as f:
+            self.content = f.read()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+
+    def entry(self, variables: list) -> dict:
+        return {"client": VALID_CLIENT, "dataset": VALID_DATASET, "variables": variables, "sizes": [2] * len(variables), "digest": DIGEST,
+                "etag": None, "last_modified": None}
+
+    def put(self, key: str, content: bytes, variables: list, cache: QueryCache = None) -> None:
+        cache = cache if cache is not None else self.cache
+        with open(cache.temp_path(key), 'wb') as f:
+            f.write(content)
+        cache.put(key, self.entry(variables))
+
+    def test_invalid_settings(self):
+        with self.assertRaises(TypeError):
+            QueryCache(self.directory, "1000", 60)
+        with self.assertRaises(ValueError):
+            QueryCache(self.directory, 0, 60)
+
+    def test_key(self):
+        self.assertEqual(QueryCache.key(VALID_CLIENT, VALID_DATASET, ['SEX', 'AGE']),
+                         QueryCache.key(VALID_CLIENT, VALID_DATASET, ['AGE', 'SEX']))
+        self.assertNotEqual(QueryCache.key(VALID_CLIENT, VALID_DATASET, ['SEX']),
+                            QueryCache.key(VALID_CLIENT, VALID_DATASET, ['AGE']))
+
+    def test_put_and_get(self):
+        key = QueryCache.key(VALID_CLIENT, VALID_DATASET, ['SEX'])
+        self.assertIsNone(self.cache.get(key))
+        self.put(key, b'{}', ['SEX'])
+        entry = self.cache.get(key)
+        self.assertTrue(self.cache.is_fresh(entry))
+        with self.cache.open(key) as f:
+            self.assertEqual(f.read(), b'{}')
+        self.assertFalse(QueryCache(self.directory, 1000, 0).is_fresh(entry))
+
+    def test_eviction(self):
+        keys = [QueryCache.key(VALID_CLIENT, VALID_DATASET, [str(i)]) for i in range(3)]
+        for i, key in enumerate(keys):
+            self.put(key, b'x' * 400, [str(i)])
+            if i == 1:
+                # Reading the first entry makes the second the least recently used
+                self.cache.open(keys[0]).close()
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[2]))
+
+        # A cached response missing from the index is deleted, rather than being kept (and counted) forever
+        orphan = QueryCache.key(VALID_CLIENT, VALID_DATASET, ['orphan'])
+        with open(self.cache.path(orphan), 'wb') as f:
+            f.write(b'x' * 400)
+        self.put(keys[1], b'x' * 100, ['1'])
+        self.assertFalse(os.path.exists(self.cache.path(orphan)))
+        self.assertEqual(sorted(os.path.splitext(name)[0] for name in os.listdir(self.directory)
+                                if name.endswith(".json") and name != QueryCache.INDEX_FILE),
+                         sorted(self.cache.load_index()))
+
+    def test_concurrent_puts(self):
+        # Each thread has its own cache, as each process would, so they are kept apart only by the lock on the index
+        keys = [QueryCache.key(VALID_CLIENT, VALID_DATASET, [str(i)]) for i in range(16)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for future in [executor.submit(self.put, key, b'{}', [str(i)], QueryCache(self.directory, 100000, 60))
+                           for i, key in enumerate(keys)]:
+                future.result()
+        self.assertEqual(sorted(self.cache.load_index()), sorted(keys))
+
+    def test_failed_put(self):
+        key = QueryCache.key(VALID_CLIENT, VALID_DATASET, ['SEX'])
+        with open(self.cache.temp_path(key), 'wb') as f:
+            f.write(b'{}')
+        with patch.object(self.cache, 'write_index', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.cache.put(key, self.entry(['SEX']))
+        self.assertFalse(os.path.exists(self.cache.temp_path(key)))
+        self.assertIsNone(self.cache.get(key))
+
+    def test_invalidate_dataset(self):
+        key = QueryCache.key(VALID_CLIENT, VALID_DATASET, ['SEX'])
+        self.put(key, b'{}', ['SEX'])
+        self.cache.invalidate_dataset(VALID_CLIENT, VALID_DATASET, DIGEST)
+        self.assertIsNotNone(self.cache.get(key))
+        # Only the entries of the client given are removed
+        self.cache.invalidate_dataset("https://localhost:5002", VALID_DATASET, "new digest")
+        self.assertIsNotNone(self.cache.get(key))
+        self.cache.invalidate_dataset(VALID_CLIENT, VALID_DATASET, "new digest")
+        self.assertIsNone(self.cache.get(key))
+
+    def test_cached_query(self):
+        with CantabularApiConnector(VALID_DATASET, ['SEX'], VALID_CREDENTIALS, VALID_CLIENT, cache=self.cache) as con:
+            with patch.object(con.session, 'get', return_value=mock_response(self.content)) as get:
+                self.assertIsInstance(con.query(), pyjstat.Dataset)
+                self.assertIsInstance(con.query(), pyjstat.Dataset)
+                get.assert_called_once()
+
+    def test_reordered_query(self):
+        content = json.dumps({
+            "version": "2.0", "class": "dataset", "id": ["OA", "SEX"], "size": [3, 2],
+            "dimension": {
+                "OA": {"label": "OA", "category": {"index": ["E1", "E2", "E3"]}},
+                "SEX": {"label": "Sex", "category": {"index": ["1", "2"]}}
+            },
+            "extension": {"cantabular": {"dataset": {"digest": DIGEST}, "blocked": None}},
+            "value": [0, 1, 2, 3, 4, 5]
+        }).encode()
+        with CantabularApiConnector(VALID_DATASET, ['OA', 'SEX'], VALID_CREDENTIALS, VALID_CLIENT,
+                                    cache=self.cache) as con:
+            with patch.object(con.session, 'get', return_value=mock_response(content)):
+                con.query()
+
+        # A query for the same variables in another order is served from the cache, reordered
+        with CantabularApiConnector(VALID_DATASET, ['SEX', 'OA'], VALID_CREDENTIALS, VALID_CLIENT,
+                                    cache=self.cache) as con:
+            with patch.object(con.session, 'get') as get:
+                table = con.query()
+                get.assert_not_called()
+        self.assertEqual(table["id"], ['SEX', 'OA'])
+        self.assertEqual(list(table["value"]), [0, 2, 4, 1, 3, 5])
+
+    def test_revalidation(self):
+        stale_cache = QueryCache(self.directory, 100000, 0)
+        with CantabularApiConnector(VALID_DATASET, ['SEX'], VALID_CREDENTIALS, VALID_CLIENT, cache=stale_cache) as con:
+            # With an ETag, a stale entry is revalidated with a conditional request
+            with patch.object(con.session, 'get', return_value=mock_response(self.content, 200, {'ETag': '"a"'})):
+                con.query()
+            with patch.object(con.session, 'get', return_value=mock_response(b'', 304)) as get:
+                self.assertIsInstance(con.query(), pyjstat.Dataset)
+                self.assertEqual(get.call_args[1]["headers"], {"If-None-Match": '"a"'})
+
+            # Without one, it is revalidated by comparing the dataset digest
+            with patch.object(con.session, 'get', return_value=mock_response(self.content)):
+                con.query()
+            with patch.object(con.session, 'get', return_value=mock_response(self.content)) as get:
+                self.assertIsInstance(con.query(), pyjstat.Dataset)
+                get.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
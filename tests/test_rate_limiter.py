@@ -0,0 +1,104 @@
+# type: ignore
+
+import sys; sys.path.append('..')
+import unittest
+from unittest.mock import patch
+from multiprocessing import Pool
+from api_connector import ApiConnector, POOL_SIZE
+from rate_limiter import RateLimiter, RateLimitedAdapter
+import tempfile
+import requests
+import time
+
+"""
+Prerequisites:
+ - None
+
+To run all tests:
+ - python test_rate_limiter.py
+
+To run specific tests:
+ - python -m unittest test_rate_limiter.TestRateLimiter.[test]
+for instance,
+ - python -m unittest test_rate_limiter.TestRateLimiter.test_acquire
+ - python -m unittest test_rate_limiter.TestRateLimiter.test_shared_between_processes
+
+Note: include -b flag to silence stdout
+"""
+
+VALID_CLIENT = "https://localhost:5001"
+VALID_CREDENTIALS = ("user", "pass")
+
+
+def acquire_tokens(directory):
+    limiter = RateLimiter("test", 20, 2, directory)
+    return sum(limiter.acquire() for _ in range(5))
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_invalid_limits(self):
+        with self.assertRaises(TypeError):
+            RateLimiter("test", "5", 10, self.directory.name)
+        with self.assertRaises(TypeError):
+            RateLimiter("test", 5, 10.5, self.directory.name)
+        with self.assertRaises(ValueError):
+            RateLimiter("test", 0, 10, self.directory.name)
+        with self.assertRaises(ValueError):
+            RateLimiter("test", 5, 0, self.directory.name)
+
+    def test_acquire(self):
+        limiter = RateLimiter("test", 10, 3, self.directory.name)
+        # The burst is available at once; after that, one token every tenth of a second
+        self.assertEqual([limiter.acquire() for _ in range(3)], [0, 0, 0])
+        start = time.time()
+        limiter.acquire()
+        limiter.acquire()
+        self.assertAlmostEqual(time.time() - start, 0.2, delta=0.05)
+
+    def test_shared_budget(self):
+        first = RateLimiter("test", 10, 2, self.directory.name)
+        second = RateLimiter("test", 10, 2, self.directory.name)
+        other = RateLimiter("other", 10, 2, self.directory.name)
+        first.acquire()
+        first.acquire()
+        self.assertGreater(second.acquire(), 0)
+        self.assertEqual(other.acquire(), 0)
+
+    def test_shared_between_processes(self):
+        start = time.time()
+        with Pool(2) as pool:
+            pool.map(acquire_tokens, [self.directory.name] * 2)
+        # Ten requests with a burst of two, at twenty a second, take at least 0.4 seconds between them
+        self.assertGreaterEqual(time.time() - start, 0.35)
+
+    def test_drain(self):
+        limiter = RateLimiter("test", 10, 5, self.directory.name)
+        limiter.drain(0.3)
+        self.assertAlmostEqual(limiter.acquire(), 0.4, delta=0.05)
+
+    def test_adapter(self):
+        limiter = RateLimiter("test", 10, 5, self.directory.name)
+        with patch.dict(ApiConnector.rate_limiters, {VALID_CLIENT: limiter}):
+            with ApiConnector(VALID_CREDENTIALS, VALID_CLIENT, None, record_requests=False) as con:
+                adapter = con.session.get_adapter(VALID_CLIENT + "/api/v01/dataset")
+                self.assertIsInstance(adapter, RateLimitedAdapter)
+                self.assertEqual(adapter.poolmanager.connection_pool_kw["maxsize"], POOL_SIZE)
+
+                res = requests.Response()
+                res.status_code = 429
+                res.headers['Retry-After'] = '1'
+                with patch.object(requests.adapters.HTTPAdapter, 'send', return_value=res) as send:
+                    con.session.get(VALID_CLIENT + "/api/v01/dataset")
+                    send.assert_called_once()
+                self.assertGreater(limiter.acquire(), 0.9)
+
+
+if __name__ == '__main__':
+    unittest.main()
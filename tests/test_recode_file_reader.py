@@ -0,0 +1,76 @@
+# type: ignore
+
+import sys; sys.path.append('..')
+import unittest
+from recode_file_reader import RecodeFileReader
+import tempfile
+import json
+import os
+
+"""
+Prerequisites:
+ - None
+
+To run all tests:
+ - python test_recode_file_reader.py
+
+To run specific tests:
+ - python -m unittest test_recode_file_reader.TestRecodeFileReader.[test]
+for instance,
+ - python -m unittest test_recode_file_reader.TestRecodeFileReader.test_recodes
+
+Note: include -b flag to silence stdout
+"""
+
+VALID_FILE = "../examples/recode_example.json"
+
+
+class TestRecodeFileReader(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def recode(self, content) -> RecodeFileReader:
+        path = os.path.join(self.directory.name, "recode.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(content, f)
+        return RecodeFileReader(path)
+
+    def test_recodes(self):
+        recodes = RecodeFileReader(VALID_FILE).recodes()
+        self.assertEqual(list(recodes), ["AGE"])
+        self.assertEqual((recodes["AGE"].name, recodes["AGE"].label), ("AGE_3A", "Age (3 categories)"))
+        mapping, labels = recodes["AGE"].mapping, recodes["AGE"].labels
+        self.assertEqual(mapping["5"], "1")
+        self.assertEqual(mapping["18"], "3")
+        self.assertEqual(list(labels), ["1", "2", "3"])
+        self.assertEqual(labels["2"], "Aged 5 to 9 years")
+
+    def test_invalid_recodes(self):
+        with self.assertRaises(FileNotFoundError):
+            RecodeFileReader("missing.json").recodes()
+        with self.assertRaises(TypeError):
+            self.recode([]).recodes()
+        with self.assertRaises(TypeError):
+            self.recode({"AGE": [{"code": "1", "categories": ["1"]}]}).recodes()
+        with self.assertRaises(TypeError):
+            self.recode({"AGE": {"name": "AGE_2", "categories": [{"code": "1"}]}}).recodes()
+        with self.assertRaises(ValueError):
+            self.recode({"AGE": {"name": "AGE_2", "categories": [{"code": "1", "categories": ["1"]},
+                                                                 {"code": "1", "categories": ["2"]}]}}).recodes()
+        with self.assertRaises(ValueError):
+            self.recode({"AGE": {"name": "AGE_2", "categories": [{"code": "1", "categories": ["1"]},
+                                                                 {"code": "2", "categories": ["1"]}]}}).recodes()
+
+        # The new variable must be distinct from the dimensions recoded, as its categories differ
+        for name in ("AGE", "SEX", " "):
+            with self.assertRaises(ValueError):
+                self.recode({"AGE": {"name": name, "categories": []}, "SEX": {"name": "AGE_2", "categories": []}}
+                            ).recodes()
+
+
+if __name__ == '__main__':
+    unittest.main()
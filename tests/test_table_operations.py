@@ -0,0 +1,244 @@
+# type: ignore
+
+import sys; sys.path.append('..')
+import unittest
+from pyjstat import pyjstat
+from table_operations import TableOperations
+import numpy as np
+
+"""
+Prerequisites:
+ - None
+
+To run all tests:
+ - python test_table_operations.py
+
+To run specific tests:
+ - python -m unittest test_table_operations.TestTableOperations.[test]
+for instance,
+ - python -m unittest test_table_operations.TestTableOperations.test_reorder
+ - python -m unittest test_table_operations.TestTableOperations.test_select
+
+Note: include -b flag to silence stdout
+"""
+
+
+def table():
+    return pyjstat.Dataset({
+        "version": "2.0",
+        "class": "dataset",
+        "id": ["SEX", "AGE", "OA"],
+        "size": [2, 3, 4],
+        "dimension": {
+            "SEX": {"label": "Sex", "category": {"index": ["1", "2"], "label": {"1": "Male", "2": "Female"}}},
+            "AGE": {"label": "Age", "category": {"index": ["1", "2", "3"]}},
+            "OA": {"label": "Output Area", "category": {"index": ["E1", "E2", "E3", "E4"]}}
+        },
+        "extension": {"cantabular": {"dataset": {"name": "Usual-Residents"}}},
+        "value": np.arange(24)
+    })
+
+
+class TestTableOperations(unittest.TestCase):
+
+    def test_cube(self):
+        original = table()
+        self.assertEqual(TableOperations.cube(original).shape, (2, 3, 4))
+        original["value"] = np.arange(23)
+        with self.assertRaises(ValueError):
+            TableOperations.cube(original)
+
+        # Values keyed by position are expanded, with the missing values null
+        original["value"] = {"0": 5, "23": 7}
+        cube = TableOperations.cube(original)
+        self.assertEqual(cube.shape, (2, 3, 4))
+        self.assertEqual(cube.reshape(-1).tolist(), [5] + [None] * 22 + [7])
+        reordered = TableOperations.reorder(original, ["OA", "SEX", "AGE"])
+        self.assertEqual(reordered["value"].tolist(), [5] + [None] * 22 + [7])
+        self.assertTrue(np.isnan(TableOperations.marginalise(original, ["SEX"])["value"]).all())
+
+    def test_reorder(self):
+        original = table()
+        reordered = TableOperations.reorder(original, ["OA", "SEX", "AGE"])
+        self.assertEqual(reordered["id"], ["OA", "SEX", "AGE"])
+        self.assertEqual(reordered["size"], [4, 2, 3])
+        self.assertEqual(list(reordered["dimension"]), ["OA", "SEX", "AGE"])
+        self.assertIs(reordered["dimension"]["SEX"], original["dimension"]["SEX"])
+        self.assertEqual(reordered["extension"], original["extension"])
+        self.assertTrue(reordered["value"].flags["C_CONTIGUOUS"])
+
+        # Each value is moved with its categories
+        cube = TableOperations.cube(original)
+        moved = TableOperations.cube(reordered)
+        for sex, age, oa in np.ndindex(2, 3, 4):
+            self.assertEqual(moved[oa, sex, age], cube[sex, age, oa])
+
+        # The original table is unchanged, and a table already in order is returned as it is
+        self.assertEqual(original["id"], ["SEX", "AGE", "OA"])
+        self.assertEqual(list(original["value"]), list(range(24)))
+        self.assertIs(TableOperations.reorder(original, ["SEX", "AGE", "OA"]), original)
+        self.assertEqual(TableOperations.move_to_front(original, ["OA"])["id"], ["OA", "SEX", "AGE"])
+
+        with self.assertRaises(ValueError):
+            TableOperations.reorder(original, ["OA", "SEX"])
+
+    def test_reorder_statuses(self):
+        original = table()
+        original["status"] = [str(i) for i in range(24)]
+        reordered = TableOperations.reorder(original, ["OA", "SEX", "AGE"])
+        self.assertEqual(reordered["status"], [str(value) for value in reordered["value"]])
+
+        original["status"] = {"5": "x", "23": "y"}
+        reordered = TableOperations.reorder(original, ["OA", "SEX", "AGE"])
+        self.assertEqual({reordered["value"][int(position)]: status
+                          for position, status in reordered["status"].items()}, {5: "x", 23: "y"})
+
+    def test_marginalise(self):
+        original = table()
+        cube = TableOperations.cube(original)
+        sex = TableOperations.marginalise(original, ["SEX"])
+        self.assertEqual(sex["id"], ["SEX"])
+        self.assertEqual(list(sex["value"]), cube.sum(axis=(1, 2)).tolist())
+        self.assertIs(sex["dimension"]["SEX"], original["dimension"]["SEX"])
+
+        # The dimensions kept are in the order given
+        oa_sex = TableOperations.marginalise(original, ["OA", "SEX"])
+        self.assertEqual(oa_sex["id"], ["OA", "SEX"])
+        self.assertTrue(np.array_equal(TableOperations.cube(oa_sex), cube.sum(axis=1).T))
+        self.assertIs(TableOperations.marginalise(original, ["SEX", "AGE", "OA"]), original)
+
+        with self.assertRaises(KeyError):
+            TableOperations.marginalise(original, ["SEX", "LSOA"])
+        with self.assertRaises(ValueError):
+            TableOperations.marginalise(original, [])
+        with self.assertRaises(ValueError):
+            TableOperations.marginalise(original, ["SEX", "SEX"])
+
+    def test_select(self):
+        original = table()
+        cube = TableOperations.cube(original)
+        selected = TableOperations.select(original, {"OA": ["E4", "E2"], "SEX": ["2"]})
+        self.assertEqual(selected["id"], ["SEX", "AGE", "OA"])
+        self.assertEqual(selected["size"], [1, 3, 2])
+        self.assertEqual(selected["dimension"]["OA"]["category"]["index"], ["E2", "E4"])
+        self.assertEqual(selected["dimension"]["SEX"]["category"]["label"], {"2": "Female"})
+        self.assertIs(selected["dimension"]["AGE"], original["dimension"]["AGE"])
+        self.assertTrue(np.array_equal(TableOperations.cube(selected), cube[1:, :, [1, 3]]))
+
+        # The original table is unchanged, and statuses are selected with their values
+        self.assertEqual(original["dimension"]["OA"]["category"]["index"], ["E1", "E2", "E3", "E4"])
+        self.assertIs(TableOperations.select(original, {}), original)
+        original["status"] = [str(i) for i in range(24)]
+        selected = TableOperations.select(original, {"OA": ["E4", "E2"], "SEX": ["2"]})
+        self.assertEqual(selected["status"], [str(value) for value in selected["value"]])
+        original["status"] = {"5": "x", "23": "y"}
+        selected = TableOperations.select(original, {"OA": ["E4", "E2"], "SEX": ["2"]})
+        self.assertEqual({selected["value"][int(position)]: status for position, status in selected["status"].items()},
+                         {23: "y"})
+
+        with self.assertRaises(KeyError):
+            TableOperations.select(original, {"LSOA": ["E1"]})
+        with self.assertRaises(KeyError):
+            TableOperations.select(original, {"OA": ["E5"]})
+        with self.assertRaises(ValueError):
+            TableOperations.select(original, {"OA": []})
+
+    def test_concatenate(self):
+        original = table()
+        england = TableOperations.select(original, {"OA": ["E1", "E2"]})
+        wales = TableOperations.reorder(TableOperations.select(original, {"OA": ["E3", "E4"]}), ["OA", "AGE", "SEX"])
+        wales["value"] = wales["value"].astype(float)
+        concatenated = TableOperations.concatenate([england, wales], "OA")
+        self.assertEqual(concatenated["id"], ["SEX", "AGE", "OA"])
+        self.assertEqual(concatenated["size"], [2, 3, 4])
+        self.assertEqual(concatenated["dimension"]["OA"]["category"]["index"], ["E1", "E2", "E3", "E4"])
+        self.assertEqual(concatenated["dimension"]["OA"]["label"], "Output Area")
+        self.assertIs(concatenated["dimension"]["SEX"], original["dimension"]["SEX"])
+        self.assertEqual(concatenated["value"].dtype, np.float64)
+        self.assertEqual(list(concatenated["value"]), list(range(24)))
+        self.assertIs(TableOperations.concatenate([england], "OA"), england)
+
+        # Statuses in any form are concatenated with their values
+        england["status"] = "a"
+        wales["status"] = {"0": "x"}
+        statuses = TableOperations.concatenate([england, wales], "OA")["status"]
+        self.assertEqual(len(statuses), 24)
+        self.assertEqual((statuses[0], statuses[2], statuses[3]), ("a", "x", None))
+
+        with self.assertRaises(ValueError):
+            TableOperations.concatenate([], "OA")
+        with self.assertRaises(KeyError):
+            TableOperations.concatenate([england, TableOperations.marginalise(wales, ["SEX", "AGE"])], "OA")
+        with self.assertRaises(ValueError):
+            TableOperations.concatenate([england, TableOperations.select(wales, {"AGE": ["1"]})], "OA")
+        with self.assertRaises(ValueError):
+            TableOperations.concatenate([england, england], "OA")
+
+    def test_recode(self):
+        original = table()
+        mapping = {"1": "B", "2": "A", "3": "B"}
+        recoded = TableOperations.recode(original, "AGE", mapping, "AGE_2", "Age (2)",
+                                         {"A": "Aged 2", "B": "Aged 1 or 3"})
+        self.assertEqual(recoded["id"], ["SEX", "AGE_2", "OA"])
+        self.assertNotIn("AGE", recoded["dimension"])
+        self.assertEqual(recoded["dimension"]["AGE_2"]["label"], "Age (2)")
+        self.assertEqual(recoded["dimension"]["AGE_2"]["category"]["index"], ["A", "B"])
+        self.assertEqual(recoded["dimension"]["AGE_2"]["category"]["label"], {"A": "Aged 2", "B": "Aged 1 or 3"})
+        cube = TableOperations.cube(original)
+        expected = np.stack([cube[:, 1, :], cube[:, 0, :] + cube[:, 2, :]], axis=1)
+        self.assertTrue(np.array_equal(TableOperations.cube(recoded), expected))
+
+        # Without labels, the new categories are labelled by their codes, in the order of the mapping
+        recoded = TableOperations.recode(original, "AGE", mapping, "AGE_2", "Age (2)")
+        self.assertEqual(recoded["dimension"]["AGE_2"]["category"]["label"], {"B": "B", "A": "A"})
+
+        with self.assertRaises(KeyError):
+            TableOperations.recode(original, "AGE", {"1": "A", "2": "A"}, "AGE_2", "Age (2)")
+        with self.assertRaises(KeyError):
+            TableOperations.recode(original, "AGE", mapping, "AGE_2", "Age (2)", {"A": "Aged 2"})
+        with self.assertRaises(ValueError):
+            TableOperations.recode(original, "AGE", mapping, "AGE", "Age")
+        with self.assertRaises(ValueError):
+            TableOperations.recode(original, "AGE", mapping, "SEX", "Sex")
+
+        # A large cube is recoded in one pass
+        large = pyjstat.Dataset({
+            "id": ["AGE", "OA"],
+            "dimension": {
+                "AGE": {"label": "Age", "category": {"index": [str(age) for age in range(100)]}},
+                "OA": {"label": "OA", "category": {"index": [f"E{oa}" for oa in range(20000)]}}
+            },
+            "value": np.ones(2000000, dtype=np.int64)
+        })
+        bands = TableOperations.recode(large, "AGE", {str(age): str(age // 5) for age in range(100)}, "AGE_5Y", "Age")
+        self.assertEqual(bands["size"], [20, 20000])
+        self.assertTrue(np.all(bands["value"] == 5))
+
+    def test_roll_up(self):
+        original = table()
+        parents = {"E1": "W1", "E2": "W2", "E3": "W1", "E4": "W3", "E5": "W3"}
+        rolled = TableOperations.roll_up(original, "OA", parents, "LSOA")
+        self.assertEqual(rolled["id"], ["SEX", "AGE", "LSOA"])
+        self.assertEqual(rolled["size"], [2, 3, 3])
+        self.assertEqual(rolled["dimension"]["LSOA"]["category"]["index"], ["W1", "W2", "W3"])
+        self.assertIs(rolled["dimension"]["AGE"], original["dimension"]["AGE"])
+        cube = TableOperations.cube(original)
+        expected = np.stack([cube[:, :, 0] + cube[:, :, 2], cube[:, :, 1], cube[:, :, 3]], axis=2)
+        self.assertTrue(np.array_equal(TableOperations.cube(rolled), expected))
+
+        # Null values make their sums null
+        original["value"] = [None] + list(range(1, 24))
+        rolled = TableOperations.roll_up(original, "OA", parents, "LSOA")
+        self.assertTrue(np.isnan(rolled["value"][0]))
+        self.assertEqual(rolled["value"][1], 1)
+
+        with self.assertRaises(KeyError):
+            TableOperations.roll_up(original, "OA", {"E1": "W1"}, "LSOA")
+        with self.assertRaises(KeyError):
+            TableOperations.roll_up(original, "LSOA", parents, "MSOA")
+        with self.assertRaises(ValueError):
+            TableOperations.roll_up(original, "OA", parents, "AGE")
+
+
+if __name__ == '__main__':
+    unittest.main()
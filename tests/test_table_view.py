@@ -0,0 +1,76 @@
+# type: ignore
+
+import sys; sys.path.append('..')
+import unittest
+from pyjstat import pyjstat
+from table_view import TableView
+from dataset_transformations import DatasetTransformations
+import numpy as np
+
+"""
+Prerequisites:
+ - None
+
+To run all tests:
+ - python test_table_view.py
+
+To run specific tests:
+ - python -m unittest test_table_view.TestTableView.[test]
+for instance,
+ - python -m unittest test_table_view.TestTableView.test_view
+
+Note: include -b flag to silence stdout
+"""
+
+
+def table():
+    return pyjstat.Dataset({
+        "version": "2.0",
+        "class": "dataset",
+        "id": ["OA", "SEX"],
+        "size": [3, 2],
+        "dimension": {
+            "OA": {"label": "Output Area", "category": {"index": ["E1", "E2", "E3"],
+                                                        "label": {"E1": "E1", "E2": "E2", "E3": "E3"}}},
+            "SEX": {"label": "Sex", "category": {"index": ["1", "2"], "label": {"1": "Male", "2": "Female"}}}
+        },
+        "value": np.arange(6)
+    })
+
+
+class TestTableView(unittest.TestCase):
+
+    def test_view(self):
+        original = table()
+        view = TableView(original, ["OA"])
+        self.assertIsInstance(view, pyjstat.Dataset)
+        self.assertEqual(view["id"], ["SEX"])
+        self.assertEqual(view["size"], [2])
+        self.assertEqual(list(view["dimension"]), ["SEX"])
+
+        # Nothing is copied, and the original table is unchanged
+        self.assertIs(view["value"], original["value"])
+        self.assertIs(view["dimension"]["SEX"], original["dimension"]["SEX"])
+        self.assertEqual(original["id"], ["OA", "SEX"])
+        self.assertEqual(list(original["dimension"]), ["OA", "SEX"])
+
+        with self.assertRaises(KeyError):
+            TableView(original, ["LSOA"])
+
+    def test_transformations(self):
+        original = table()
+        transformations = DatasetTransformations(TableView(original, ["OA"]), True, original)
+        self.assertEqual([variable["name"] for variable in transformations.variable_creation()], ["SEX"])
+        self.assertEqual([(dimension.name, dimension.stride) for dimension in transformations.dimensions], [("SEX", 1)])
+        self.assertEqual([(dimension.name, dimension.stride) for dimension in transformations.observation_dimensions],
+                         [("OA", 2), ("SEX", 1)])
+        self.assertEqual([dimension["name"] for dimension in transformations.assign_dimensions("OA")],
+                         ["geography", "SEX"])
+        observations = transformations.observations("DC1101EW")
+        self.assertEqual(observations["dimensions"], ["geography", "SEX"])
+        self.assertEqual(observations["codes"], [["E1", "E2", "E3"], ["1", "2"]])
+        self.assertEqual(observations["values"], list(range(6)))
+
+
+if __name__ == '__main__':
+    unittest.main()
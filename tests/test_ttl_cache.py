@@ -0,0 +1,55 @@
+# type: ignore
+
+import sys; sys.path.append('..')
+import unittest
+from unittest.mock import patch
+from ttl_cache import TtlCache
+
+"""
+Prerequisites:
+ - None
+
+To run all tests:
+ - python test_ttl_cache.py
+
+To run specific tests:
+ - python -m unittest test_ttl_cache.TestTtlCache.[test]
+for instance,
+ - python -m unittest test_ttl_cache.TestTtlCache.test_expiry
+
+Note: include -b flag to silence stdout
+"""
+
+
+class TestTtlCache(unittest.TestCase):
+
+    def test_invalid_ttl(self):
+        with self.assertRaises(TypeError):
+            TtlCache("60")
+        with self.assertRaises(ValueError):
+            TtlCache(-1)
+
+    def test_expiry(self):
+        cache = TtlCache(60)
+        with patch('time.monotonic', return_value=1000):
+            cache.put("key", "value")
+        with patch('time.monotonic', return_value=1059):
+            self.assertEqual(cache.get("key"), "value")
+        with patch('time.monotonic', return_value=1060):
+            self.assertIsNone(cache.get("key"))
+            self.assertEqual(cache.get("key", False), False)
+
+    def test_discard(self):
+        cache = TtlCache(60)
+        cache.put("first", 1)
+        cache.put("second", 2)
+        cache.discard("first")
+        cache.discard("missing")
+        self.assertIsNone(cache.get("first"))
+        self.assertEqual(cache.get("second"), 2)
+        cache.clear()
+        self.assertIsNone(cache.get("second"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+from type_hints import *
+import threading
+import time
+
+
+class TtlCache:
+    """
+    Class for keeping values in memory for a limited time; used to share the results of API lookups between calls made
+    during the same run, without using results so old that they may have changed. The cache may be used from several
+    threads at once.
+
+    :param ttl: The number of seconds for which a value is kept.
+
+    :ivar ttl: Initial value: ttl.
+    :vartype ttl: Union[int, float]
+    """
+
+    def __init__(self, ttl: Union[int, float]) -> None:
+        if not isinstance(ttl, (int, float)):
+            raise TypeError("The ttl must be a number.")
+        if ttl < 0:
+            raise ValueError("The ttl cannot be negative.")
+
+        self.ttl = ttl
+        self.values: Dict[Any, Tuple[float, Any]] = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """
+        Method for retrieving a value, if it was added less than `ttl` seconds ago.
+
+        :return: The value, or `default` if there is no such value.
+        """
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                return default
+            if time.monotonic() - entry[0] >= self.ttl:
+                del self.values[key]
+                return default
+            return entry[1]
+
+    def put(self, key: Any, value: Any) -> None:
+        """
+        Method for adding (or replacing) a value.
+        """
+        with self.lock:
+            self.values[key] = (time.monotonic(), value)
+
+    def discard(self, key: Any) -> None:
+        """
+        Method for removing a value, if it is present; e.g., once it is known to have changed.
+        """
+        with self.lock:
+            self.values.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Method for removing all of the values.
+        """
+        with self.lock:
+            self.values.clear()
@@ -5,7 +5,10 @@ from typing import (
     List,
     Tuple,
     Any,
-    Optional
+    Optional,
+    Iterable,
+    Iterator,
+    BinaryIO
 )
 
 """ 
@@ -18,3 +21,6 @@ Dimensions = Dict[str, object]
 Observations = Dict[str, object]
 UuidMetadata = namedtuple("UuidMetadata", "uuid metadata")
 CredentialsConninfo = namedtuple("CredentialsConninfo", "credentials connection_info")
+MetadataLookup = namedtuple("MetadataLookup", "uuid metadata seconds error cached")
+Recode = namedtuple("Recode", "name label mapping labels")
+DimensionIndex = namedtuple("DimensionIndex", "name label codes labels size stride")